@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import DomainRank
+from .modules.domain_search import filter_domains
+
+
+@admin.register(DomainRank)
+class DomainRankAdmin(admin.ModelAdmin):
+    list_display = ['domain', 'rank', 'processed', 'updated_at']
+    list_filter = ['processed']
+    search_fields = ['domain']
+    readonly_fields = ['created_at', 'updated_at']
+    show_full_result_count = False  # Skip the extra COUNT(*) over millions of domains
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Substring search through the trigram index instead of LIKE '%term%'
+        if not search_term:
+            return queryset, False
+        return filter_domains(queryset, search_term), False
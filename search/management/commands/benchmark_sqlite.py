@@ -0,0 +1,170 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Measure dashboard read latency while a crawler-like writer hammers the database
+
+    Runs the same workload twice on a scratch copy of the domain table:
+    once with SQLite defaults (rollback journal, deferred transactions) and
+    once with the tuning profile configured for the given DATABASES alias.
+
+    Usage:
+        python manage.py benchmark_sqlite
+        python manage.py benchmark_sqlite --alias=default --rows=500000 --seconds=20 --readers=8
+    """
+
+    help = 'Benchmark SQLite reader latency under concurrent crawler writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', type=str, default='search_db', help='DATABASES alias whose tuning to test (default: search_db)')
+        parser.add_argument('--rows', type=int, default=200000, help='Domains in the scratch table (default: 200000)')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each run (default: 10)')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads (default: 4)')
+        parser.add_argument('--batch', type=int, default=200, help='Rank updates per writer transaction (default: 200)')
+
+    def handle(self, *args, **options):
+        db_settings = settings.DATABASES[options['alias']]
+        db_options = db_settings.get('OPTIONS', {})
+
+        profiles = [
+            ('defaults', {'init_command': '', 'transaction_mode': 'DEFERRED', 'timeout': 5.0}),
+            (f"tuned ({options['alias']})", {
+                'init_command': db_options.get('init_command', ''),
+                'transaction_mode': db_options.get('transaction_mode') or 'DEFERRED',
+                'timeout': db_options.get('timeout', 5.0),
+            }),
+        ]
+
+        self.stdout.write(self.style.SUCCESS('📊 SQLite concurrent read/write benchmark'))
+        self.stdout.write(
+            f"Rows: {options['rows']} | Readers: {options['readers']} | "
+            f"Writer batch: {options['batch']} | Duration: {options['seconds']}s per profile\n"
+        )
+
+        for name, profile in profiles:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'bench.sqlite3')
+                self._populate(path, options['rows'])
+                result = self._run(path, profile, options)
+            self._report(name, result)
+
+    def _connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+        for pragma in profile['init_command'].split(';'):
+            if pragma.strip():
+                conn.execute(pragma)
+        return conn
+
+    def _populate(self, path, rows):
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute(
+            'CREATE TABLE domainrank (id INTEGER PRIMARY KEY, domain TEXT UNIQUE NOT NULL, '
+            'rank INTEGER NOT NULL, processed INTEGER NOT NULL, updated_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX domainrank_keyset ON domainrank (rank DESC, processed, domain)')
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO domainrank (domain, rank, processed, updated_at) VALUES (?, ?, ?, ?)',
+            ((f'domain{i}.com', random.randint(0, 1000), random.random() < 0.3, time.time()) for i in range(rows))
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def _run(self, path, profile, options):
+        stop = threading.Event()
+        latencies = []
+        stats = {'commits': 0, 'write_errors': 0, 'read_errors': 0}
+        stats_lock = threading.Lock()
+        rows = options['rows']
+
+        def writer():
+            conn = self._connect(path, profile)
+            next_id = rows
+            while not stop.is_set():
+                try:
+                    conn.execute(f"BEGIN {profile['transaction_mode']}")
+                    now = time.time()
+                    for _ in range(options['batch']):
+                        conn.execute(
+                            'UPDATE domainrank SET rank = rank + 1, updated_at = ? WHERE domain = ?',
+                            (now, f'domain{random.randrange(rows)}.com')
+                        )
+                    for _ in range(options['batch'] // 10):
+                        conn.execute(
+                            'INSERT OR IGNORE INTO domainrank (domain, rank, processed, updated_at) VALUES (?, 1, 0, ?)',
+                            (f'domain{next_id}.com', now)
+                        )
+                        next_id += 1
+                    conn.execute('UPDATE domainrank SET processed = 1 WHERE domain = ?', (f'domain{random.randrange(rows)}.com',))
+                    conn.execute('COMMIT')
+                    with stats_lock:
+                        stats['commits'] += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    with stats_lock:
+                        stats['write_errors'] += 1
+            conn.close()
+
+        def reader():
+            conn = self._connect(path, profile)
+            local = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    # Dashboard-style reads: a keyset page at a random depth plus the top list
+                    rank = random.randint(0, 1000)
+                    conn.execute(
+                        'SELECT domain, rank, processed FROM domainrank WHERE rank < ? '
+                        'ORDER BY rank DESC, processed, domain LIMIT 51', (rank,)
+                    ).fetchall()
+                    conn.execute('SELECT domain, rank FROM domainrank ORDER BY rank DESC LIMIT 10').fetchall()
+                    local.append((time.perf_counter() - start) * 1000)
+                except sqlite3.OperationalError:
+                    with stats_lock:
+                        stats['read_errors'] += 1
+            conn.close()
+            with stats_lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        stats['latencies'] = latencies
+        stats['seconds'] = options['seconds']
+        return stats
+
+    def _report(self, name, result):
+        latencies = sorted(result['latencies'])
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}'))
+        self.stdout.write(
+            f"  Reads: {len(latencies)} ({len(latencies) / result['seconds']:.0f}/s) | "
+            f"p50 {percentile(0.50):.2f} ms | p95 {percentile(0.95):.2f} ms | "
+            f"p99 {percentile(0.99):.2f} ms | max {latencies[-1] if latencies else 0:.2f} ms | "
+            f"mean {statistics.fmean(latencies) if latencies else 0:.2f} ms"
+        )
+        self.stdout.write(
+            f"  Writer commits: {result['commits']} ({result['commits'] / result['seconds']:.1f}/s) | "
+            f"Locked errors: {result['read_errors']} read, {result['write_errors']} write"
+        )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from search.modules.personalized_pagerank import compute_fingerprints, related_domains, DEFAULT_ALPHA
+
+
+class Command(BaseCommand):
+    """
+    Precompute Monte Carlo personalized PageRank fingerprints from the crawled link graph
+    
+    Usage:
+        python manage.py compute_fingerprints
+        python manage.py compute_fingerprints --walks=200 --top=128
+        python manage.py compute_fingerprints --related=unicorner.coffee
+    """
+    
+    help = 'Run random walks over the domain link graph and store per-domain PPR fingerprints'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--walks',
+            type=int,
+            default=100,
+            help='Random walks started from every linking domain (default: 100, max: 65535)'
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=DEFAULT_ALPHA,
+            help=f'Probability a walk stops at each step (default: {DEFAULT_ALPHA})'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=64,
+            help='Most visited endpoints kept per fingerprint (default: 64)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for reproducible fingerprints'
+        )
+        parser.add_argument(
+            '--related',
+            type=str,
+            default='',
+            help='Show domains related to this domain once the fingerprints are stored'
+        )
+    
+    def handle(self, *args, **options):
+        if not 1 <= options['walks'] <= 0xFFFF:
+            raise CommandError('--walks must be between 1 and 65535')
+        if not 0 < options['alpha'] < 1:
+            raise CommandError('--alpha must be between 0 and 1')
+        
+        written = compute_fingerprints(
+            walks=options['walks'],
+            alpha=options['alpha'],
+            top=options['top'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'👣 {written} domain fingerprints stored'))
+        
+        if options['related']:
+            self.stdout.write(f'🔗 Related to {options["related"]}:')
+            for domain, score in related_domains([options['related']]):
+                self.stdout.write(f'  {domain.domain:40} {score:.4f} (rank: {domain.rank})')
@@ -0,0 +1,82 @@
+import gzip
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from search.modules.seed_import import import_seeds, CHUNK_SIZE
+from search.modules.domain_search import drop_trigram_triggers, rebuild_trigram_index
+
+
+class Command(BaseCommand):
+    """
+    Bulk-import seed domains from a (possibly huge) plain or gzipped list
+    
+    Usage:
+        python manage.py import_seeds domains.txt
+        python manage.py import_seeds top-1m.csv.gz --defer-index
+        cat domains.txt | python manage.py import_seeds - --rank=1
+    
+    Each line holds a domain or URL, optionally with a numeric rank (`domain,rank` or `rank,domain`).
+    """
+    
+    help = 'Stream a domain list into the crawler database with chunked bulk inserts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Domain list file (.gz is decompressed on the fly), or - for stdin'
+        )
+        parser.add_argument(
+            '--rank',
+            type=int,
+            default=0,
+            help='Rank for lines without one (default: 0)'
+        )
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Domains per transaction (default: {CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--defer-index',
+            action='store_true',
+            default=False,
+            help='Suspend the trigram search index during the import and rebuild it once at the end'
+        )
+    
+    def _open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+        try:
+            with open(path, 'rb') as probe:
+                compressed = probe.read(2) == b'\x1f\x8b'
+            if compressed:
+                return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+            return open(path, 'r', encoding='utf-8', errors='replace')
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+    
+    def handle(self, *args, **options):
+        if options['chunk'] < 1:
+            raise CommandError('--chunk must be positive')
+        
+        self.stdout.write(f'🌱 Importing seeds from {options["path"]}')
+        started = time.monotonic()
+        
+        if options['defer_index']:
+            drop_trigram_triggers()
+        try:
+            with self._open(options['path']) as lines:
+                counts = import_seeds(lines, default_rank=options['rank'], chunk_size=options['chunk'])
+        finally:
+            if options['defer_index']:
+                self.stdout.write('🔤 Rebuilding trigram domain index...')
+                rebuild_trigram_index()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {counts["inserted"]} new domains inserted, {counts["existing"]} already known '
+            f'({counts["lines"]} seeds read in {time.monotonic() - started:.1f}s)'
+        ))
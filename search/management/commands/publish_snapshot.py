@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from search.modules.snapshots import publish_snapshot, SNAPSHOT_PAGES
+
+
+class Command(BaseCommand):
+    """
+    Publish a read-path snapshot of the dashboard data now
+    
+    Usage:
+        python manage.py publish_snapshot
+        python manage.py publish_snapshot --pages=10
+    
+    The crawler publishes these on its own after commits; this is for cron or a stopped crawler.
+    """
+    
+    help = 'Write immutable JSON snapshots of crawler stats and listing pages and swap them in'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=SNAPSHOT_PAGES,
+            help=f'Listing pages snapshotted per status filter (default: {SNAPSHOT_PAGES})'
+        )
+    
+    def handle(self, *args, **options):
+        version_dir = publish_snapshot(pages=options['pages'])
+        self.stdout.write(self.style.SUCCESS(f'📦 Snapshot published: {version_dir}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from search.modules.domain_search import rebuild_trigram_index, search_domains
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the trigram substring index over DomainRank
+    
+    Usage:
+        python manage.py rebuild_domain_index
+        python manage.py rebuild_domain_index --query=coffee
+    """
+    
+    help = 'Rebuild the FTS5 trigram index used for substring domain search'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--query',
+            type=str,
+            default='',
+            help='Run a test search against the rebuilt index'
+        )
+    
+    def handle(self, *args, **options):
+        rebuild_trigram_index()
+        self.stdout.write(self.style.SUCCESS('🔤 Trigram domain index rebuilt'))
+        
+        if options['query']:
+            for domain in search_domains(options['query']):
+                self.stdout.write(f'  {domain.domain:40} (rank: {domain.rank})')
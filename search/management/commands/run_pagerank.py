@@ -1,4 +1,8 @@
-from django.core.management.base import BaseCommand
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from search.modules.simplified_pagerank import start_simplified_pagerank
 
 
@@ -9,6 +13,9 @@ class Command(BaseCommand):
     Usage:
         python manage.py run_pagerank
         python manage.py run_pagerank --domain=example.com --depth=3
+        python manage.py run_pagerank --workers=8 --max-workers=64 --host-concurrency=2
+        python manage.py run_pagerank --warc-dir=/data/warc          # record every response
+        python manage.py run_pagerank --replay=/data/warc --replay-db=/tmp/replay.sqlite3 --sequential  # re-rank offline
     """
     
     help = 'Run the simplified PageRank crawler with separate database'
@@ -48,7 +55,79 @@ class Command(BaseCommand):
             '--workers',
             type=int,
             default=4,
-            help='Number of parallel workers (default: 4)'
+            help='Initial number of parallel workers, adjusted to host latency and errors (default: 4)'
+        )
+        parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=None,
+            help='Ceiling for the adaptive worker count (default: 4 x --workers)'
+        )
+        parser.add_argument(
+            '--host-concurrency',
+            type=int,
+            default=4,
+            help='Most requests in flight to a single host (default: 4)'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=20,
+            help='Page budget of an average domain, scaled per domain by rank and link yield (default: 20)'
+        )
+        parser.add_argument(
+            '--pages-per-hour',
+            type=int,
+            default=0,
+            help='Global crawl rate target the per-domain budgets adapt to (default: 0 = no target)'
+        )
+        parser.add_argument(
+            '--warc-dir',
+            type=str,
+            default=None,
+            help='Write every fetched response to rotating compressed WARC files in this directory'
+        )
+        parser.add_argument(
+            '--warc-max-mb',
+            type=int,
+            default=256,
+            help='Rotate WARC files at this size in MB (default: 256)'
+        )
+        parser.add_argument(
+            '--replay',
+            type=str,
+            default=None,
+            help='Crawl from the WARC files in this directory instead of the network (use --sequential for a deterministic run)'
+        )
+        parser.add_argument(
+            '--replay-db',
+            type=str,
+            default=None,
+            help='SQLite file a --replay run writes to instead of the live search database (created if missing)'
+        )
+        parser.add_argument(
+            '--replay-live',
+            action='store_true',
+            default=False,
+            help='Let a --replay run write into the live search database'
+        )
+        parser.add_argument(
+            '--snapshot-interval',
+            type=float,
+            default=5.0,
+            help='Min seconds between dashboard snapshots published after commits (default: 5, 0 = off)'
+        )
+        parser.add_argument(
+            '--write-batch',
+            type=int,
+            default=50,
+            help='Crawl results per group commit in parallel mode (default: 50)'
+        )
+        parser.add_argument(
+            '--write-wait',
+            type=float,
+            default=2.0,
+            help='Max seconds before a partial batch is committed (default: 2.0)'
         )
     
     def handle(self, *args, **options):
@@ -57,17 +136,45 @@ class Command(BaseCommand):
         delay = options['delay']
         parallel = not options['sequential']  # Default to parallel unless --sequential is specified
         workers = options['workers']
+        write_batch = options['write_batch']
+        write_wait = options['write_wait']
+        pages = options['pages']
+        pages_per_hour = options['pages_per_hour']
+        warc_dir = options['warc_dir']
+        replay_dir = options['replay']
+        
+        replay_db = options['replay_db']
+        snapshot_interval = options['snapshot_interval']
+        
+        if warc_dir and replay_dir:
+            raise CommandError('--warc-dir and --replay cannot be used together')
+        if replay_db and not replay_dir:
+            raise CommandError('--replay-db only applies to --replay runs')
+        if replay_dir and not replay_db and not options['replay_live']:
+            raise CommandError(
+                '--replay would write ranks into the live search database: '
+                'pass --replay-db=PATH to replay into a separate SQLite file, or --replay-live to write into it anyway'
+            )
+        if replay_db:
+            self.use_replay_database(replay_db)
+            snapshot_interval = 0  # The dashboard snapshots are the live database's
         
         self.stdout.write(
             self.style.SUCCESS(f'🚀 Starting simplified PageRank crawler')
         )
         self.stdout.write(f'🌐 Seed domain: {domain}')
         self.stdout.write(f'📏 Max depth: {depth}')
-        self.stdout.write(f'⏱️ Request delay: {delay}s')
+        self.stdout.write(f'⏱️ Request delay: {0 if replay_dir else delay}s')
+        if warc_dir:
+            self.stdout.write(f'🗄️ Recording WARC to: {warc_dir}')
+        if replay_dir:
+            self.stdout.write(f'📼 Replaying from WARC: {replay_dir} (no network)')
+        self.stdout.write(f'📄 Base pages per domain: {pages}' + (f' | Target: {pages_per_hour} pages/hour' if pages_per_hour else ''))
         self.stdout.write(f'� Mode: {"Parallel" if parallel else "Sequential"}')
         if parallel:
-            self.stdout.write(f'👥 Workers: {workers}')
-        self.stdout.write(f'�💾 Database: search/database/search.sqlite3')
+            self.stdout.write(f'👥 Workers: {workers} (adaptive, up to {options["max_workers"] or workers * 4})')
+            self.stdout.write(f'💾 Group commits: {write_batch} results / {write_wait}s')
+        self.stdout.write(f'�💾 Database: {replay_db or "search/database/search.sqlite3"}')
         self.stdout.write('🛑 Press Ctrl+C to stop\n')
         
         try:
@@ -76,9 +183,30 @@ class Command(BaseCommand):
                 max_depth=depth, 
                 delay=delay, 
                 parallel=parallel, 
-                max_workers=workers
+                max_workers=workers,
+                write_batch_size=write_batch,
+                write_batch_wait=write_wait,
+                max_pages_per_domain=pages,
+                pages_per_hour=pages_per_hour,
+                warc_dir=warc_dir,
+                warc_max_size=options['warc_max_mb'] * 1024 * 1024,
+                replay_dir=replay_dir,
+                max_workers_limit=options['max_workers'],
+                host_concurrency=options['host_concurrency'],
+                snapshot_interval=snapshot_interval
             )
         except KeyboardInterrupt:
             self.stdout.write(
                 self.style.WARNING('\n🛑 Crawler stopped by user')
             )
+    
+    def use_replay_database(self, path):
+        """Point search_db at `path` for this process, creating its tables if it is new"""
+        live = connections.settings['search_db']['NAME']
+        if os.path.abspath(path) == os.path.abspath(live):
+            raise CommandError('--replay-db must not be the live search database')
+        
+        connections['search_db'].close()
+        # Every thread's connection is created from this settings dict
+        connections.settings['search_db']['NAME'] = str(path)
+        call_command('migrate', database='search_db', run_syncdb=True, verbosity=0)
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from search.modules.rank_history import take_snapshot, compact_history
+
+
+class Command(BaseCommand):
+    """
+    Record a rank history snapshot (only changed ranks) and apply the retention policy
+    
+    Usage:
+        python manage.py snapshot_ranks
+        python manage.py snapshot_ranks --interval=3600          # keep snapshotting every hour
+        python manage.py snapshot_ranks --keep-days=7 --max-days=90
+    """
+    
+    help = 'Snapshot changed domain ranks into the rank history and compact old epochs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Repeat every N seconds instead of running once (default: 0 = once)'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=30,
+            help='Keep every epoch this many days (default: 30)'
+        )
+        parser.add_argument(
+            '--max-days',
+            type=int,
+            default=365,
+            help='Keep one epoch per day up to this age, drop older ones (default: 365)'
+        )
+        parser.add_argument(
+            '--no-compact',
+            action='store_true',
+            default=False,
+            help='Only take the snapshot, skip retention'
+        )
+    
+    def handle(self, *args, **options):
+        if options['max_days'] < options['keep_days']:
+            raise CommandError('--max-days must not be smaller than --keep-days')
+        
+        try:
+            while True:
+                epoch = take_snapshot()
+                self.stdout.write(self.style.SUCCESS(f'📸 Epoch #{epoch.pk}: {epoch.changed_count} rank changes recorded'))
+                
+                if not options['no_compact']:
+                    dropped = compact_history(keep_days=options['keep_days'], max_days=options['max_days'])
+                    if dropped:
+                        self.stdout.write(f'🧹 {dropped} old epochs compacted')
+                
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\n🛑 Snapshots stopped by user'))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 
 
 class DomainRank(models.Model):
@@ -7,6 +8,7 @@ class DomainRank(models.Model):
     domain = models.CharField(max_length=255, unique=True, db_index=True)  # example.com (no protocol)
     rank = models.PositiveIntegerField(default=0, db_index=True)  # Number of external links pointing to this domain
     processed = models.BooleanField(default=False, db_index=True)  # Has this domain been crawled for outgoing links?
+    snapshot_rank = models.PositiveIntegerField(default=0, db_default=0)  # Rank recorded by the latest history snapshot (db_default: raw inserts may omit it)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -15,8 +17,156 @@ class DomainRank(models.Model):
         ordering = ['-rank', 'processed', 'domain']  # Sort by rank desc, unprocessed first
         indexes = [
             models.Index(fields=['-rank', 'processed']),  # For efficient querying
+            models.Index(fields=['-rank', 'processed', 'domain'], name='search_rank_keyset_idx'),  # Keyset pagination
+            models.Index(fields=['processed', '-updated_at'], name='search_processed_updated_idx'),  # Recent activity
         ]
     
     def __str__(self):
         status = "✅" if self.processed else "⏳"
         return f"{status} {self.domain} (rank: {self.rank})"
+
+
+class CrawlerStats(models.Model):
+    """
+    Materialized domain counters (single row)
+    Kept up to date by the crawler so dashboards never run COUNT(*) over DomainRank
+    """
+    
+    total_domains = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Crawler stats"
+    
+    def __str__(self):
+        return f"{self.processed_count}/{self.total_domains} domains processed"
+    
+    @property
+    def pending_count(self):
+        return self.total_domains - self.processed_count
+    
+    @classmethod
+    def load(cls, using='search_db'):
+        """Return the stats row, recounting from DomainRank the first time it is created"""
+        stats, created = cls.objects.using(using).get_or_create(pk=1)
+        if created:
+            stats = cls.recount(using=using)
+        return stats
+    
+    @classmethod
+    def recount(cls, using='search_db'):
+        """Rebuild the counters from DomainRank (full scan - for reconciliation only)"""
+        domains = DomainRank.objects.using(using)
+        total = domains.count()
+        processed = domains.filter(processed=True).count()
+        cls.objects.using(using).update_or_create(
+            pk=1, defaults={'total_domains': total, 'processed_count': processed}
+        )
+        return cls.objects.using(using).get(pk=1)
+    
+    @classmethod
+    def increment(cls, total=0, processed=0, using='search_db'):
+        """Atomically adjust the counters by the given deltas"""
+        if not total and not processed:
+            return
+        updated = cls.objects.using(using).filter(pk=1).update(
+            total_domains=F('total_domains') + total,
+            processed_count=F('processed_count') + processed,
+        )
+        if not updated:
+            # First write ever - recount picks up the rows that were just written
+            cls.recount(using=using)
+
+
+class CrawlerEvent(models.Model):
+    """
+    Append-only event log written by the crawler process
+    Web workers tail it by primary key and push new rows to dashboards over SSE
+    """
+    
+    CLAIMED = 'claimed'
+    FINISHED = 'finished'
+    RANKS = 'ranks'
+    KIND_CHOICES = [
+        (CLAIMED, 'Domain claimed'),
+        (FINISHED, 'Domain finished'),
+        (RANKS, 'Rank deltas'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    domain = models.CharField(max_length=255, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.domain}"
+
+
+class DomainLink(models.Model):
+    """
+    Domain-level link graph edge: `source` links to `target` (at most once per pair)
+    Written by the crawler alongside the rank updates, read by offline graph jobs
+    """
+    
+    source = models.ForeignKey(DomainRank, on_delete=models.CASCADE, related_name='outlinks')
+    target = models.ForeignKey(DomainRank, on_delete=models.CASCADE, related_name='inlinks')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'target'], name='search_domainlink_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id}"
+
+
+class DomainFingerprint(models.Model):
+    """
+    Precomputed Monte Carlo personalized PageRank fingerprint of one domain
+    `data` packs the top walk endpoints as DomainRank ids (uint32) followed by visit counts (uint16)
+    """
+    
+    domain = models.OneToOneField(DomainRank, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    walks = models.PositiveIntegerField()  # Random walks started from this domain
+    data = models.BinaryField()
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Fingerprint of #{self.domain_id} ({self.walks} walks)"
+
+
+class RankEpoch(models.Model):
+    """One rank history snapshot"""
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    changed_count = models.PositiveIntegerField(default=0)  # Domains whose rank changed since the previous epoch
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Epoch #{self.pk} ({self.created_at:%Y-%m-%d %H:%M}, {self.changed_count} changes)"
+
+
+class RankChange(models.Model):
+    """
+    Rank of a domain as of an epoch, stored only when it changed
+    A domain's rank at epoch E is its latest change at or before E (0 if none)
+    """
+    
+    epoch = models.ForeignKey(RankEpoch, on_delete=models.CASCADE, related_name='changes')
+    domain = models.ForeignKey(DomainRank, on_delete=models.CASCADE, related_name='rank_history')
+    rank = models.PositiveIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['domain', 'epoch'], name='search_rankchange_domain_epoch'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.domain_id} = {self.rank} @ epoch {self.epoch_id}"
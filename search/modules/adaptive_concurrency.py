@@ -0,0 +1,249 @@
+"""
+Adaptive Concurrency (AIMD)
+===========================
+
+Replaces the fixed worker count and fixed 10 s request timeout with limits
+that follow what the remote hosts can take:
+
+    - every host has its own in-flight limit, and all hosts together share a
+      global limit
+    - a fast, healthy response raises the limit additively (about +1 per
+      `limit` successful requests)
+    - a timeout, 429 or 5xx cuts that host's limit multiplicatively (at most
+      once per cooldown, so one burst of errors counts as one congestion
+      signal)
+    - the global limit is only cut when congestion (overloads and slow
+      responses) across hosts crosses a threshold of the recent requests and
+      comes from several hosts, so one failing host can't throttle the rest
+    - request timeouts come from the observed latency percentiles of the
+      host (p99 x a safety factor, clamped), falling back to the global
+      distribution, then to a fixed default
+
+Usage:
+    with concurrency.request('example.com') as call:
+        response = session.get(url, timeout=call.timeout)
+        call.status = response.status_code
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies with percentile lookups"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AIMDLimit:
+    """In-flight limit with additive increase and multiplicative decrease"""
+
+    def __init__(self, initial: float, minimum: float, maximum: float,
+                 backoff: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+
+    @property
+    def has_room(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def increase(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def decrease(self, now: float):
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._last_decrease = now
+
+
+class _HostState:
+    __slots__ = ('limit', 'latency', 'requests', 'overloads')
+
+    def __init__(self, limit: AIMDLimit, window: int):
+        self.limit = limit
+        self.latency = LatencyWindow(window)
+        self.requests = 0
+        self.overloads = 0
+
+
+class RequestSlot:
+    """One admitted request: carries its timeout in, and its outcome back out"""
+
+    __slots__ = ('host', 'timeout', 'status', 'timed_out')
+
+    def __init__(self, host: str, timeout: float):
+        self.host = host
+        self.timeout = timeout
+        self.status = None
+        self.timed_out = False
+
+    @property
+    def overloaded(self) -> bool:
+        return self.timed_out or self.status == 429 or (self.status is not None and self.status >= 500)
+
+
+class AdaptiveConcurrency:
+    """Thread-safe per-host and global AIMD limiter shared by all crawler workers"""
+
+    def __init__(self, initial_global: int = 4, min_global: int = 1, max_global: int = 32,
+                 initial_host: int = 1, max_host: int = 4, default_timeout: float = 10.0,
+                 min_timeout: float = 2.0, max_timeout: float = 30.0, timeout_factor: float = 3.0,
+                 latency_tolerance: float = 2.0, max_hosts: int = 10000, congestion_window: int = 100,
+                 congestion_threshold: float = 0.2, congested_hosts: int = 3):
+        """
+        Args:
+            initial_global: Starting global in-flight limit
+            min_global: Floor of the global limit
+            max_global: Ceiling of the global limit
+            initial_host: Starting in-flight limit of a host never seen before
+            max_host: Ceiling of any single host's limit (politeness)
+            default_timeout: Request timeout until enough latencies are observed
+            min_timeout: Lower clamp of the adaptive timeout
+            max_timeout: Upper clamp of the adaptive timeout
+            timeout_factor: Timeout = p99 latency x this factor
+            latency_tolerance: A response slower than this x the host's median doesn't raise limits
+            max_hosts: Host states kept (least recently used idle hosts are forgotten)
+            congestion_window: Recent requests (all hosts) the global congestion signal is taken over
+            congestion_threshold: Fraction of congested requests in the window that cuts the global limit
+            congested_hosts: Distinct hosts the congested requests must come from to cut the global limit
+        """
+        self.global_limit = AIMDLimit(initial_global, min_global, max_global)
+        self.initial_host = initial_host
+        self.max_host = max_host
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_hosts = max_hosts
+        self.congestion_threshold = congestion_threshold
+        self.congested_hosts = congested_hosts
+
+        self._cond = threading.Condition()
+        self._hosts = OrderedDict()
+        self._latency = LatencyWindow(1000)
+        self._outcomes = deque(maxlen=congestion_window)  # (host, congested) of recent requests
+        self.overloads = 0
+
+    def _host(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(AIMDLimit(self.initial_host, 1, self.max_host), 100)
+            if len(self._hosts) > self.max_hosts:
+                for name, old in list(self._hosts.items())[:len(self._hosts) - self.max_hosts]:
+                    if old.limit.in_flight == 0:
+                        del self._hosts[name]
+        else:
+            self._hosts.move_to_end(host)
+        return state
+
+    def _timeout_for(self, state: _HostState) -> float:
+        window = state.latency if len(state.latency) >= 20 else self._latency
+        if len(window) < 20:
+            return self.default_timeout
+        return max(self.min_timeout, min(self.max_timeout, window.percentile(0.99) * self.timeout_factor))
+
+    @property
+    def worker_limit(self) -> int:
+        """How many domains may be crawled at once right now"""
+        return int(self.global_limit.limit)
+
+    def host_limit(self, host: str) -> int:
+        with self._cond:
+            return int(self._host(host).limit.limit)
+
+    def acquire(self, host: str) -> RequestSlot:
+        """Block until both the host and the global limit have room"""
+        with self._cond:
+            state = self._host(host)
+            while not (state.limit.has_room and self.global_limit.has_room):
+                self._cond.wait(timeout=1.0)
+            state.limit.in_flight += 1
+            self.global_limit.in_flight += 1
+            return RequestSlot(host, self._timeout_for(state))
+
+    def release(self, slot: RequestSlot, latency: Optional[float]):
+        """Feed back the outcome of a request and free its slot"""
+        now = time.monotonic()
+        with self._cond:
+            state = self._host(slot.host)
+            state.limit.in_flight -= 1
+            self.global_limit.in_flight -= 1
+            state.requests += 1
+
+            if slot.overloaded:
+                state.overloads += 1
+                self.overloads += 1
+                state.limit.decrease(now)
+                self._record_outcome(slot.host, True, now)
+            elif latency is not None and slot.status is not None:
+                median = state.latency.percentile(0.5)
+                state.latency.add(latency)
+                self._latency.add(latency)
+                healthy = median is None or latency <= median * self.latency_tolerance
+                if healthy:
+                    state.limit.increase()
+                self._record_outcome(slot.host, not healthy, now)
+            # Other failures (DNS, refused connection, bad TLS) say nothing about load
+
+            self._cond.notify_all()
+
+    def _congested(self) -> bool:
+        """Whether recent requests across hosts show congestion (not just one bad host)"""
+        if len(self._outcomes) < self._outcomes.maxlen // 2:
+            return False
+        congested = [host for host, bad in self._outcomes if bad]
+        return (len(congested) >= self.congestion_threshold * len(self._outcomes)
+                and len(set(congested)) >= self.congested_hosts)
+
+    def _record_outcome(self, host: str, congested: bool, now: float):
+        """Feed the global limit from the aggregate signal (caller holds the lock)"""
+        self._outcomes.append((host, congested))
+        if self._congested():
+            self.global_limit.decrease(now)
+        elif not congested:
+            self.global_limit.increase()
+
+    @contextmanager
+    def request(self, host: str):
+        """Admit one request to `host`; set `status` / `timed_out` on the yielded slot"""
+        slot = self.acquire(host)
+        started = time.monotonic()
+        try:
+            yield slot
+        finally:
+            latency = time.monotonic() - started if slot.status is not None else None
+            self.release(slot, latency)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'global_limit': round(self.global_limit.limit, 2),
+                'in_flight': self.global_limit.in_flight,
+                'hosts': len(self._hosts),
+                'overloads': self.overloads,
+                'congested': sum(1 for _, bad in self._outcomes if bad),
+                'p50': self._latency.percentile(0.5),
+                'p99': self._latency.percentile(0.99),
+            }
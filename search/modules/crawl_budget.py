@@ -0,0 +1,133 @@
+"""
+Crawl Budget Allocator
+======================
+
+Instead of a fixed `max_pages_per_domain` for every domain, each claimed domain
+gets a page/depth/time budget from:
+
+    - its current rank (log-scaled, relative to the ranks seen so far)
+    - the observed outlink yield (new external domains per page) of domains
+      in the same rank band, relative to the global yield
+    - a global pages-per-hour target: budgets shrink when the crawler runs
+      ahead of the target and grow when it runs behind
+
+While a domain is being crawled, `keep_crawling()` cuts it short once the
+time budget is spent or the last few pages brought no new external domains,
+so capacity flows to domains that actually produce new links.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+# Smoothing factor for the running averages
+EWMA_ALPHA = 0.1
+
+
+class CrawlBudget(NamedTuple):
+    """Limits for crawling a single domain"""
+    max_pages: int
+    max_depth: int
+    max_seconds: float
+
+
+def _ewma(current, value, alpha=EWMA_ALPHA):
+    return value if current is None else current + alpha * (value - current)
+
+
+class CrawlBudgetAllocator:
+    """Thread-safe allocator shared by all crawler workers"""
+
+    def __init__(self, base_pages: int = 20, min_pages: int = 3, max_pages: int = 200,
+                 max_depth: int = 3, pages_per_hour: int = 0, seconds_per_page: float = 1.0,
+                 probe_pages: int = 5):
+        """
+        Args:
+            base_pages: Budget of an average domain at average yield
+            min_pages: Floor (every claimed domain gets at least this)
+            max_pages: Ceiling for top-ranked, high-yield domains
+            max_depth: Deepest BFS level any domain may reach
+            pages_per_hour: Global target across all workers (0 = no target)
+            seconds_per_page: Initial guess of fetch time per page, refined from observations
+            probe_pages: Stop a domain after this many consecutive pages without a new external domain
+        """
+        self.base_pages = base_pages
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.pages_per_hour = pages_per_hour
+        self.probe_pages = probe_pages
+
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._seconds_per_page = seconds_per_page
+        self._rank_weight = None        # Running mean of log-rank weights of claimed domains
+        self._global_yield = None       # New external domains per page, all domains
+        self._band_yield = {}           # Same, per log2(rank) band
+        self._pages_log = deque()       # (timestamp, pages) of finished domains in the last hour
+        self._pages_last_hour = 0
+
+    @staticmethod
+    def _band(rank: int) -> int:
+        return int(math.log2(1 + max(rank, 0)))
+
+    def _pace(self, now: float) -> float:
+        """>1 when behind the pages-per-hour target, <1 when ahead"""
+        if not self.pages_per_hour:
+            return 1.0
+        elapsed = min(now - self._started, 3600.0)
+        if elapsed < 60 or not self._pages_last_hour:
+            return 1.0
+        observed_per_hour = self._pages_last_hour * 3600.0 / elapsed
+        return max(0.25, min(2.0, self.pages_per_hour / observed_per_hour))
+
+    def allocate(self, rank: int) -> CrawlBudget:
+        """Budget for a domain with the given current rank"""
+        weight = 1.0 + math.log2(1 + max(rank or 0, 0))
+        with self._lock:
+            self._rank_weight = _ewma(self._rank_weight, weight)
+            rank_share = weight / self._rank_weight
+
+            yield_factor = 1.0
+            band_yield = self._band_yield.get(self._band(rank or 0))
+            if band_yield is not None and self._global_yield:
+                yield_factor = max(0.25, min(4.0, band_yield / self._global_yield))
+
+            pace = self._pace(time.monotonic())
+            seconds_per_page = self._seconds_per_page
+
+        pages = round(self.base_pages * rank_share * yield_factor * pace)
+        pages = max(self.min_pages, min(self.max_pages, pages))
+        # Small budgets are spent near the root; only generous ones go the full depth
+        depth = self.max_depth if pages >= self.base_pages / 2 else max(1, self.max_depth - 1)
+        return CrawlBudget(max_pages=pages, max_depth=depth, max_seconds=pages * seconds_per_page * 2 + 10)
+
+    def keep_crawling(self, budget: CrawlBudget, pages_crawled: int, pages_since_new_domain: int, started: float) -> bool:
+        """Whether a domain crawl may fetch another page"""
+        if pages_crawled >= budget.max_pages:
+            return False
+        if time.monotonic() - started >= budget.max_seconds:
+            return False
+        # Marginal yield dried up - the remaining pages are unlikely to add links
+        if pages_crawled >= self.probe_pages and pages_since_new_domain >= self.probe_pages:
+            return False
+        return True
+
+    def record(self, rank: int, pages: int, new_domains: int, seconds: float):
+        """Feed back what a finished domain crawl actually produced"""
+        if pages <= 0:
+            return
+        now = time.monotonic()
+        page_yield = new_domains / pages
+        band = self._band(rank or 0)
+        with self._lock:
+            self._global_yield = _ewma(self._global_yield, page_yield)
+            self._band_yield[band] = _ewma(self._band_yield.get(band), page_yield)
+            self._seconds_per_page = _ewma(self._seconds_per_page, seconds / pages)
+
+            self._pages_log.append((now, pages))
+            self._pages_last_hour += pages
+            while self._pages_log and now - self._pages_log[0][0] > 3600:
+                self._pages_last_hour -= self._pages_log.popleft()[1]
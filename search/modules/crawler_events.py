@@ -0,0 +1,180 @@
+"""
+Crawler Event Channel
+=====================
+
+The crawler process publishes what it is doing (domain claimed, domain finished,
+rank deltas) into the CrawlerEvent table in search_db. Web workers stream those
+events to dashboards over Server-Sent Events.
+
+Publishing side (crawler, sync):
+    publish(kind, domain, **payload) / publish_many([...])
+
+Streaming side (ASGI, async):
+    One EventBroadcaster per process tails the log with a single primary-key
+    range probe (`id > last_id`) and fans new rows out to every connected
+    dashboard, so the DB cost is constant no matter how many dashboards are open.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from search.models import CrawlerEvent
+
+logger = logging.getLogger(__name__)
+
+# Number of events kept in the log (older rows are pruned as new ones arrive)
+EVENT_RETENTION = 10000
+PRUNE_EVERY = 500
+# Streams end after this long, so no connection is held indefinitely
+STREAM_LIFETIME = 300
+
+
+def publish(kind: str, domain: str = '', **payload):
+    """Append a single event to the log"""
+    publish_many([(kind, domain, payload)])
+
+
+def publish_many(events: Iterable[Tuple[str, str, Dict]]):
+    """Append several events in one INSERT"""
+    rows = [CrawlerEvent(kind=kind, domain=domain or '', payload=payload or {}) for kind, domain, payload in events]
+    if not rows:
+        return
+    try:
+        # Savepoint: callers publish inside their own transaction, which must survive a failed insert
+        with transaction.atomic(using='search_db'):
+            created = CrawlerEvent.objects.using('search_db').bulk_create(rows)
+            last_id = created[-1].pk
+            if last_id and last_id // PRUNE_EVERY != (last_id - len(created)) // PRUNE_EVERY:
+                prune_events()
+    except Exception as e:
+        # Events are best-effort - never let the dashboard channel break the crawl
+        logger.warning(f"⚠️ Failed to publish crawler events: {e}")
+
+
+def prune_events(keep: int = EVENT_RETENTION):
+    """Drop everything but the newest `keep` events"""
+    newest = CrawlerEvent.objects.using('search_db').order_by('-id').values_list('id', flat=True).first()
+    if newest:
+        CrawlerEvent.objects.using('search_db').filter(id__lte=newest - keep).delete()
+
+
+def latest_event_id() -> int:
+    return CrawlerEvent.objects.using('search_db').order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_since(last_id: int, limit: int = 500) -> List[dict]:
+    """Events with id > last_id in publish order (primary-key range scan)"""
+    return list(CrawlerEvent.objects.using('search_db').filter(id__gt=last_id).order_by('id').values(
+        'id', 'kind', 'domain', 'payload', 'created_at'
+    )[:limit])
+
+
+def format_sse(event: dict) -> str:
+    """Render an event as an SSE frame"""
+    data = json.dumps({
+        'domain': event['domain'],
+        'created_at': event['created_at'],
+        **event['payload'],
+    }, cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+class EventBroadcaster:
+    """Single tail of the event log per process, fanned out to subscriber queues"""
+
+    def __init__(self, poll_interval: float = 0.5, queue_size: int = 1000):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._last_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def _run(self):
+        if self._last_id is None:
+            self._last_id = await sync_to_async(latest_event_id)()
+
+        while self._subscribers:
+            try:
+                events = await sync_to_async(events_since)(self._last_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Event tail failed: {e}")
+                events = []
+
+            for event in events:
+                self._last_id = event['id']
+                for queue in list(self._subscribers):
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        # Slow client - drop it, EventSource reconnects with Last-Event-ID
+                        self._subscribers.discard(queue)
+                        queue.get_nowait()
+                        queue.put_nowait(None)
+
+            if not events:
+                await asyncio.sleep(self.poll_interval)
+
+
+_broadcasters: Dict[int, EventBroadcaster] = {}
+
+
+def get_broadcaster() -> EventBroadcaster:
+    """Broadcaster bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(id(loop))
+    if broadcaster is None:
+        broadcaster = _broadcasters[id(loop)] = EventBroadcaster()
+    return broadcaster
+
+
+async def stream_events(last_id: Optional[int] = None, heartbeat: float = 15.0, lifetime: float = STREAM_LIFETIME):
+    """
+    Async generator of SSE frames for one dashboard connection
+
+    Args:
+        last_id: Resume point from the client's Last-Event-ID (missed events are replayed)
+        heartbeat: Seconds between keep-alive comments
+        lifetime: Seconds before the stream ends (EventSource reconnects with Last-Event-ID)
+    """
+    yield "retry: 3000\n\n"
+
+    deadline = asyncio.get_running_loop().time() + lifetime
+
+    broadcaster = get_broadcaster()
+    queue = await broadcaster.subscribe()
+    try:
+        if last_id is not None:
+            for event in await sync_to_async(events_since)(last_id):
+                yield format_sse(event)
+                last_id = event['id']
+
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, max(deadline - loop.time(), 0)))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            if last_id is not None and event['id'] <= last_id:
+                continue
+            yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(queue)
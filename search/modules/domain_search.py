@@ -0,0 +1,135 @@
+"""
+Substring Domain Search
+=======================
+
+`domain__icontains` is a `LIKE '%x%'` full scan over DomainRank. This module
+keeps an SQLite FTS5 table with the `trigram` tokenizer next to DomainRank in
+search_db, so any substring of 3+ characters is answered from the trigram
+index instead.
+
+The FTS table is an external-content index over search_domainrank (it stores
+no copy of the domains) and is kept in sync by SQLite triggers, so crawler
+inserts and bulk imports stay indexed without any Python-side bookkeeping.
+The table and triggers are created by `migrate` (post_migrate, see apps.py),
+never by a search. Shorter queries, SQLite builds without FTS5 trigram, and
+bulk imports running with the triggers dropped fall back to icontains.
+"""
+
+import logging
+
+from django.db import connections, router, transaction, OperationalError
+from django.db.models.expressions import RawSQL
+
+from search.models import DomainRank
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_TABLE = 'search_domainrank_trigram'
+MIN_QUERY_LENGTH = 3  # Trigram index can't answer shorter substrings
+
+
+def _domain_table():
+    return DomainRank._meta.db_table
+
+
+def create_trigram_index(using: str = 'search_db') -> bool:
+    """
+    Create the trigram table and its sync triggers if missing (backfilling once)
+
+    Returns:
+        True if the index is usable on this database
+    """
+    table = _domain_table()
+    if table not in connections[using].introspection.table_names():
+        return False  # migrate without --run-syncdb leaves the unmigrated apps' tables out
+    try:
+        # All or nothing: a table without its triggers would go stale
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TRIGRAM_TABLE])
+            exists = cursor.fetchone() is not None
+
+            if not exists:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5("
+                    f"domain, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}(rowid, domain) VALUES (new.id, new.domain); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, domain) VALUES ('delete', old.id, old.domain); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_au AFTER UPDATE OF domain ON {table} BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, domain) VALUES ('delete', old.id, old.domain); "
+                f"INSERT INTO {TRIGRAM_TABLE}(rowid, domain) VALUES (new.id, new.domain); END"
+            )
+            if not exists:
+                # Index everything written before the triggers existed
+                cursor.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')")
+                logger.info(f"🔤 Built trigram index for {table}")
+    except OperationalError as e:
+        logger.warning(f"⚠️ Trigram index unavailable, falling back to LIKE scans: {e}")
+        return False
+    return True
+
+
+def create_index_after_migrate(sender, using: str, **kwargs):
+    """post_migrate receiver: the index exists from deploy time, so every write path is indexed"""
+    if router.allow_migrate_model(using, DomainRank):
+        create_trigram_index(using)
+
+
+def trigram_index_ready(using: str = 'search_db') -> bool:
+    """
+    Whether the index exists and is being kept in sync (its insert trigger is
+    dropped during bulk imports). Looked up in SQLite's in-memory schema on
+    every call, so it can't go stale when another process changes it.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name IN (%s, %s)", [TRIGRAM_TABLE, f'{TRIGRAM_TABLE}_ai']
+        )
+        return cursor.fetchone()[0] == 2
+
+
+def rebuild_trigram_index(using: str = 'search_db'):
+    """Re-index every domain from scratch (repairs drift after manual table edits, restores dropped triggers)"""
+    if create_trigram_index(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')")
+
+
+def drop_trigram_triggers(using: str = 'search_db'):
+    """Stop indexing row by row (bulk imports) - call rebuild_trigram_index() afterwards"""
+    with connections[using].cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {TRIGRAM_TABLE}_{suffix}")
+
+
+def _match_expression(query: str) -> str:
+    """Quote the query as a single FTS5 phrase (trigram phrases match substrings)"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def filter_domains(queryset, query: str):
+    """Restrict a DomainRank queryset to domains containing `query` (case-insensitive)"""
+    query = query.strip().lower()
+    if not query:
+        return queryset
+
+    using = queryset.db
+    if len(query) >= MIN_QUERY_LENGTH and trigram_index_ready(using):
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH %s",
+            [_match_expression(query)],
+        ))
+    return queryset.filter(domain__icontains=query)
+
+
+def search_domains(query: str, limit: int = 20, using: str = 'search_db'):
+    """Domains containing `query`, best ranked first"""
+    domains = filter_domains(DomainRank.objects.using(using).all(), query)
+    return domains.order_by('-rank', 'domain')[:limit]
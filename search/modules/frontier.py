@@ -0,0 +1,172 @@
+"""
+Domain Frontier
+===============
+
+In-memory indexed priority queue of pending (unprocessed) domains, ordered
+like `filter(processed=False).order_by('-rank', 'domain')` but without running
+that query on every claim.
+
+    - loaded once from search_db (one streaming scan)
+    - claims pop the best domain in O(log n)
+    - rank increments committed by the writer move a domain up in place
+      (decrease-key on the (-rank, domain) key, O(log n) via a position map)
+    - periodically reconciled with the database to pick up domains added by
+      other processes (seed imports, manual edits)
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from search.models import DomainRank
+
+logger = logging.getLogger(__name__)
+
+
+class DomainFrontier:
+    """Thread-safe binary heap of (domain, rank) with a domain -> position index"""
+
+    def __init__(self, reconcile_interval: float = 600.0, using: str = 'search_db'):
+        """
+        Args:
+            reconcile_interval: Seconds between full reloads from the database
+            using: Database alias holding DomainRank
+        """
+        self.reconcile_interval = reconcile_interval
+        self.using = using
+        self._heap: List[str] = []
+        self._rank: Dict[str, int] = {}
+        self._pos: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+
+    # --- heap internals -------------------------------------------------
+
+    def _key(self, domain: str) -> Tuple[int, str]:
+        return -self._rank[domain], domain
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i]] = i
+        self._pos[heap[j]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._key(self._heap[i]) >= self._key(self._heap[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        size = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self._key(self._heap[child]) < self._key(self._heap[smallest]):
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def _remove_at(self, i: int) -> str:
+        last = len(self._heap) - 1
+        if i != last:
+            self._swap(i, last)
+        domain = self._heap.pop()
+        del self._pos[domain]
+        del self._rank[domain]
+        if i < len(self._heap):
+            self._sift_down(i)
+            self._sift_up(i)
+        return domain
+
+    def _rebuild(self, entries: Iterable[Tuple[str, int]]):
+        self._rank = dict(entries)
+        self._heap = sorted(self._rank, key=self._key)  # A sorted list is a valid heap
+        self._pos = {domain: i for i, domain in enumerate(self._heap)}
+
+    # --- public API -----------------------------------------------------
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, domain: str):
+        return domain in self._pos
+
+    def rank_of(self, domain: str) -> Optional[int]:
+        return self._rank.get(domain)
+
+    def push(self, domain: str, rank: int):
+        """Add a pending domain, or move it if already queued"""
+        with self._lock:
+            if domain in self._pos:
+                self.update(domain, rank)
+                return
+            self._rank[domain] = rank
+            self._heap.append(domain)
+            self._pos[domain] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+
+    def update(self, domain: str, rank: int):
+        """Change a queued domain's rank in place (no-op if it isn't queued)"""
+        with self._lock:
+            i = self._pos.get(domain)
+            if i is None:
+                return
+            old_rank = self._rank[domain]
+            self._rank[domain] = rank
+            if rank > old_rank:
+                self._sift_up(i)
+            elif rank < old_rank:
+                self._sift_down(i)
+
+    def discard(self, domain: str):
+        with self._lock:
+            i = self._pos.get(domain)
+            if i is not None:
+                self._remove_at(i)
+
+    def pop_many(self, count: int) -> List[Tuple[str, int]]:
+        """Claim up to `count` best-ranked domains as (domain, rank)"""
+        with self._lock:
+            claimed = []
+            while self._heap and len(claimed) < count:
+                rank = self._rank[self._heap[0]]
+                claimed.append((self._remove_at(0), rank))
+            return claimed
+
+    def load(self, exclude: Iterable[str] = ()):
+        """(Re)build the queue from every unprocessed domain in the database"""
+        exclude = set(exclude)
+        started = time.monotonic()
+        rows = DomainRank.objects.using(self.using).filter(processed=False).values_list('domain', 'rank').iterator(chunk_size=10000)
+        entries = [(domain, rank) for domain, rank in rows if domain not in exclude]
+        with self._lock:
+            self._rebuild(entries)
+            self._loaded_at = time.monotonic()
+        logger.info(f"🧭 Frontier loaded: {len(entries)} pending domains in {time.monotonic() - started:.2f}s")
+
+    def reconcile_if_due(self, exclude: Iterable[str] = ()):
+        """Load on first use, then reload every `reconcile_interval` seconds"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reconcile_interval:
+            self.load(exclude)
+
+    def invalidate(self):
+        """Force a reload from the database on the next claim"""
+        self._loaded_at = None
+
+    def apply_commit(self, summary: Dict):
+        """Mirror a committed writer batch: rank increments move domains up, new domains join"""
+        with self._lock:
+            for domain in summary['sources']:
+                self.discard(domain)
+            created = summary.get('created', set())
+            for domain, rank in summary['rank_changes'].items():
+                if domain in self._pos:
+                    self.update(domain, rank)
+                elif domain in created:
+                    self.push(domain, rank)
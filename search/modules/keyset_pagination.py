@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination for DomainRank listings
+==================================================
+
+Django's Paginator needs a COUNT(*) and an OFFSET scan, so deep pages get
+slower as the domain table grows. Here every page is a single index range
+scan on (rank DESC, processed, domain) starting right after (or before) the
+row encoded in an opaque cursor, so page 1 and page 10,000 cost the same.
+
+The ordering matches DomainRank.Meta.ordering and is total because
+`domain` is unique.
+"""
+
+import base64
+import json
+from typing import List, Optional
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(domain_obj) -> str:
+    """Encode the sort key of a row into an opaque URL-safe cursor"""
+    payload = json.dumps([domain_obj.rank, domain_obj.processed, domain_obj.domain], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[tuple]:
+    """Decode a cursor back into (rank, processed, domain), None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, processed, domain = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(rank), bool(processed), str(domain)
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(key: tuple) -> Q:
+    """Rows that sort strictly after `key` in (-rank, processed, domain) order"""
+    rank, processed, domain = key
+    return (
+        Q(rank__lt=rank)
+        | Q(rank=rank, processed__gt=processed)
+        | Q(rank=rank, processed=processed, domain__gt=domain)
+    )
+
+
+def _before(key: tuple) -> Q:
+    """Rows that sort strictly before `key` in (-rank, processed, domain) order"""
+    rank, processed, domain = key
+    return (
+        Q(rank__gt=rank)
+        | Q(rank=rank, processed__lt=processed)
+        | Q(rank=rank, processed=processed, domain__lt=domain)
+    )
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, object_list: List, has_next: bool, has_previous: bool, total: Optional[int] = None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.total = total
+        self.next_cursor = encode_cursor(object_list[-1]) if object_list and has_next else None
+        self.previous_cursor = encode_cursor(object_list[0]) if object_list and has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def paginate_domains(queryset, after: str = None, before: str = None,
+                     page_size: int = PAGE_SIZE, total: Optional[int] = None) -> KeysetPage:
+    """
+    Fetch one page of `queryset` (already filtered) in dashboard order
+
+    Args:
+        queryset: Filtered DomainRank queryset
+        after: Cursor of the last row of the previous page (next page)
+        before: Cursor of the first row of the following page (previous page)
+        page_size: Rows per page
+        total: Precomputed total to show alongside the page (never counted here)
+
+    Returns:
+        KeysetPage with rows and the cursors for its neighbours
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key:
+        # Walk backwards from the cursor, then restore display order
+        rows = list(queryset.filter(_before(before_key)).order_by('rank', '-processed', '-domain')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_previous=has_previous, total=total)
+
+    if after_key:
+        queryset = queryset.filter(_after(after_key))
+    rows = list(queryset.order_by('-rank', 'processed', 'domain')[:page_size + 1])
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], has_next=has_next, has_previous=after_key is not None, total=total)
@@ -0,0 +1,135 @@
+"""
+Rank History
+============
+
+Periodic snapshots of every domain's rank, stored compactly:
+
+    - a snapshot creates a RankEpoch and writes a RankChange row only for
+      domains whose rank moved since the previous snapshot
+      (DomainRank.snapshot_rank remembers the last recorded value), so an
+      idle domain costs nothing per epoch
+    - a domain's rank at epoch E is its latest change at or before E, found
+      through the (domain, epoch) index
+    - top movers between two epochs only read the changes inside that window
+    - retention keeps every epoch for `keep_days`, one epoch per day up to
+      `max_days`, and drops the rest; changes of a dropped epoch are folded
+      into the next kept epoch, so ranks at kept epochs stay exact
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from search.models import DomainRank, RankEpoch, RankChange
+
+logger = logging.getLogger(__name__)
+
+
+def take_snapshot(using: str = 'search_db') -> RankEpoch:
+    """Record the current rank of every domain that changed since the last snapshot"""
+    domain_table = DomainRank._meta.db_table
+    change_table = RankChange._meta.db_table
+    with transaction.atomic(using=using):
+        epoch = RankEpoch.objects.using(using).create()
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {change_table} (epoch_id, domain_id, rank) "
+                f"SELECT %s, id, rank FROM {domain_table} WHERE rank <> snapshot_rank",
+                [epoch.pk],
+            )
+            changed = cursor.rowcount
+            cursor.execute(f"UPDATE {domain_table} SET snapshot_rank = rank WHERE rank <> snapshot_rank")
+        epoch.changed_count = changed
+        epoch.save(using=using, update_fields=['changed_count'])
+    logger.info(f"📸 Rank snapshot #{epoch.pk}: {changed} domains changed")
+    return epoch
+
+
+def domain_series(domain: str, using: str = 'search_db') -> List[Dict]:
+    """Every recorded rank change of one domain, oldest first"""
+    return [
+        {'epoch': epoch_id, 'at': created_at, 'rank': rank}
+        for epoch_id, created_at, rank in RankChange.objects.using(using).filter(
+            domain__domain=domain
+        ).order_by('epoch_id').values_list('epoch_id', 'epoch__created_at', 'rank')
+    ]
+
+
+def _rank_at(epoch_id: int, using: str):
+    return Subquery(
+        RankChange.objects.using(using).filter(
+            domain=OuterRef('pk'), epoch_id__lte=epoch_id
+        ).order_by('-epoch_id').values('rank')[:1]
+    )
+
+
+def top_movers(from_epoch: int, to_epoch: int, limit: int = 20, using: str = 'search_db'):
+    """
+    Domains with the largest rank gain between two epochs
+
+    Only domains with a change inside (from_epoch, to_epoch] are considered,
+    so the cost follows the size of that window, not of the whole history.
+    """
+    changed = RankChange.objects.using(using).filter(epoch_id__gt=from_epoch, epoch_id__lte=to_epoch).values('domain_id')
+    return DomainRank.objects.using(using).filter(pk__in=changed).annotate(
+        rank_from=Coalesce(_rank_at(from_epoch, using), Value(0)),
+        rank_to=Coalesce(_rank_at(to_epoch, using), Value(0)),
+    ).annotate(gain=F('rank_to') - F('rank_from')).order_by('-gain', 'domain')[:limit]
+
+
+def _fold_epoch(epoch_id: int, into_epoch_id: int, using: str):
+    """Move a dropped epoch's changes to the next kept epoch unless it already has a newer value"""
+    table = RankChange._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET epoch_id = %s WHERE epoch_id = %s AND domain_id NOT IN "
+            f"(SELECT domain_id FROM {table} WHERE epoch_id = %s)",
+            [into_epoch_id, epoch_id, into_epoch_id],
+        )
+    RankEpoch.objects.using(using).filter(pk=epoch_id).delete()  # Cascades the superseded rows
+
+
+def compact_history(keep_days: int = 30, max_days: int = 365, using: str = 'search_db') -> int:
+    """
+    Apply the retention policy
+
+    Returns:
+        Number of epochs dropped
+    """
+    now = timezone.now()
+    full_resolution_since = now - timedelta(days=keep_days)
+    retained_since = now - timedelta(days=max_days)
+
+    epochs = list(RankEpoch.objects.using(using).order_by('id').values_list('id', 'created_at'))
+    if not epochs:
+        return 0
+
+    keep = set()
+    last_per_day = {}
+    for epoch_id, created_at in epochs:
+        if created_at >= full_resolution_since:
+            keep.add(epoch_id)
+        elif created_at >= retained_since:
+            last_per_day[created_at.date()] = epoch_id  # Ordered by id, so the last one of the day wins
+    keep.update(last_per_day.values())
+    keep.add(epochs[-1][0])  # Never drop the newest epoch
+
+    dropped = 0
+    next_kept: Optional[int] = None
+    # Newest first, so a later change always wins over an earlier one folded into the same epoch
+    with transaction.atomic(using=using):
+        for epoch_id, _ in reversed(epochs):
+            if epoch_id in keep:
+                next_kept = epoch_id
+                continue
+            _fold_epoch(epoch_id, next_kept, using)
+            dropped += 1
+
+    if dropped:
+        logger.info(f"🧹 Rank history compacted: {dropped} epochs dropped, {len(keep)} kept")
+    return dropped
@@ -0,0 +1,331 @@
+"""
+Single-Writer Result Pipeline
+=============================
+
+Fetch workers hand `(source_domain, external_domains)` results to one writer
+thread through a bounded queue instead of each opening its own transaction
+under `db_lock`. The writer coalesces results into group commits (up to
+`max_batch` results or `max_wait` seconds, whichever comes first) and applies
+each batch set-wise:
+
+    - one SELECT to see which domains already exist
+    - one bulk INSERT for new domains
+    - one UPDATE rank = rank + n per distinct increment n
+    - one UPDATE marking the sources processed
+    - one bulk INSERT of the batch's link graph edges (DomainLink)
+
+When the writer falls behind, the queue fills and `submit()` blocks, which
+slows the fetchers down (back-pressure) instead of growing memory.
+
+A failed group commit is retried result by result, so one bad result can't
+hold back the rest of its batch. A source whose result keeps failing is
+marked processed after `max_attempts` tries instead of being re-crawled
+forever.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from search.models import DomainRank, DomainLink, CrawlerStats, CrawlerEvent
+from search.modules.crawler_events import publish_many
+
+logger = logging.getLogger(__name__)
+
+# Stay well below SQLite's bound-variable limit in IN (...) clauses
+SQL_CHUNK = 500
+
+CrawlResult = Tuple[str, Set[str]]
+
+
+def _chunks(items: List, size: int = SQL_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _insert_domains(domains: List[str], using: str) -> int:
+    """Insert pending rows for the domains, returns how many were inserted (another writer may have won some)"""
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for chunk in _chunks(domains):
+            # One INSERT OR IGNORE per chunk; changes() counts its inserted rows, not the ignored ones or trigger writes
+            DomainRank.objects.using(using).bulk_create(
+                [DomainRank(domain=domain, rank=0) for domain in chunk], ignore_conflicts=True, batch_size=SQL_CHUNK,
+            )
+            cursor.execute("SELECT changes()")
+            inserted += cursor.fetchone()[0]
+    return inserted
+
+
+def merge_summaries(summaries: List[Dict]) -> Dict:
+    """One apply_crawl_results summary for several committed batches"""
+    merged = {'sources': set(), 'new_domains': 0, 'newly_processed': 0, 'rank_changes': {}, 'created': set()}
+    for summary in summaries:
+        merged['sources'] |= summary['sources']
+        merged['new_domains'] += summary['new_domains']
+        merged['newly_processed'] += summary['newly_processed']
+        merged['rank_changes'].update(summary['rank_changes'])
+        merged['created'] |= summary['created']
+    merged['created'] -= merged['sources']
+    return merged
+
+
+def give_up_source(source: str, using: str = 'search_db'):
+    """Mark a source whose results can't be written as processed (no links recorded)"""
+    with transaction.atomic(using=using):
+        domain, created = DomainRank.objects.using(using).get_or_create(
+            domain=source, defaults={'rank': 0, 'processed': True}
+        )
+        if created:
+            CrawlerStats.increment(total=1, processed=1, using=using)
+        elif not domain.processed:
+            DomainRank.objects.using(using).filter(pk=domain.pk).update(processed=True, updated_at=timezone.now())
+            CrawlerStats.increment(processed=1, using=using)
+
+
+def apply_crawl_results(results: Iterable[CrawlResult], using: str = 'search_db') -> Dict:
+    """
+    Apply a batch of crawl results in a single transaction
+
+    Each external domain gets +1 rank per SOURCE domain linking to it (same rule as
+    before, just counted for the whole batch at once), and every source is marked processed.
+
+    Returns:
+        Summary dict: sources, new_domains, newly_processed, rank_changes {domain: new rank},
+        created (set of domains inserted as pending)
+    """
+    results = list(results)
+    sources = {source for source, _ in results}
+    increments = Counter()
+    for source, external_domains in results:
+        for external_domain in external_domains:
+            if external_domain and external_domain != source:
+                increments[external_domain] += 1
+
+    all_domains = list(sources | set(increments))
+    now = timezone.now()
+
+    with transaction.atomic(using=using):
+        existing = {}
+        for chunk in _chunks(all_domains):
+            existing.update(DomainRank.objects.using(using).filter(domain__in=chunk).values_list('domain', 'processed'))
+
+        # New domains - counted as actually inserted, so rows a concurrent writer added aren't counted twice
+        new_domains = [domain for domain in all_domains if domain not in existing]
+        inserted = _insert_domains(new_domains, using)
+
+        # Group domains by increment so each distinct delta is one UPDATE
+        by_delta = defaultdict(list)
+        for domain, delta in increments.items():
+            by_delta[delta].append(domain)
+        for delta, domains in by_delta.items():
+            for chunk in _chunks(domains):
+                DomainRank.objects.using(using).filter(domain__in=chunk).update(rank=F('rank') + delta, updated_at=now)
+
+        # Mark sources processed (new ones included); the row count is exactly the newly processed ones
+        newly_processed = 0
+        for chunk in _chunks(list(sources)):
+            newly_processed += DomainRank.objects.using(using).filter(domain__in=chunk, processed=False).update(
+                processed=True, updated_at=now
+            )
+        CrawlerStats.increment(total=inserted, processed=newly_processed, using=using)
+
+        rank_changes = {}
+        source_ranks = {}
+        ids = {}
+        for chunk in _chunks(all_domains):
+            for pk, domain, rank in DomainRank.objects.using(using).filter(domain__in=chunk).values_list('pk', 'domain', 'rank'):
+                ids[domain] = pk
+                if domain in increments:
+                    rank_changes[domain] = rank
+                if domain in sources:
+                    source_ranks[domain] = rank
+        
+        # Keep the link graph for offline jobs (personalized PageRank fingerprints)
+        DomainLink.objects.using(using).bulk_create(
+            [
+                DomainLink(source_id=ids[source], target_id=ids[external_domain])
+                for source, external_domains in results
+                for external_domain in external_domains
+                if external_domain and external_domain != source
+            ],
+            ignore_conflicts=True,
+            batch_size=SQL_CHUNK,
+        )
+
+        # Tell live dashboards (same transaction, so events never run ahead of the data)
+        stats = CrawlerStats.load(using=using)
+        new_domain_set = set(new_domains)
+        events = [(CrawlerEvent.RANKS, '', {'ranks': rank_changes})] if rank_changes else []
+        for source, external_domains in results:
+            events.append((CrawlerEvent.FINISHED, source, {
+                'rank': source_ranks.get(source, 0),
+                'external_domains': len(external_domains),
+                'new_domains': len(new_domain_set.intersection(external_domains)),
+                'stats': {
+                    'total_domains': stats.total_domains,
+                    'processed_count': stats.processed_count,
+                    'pending_count': stats.pending_count,
+                },
+            }))
+        publish_many(events)
+
+    return {
+        'sources': sources,
+        'new_domains': len(new_domains),
+        'newly_processed': newly_processed,
+        'rank_changes': rank_changes,
+        'created': new_domain_set - sources,
+    }
+
+
+class BatchedResultWriter:
+    """
+    Dedicated writer thread consuming crawl results from a bounded queue
+
+    Usage:
+        writer = BatchedResultWriter(on_commit=callback)
+        writer.start()
+        writer.submit(domain, external_domains)   # blocks when the queue is full
+        writer.close()                            # flushes what is queued
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_batch: int = 50, max_wait: float = 2.0, queue_size: int = 200,
+                 on_commit: Optional[Callable[[List[CrawlResult], Optional[Dict]], None]] = None,
+                 using: str = 'search_db', max_attempts: int = 3):
+        """
+        Args:
+            max_batch: Results per group commit
+            max_wait: Seconds to wait for a batch to fill before committing what's there
+            queue_size: Results buffered before submit() blocks (back-pressure)
+            on_commit: Called with (batch, summary) after each commit - summary is None if it failed
+            using: Database alias to write to
+            max_attempts: Failed writes of a source's result before it is marked processed without it
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_commit = on_commit
+        self.using = using
+        self.max_attempts = max_attempts
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.commits = 0
+        self.results_written = 0
+        self.abandoned = 0
+        self._failures = Counter()  # Failed writes per source
+        self._thread = threading.Thread(target=self._run, name='crawl-result-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, source_domain: str, external_domains: Set[str]):
+        """Queue one result, blocking while the writer is behind"""
+        if self.queue.full():
+            logger.info("⏳ Result writer is behind - fetcher waiting (back-pressure)")
+        self.queue.put((source_domain, external_domains))
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything queued so far and stop the writer thread"""
+        self.queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    @property
+    def backlog(self) -> int:
+        return self.queue.qsize()
+
+    def _next_batch(self) -> Tuple[List[CrawlResult], bool]:
+        item = self.queue.get()
+        if item is self._STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._commit(batch)
+        finally:
+            connections[self.using].close()
+
+    def _commit(self, batch: List[CrawlResult]):
+        start = time.monotonic()
+        try:
+            summary = apply_crawl_results(batch, using=self.using)
+        except Exception as e:
+            logger.error(f"❌ Group commit of {len(batch)} results failed, retrying one by one: {e}")
+            self._commit_one_by_one(batch)
+            return
+
+        self.commits += 1
+        self.results_written += len(batch)
+        for source, _ in batch:
+            self._failures.pop(source, None)
+        logger.info(
+            f"💾 Group commit #{self.commits}: {len(batch)} domains, "
+            f"{len(summary['rank_changes'])} ranks updated, {summary['new_domains']} new "
+            f"in {time.monotonic() - start:.2f}s (backlog: {self.backlog})"
+        )
+        if self.on_commit:
+            self.on_commit(batch, summary)
+
+    def _commit_one_by_one(self, batch: List[CrawlResult]):
+        """Isolate the results that fail; the others are committed on their own"""
+        committed, summaries, failed = [], [], []
+        for result in batch:
+            source = result[0]
+            try:
+                summaries.append(apply_crawl_results([result], using=self.using))
+                committed.append(result)
+                self._failures.pop(source, None)
+                continue
+            except Exception as e:
+                self._failures[source] += 1
+                logger.error(f"❌ Result of {source} failed ({self._failures[source]}/{self.max_attempts}): {e}")
+
+            if self._failures[source] < self.max_attempts:
+                # Still pending in the DB - claimed and crawled again
+                failed.append(result)
+                continue
+            try:
+                give_up_source(source, using=self.using)
+                self.abandoned += 1
+                del self._failures[source]
+                logger.error(f"🚫 Giving up on {source}: marked processed without its links")
+                committed.append(result)
+                summaries.append(merge_summaries([]) | {'sources': {source}})
+            except Exception as e:
+                logger.error(f"❌ Could not mark {source} processed: {e}")
+                failed.append(result)
+
+        self.commits += len(summaries)
+        self.results_written += len(committed)
+        if self.on_commit:
+            if committed:
+                self.on_commit(committed, merge_summaries(summaries))
+            if failed:
+                self.on_commit(failed, None)
@@ -0,0 +1,105 @@
+"""
+Bulk Seed Import
+================
+
+Streams a domain list into DomainRank without loading it into memory:
+
+    example.com
+    https://www.example.org/some/page     ->  example.org
+    example.net,42                        ->  example.net with rank 42
+    17<TAB>example.io                     ->  example.io with rank 17
+
+Lines are normalized with `extract_domain`, deduplicated per chunk, and each
+chunk is one transaction: one `INSERT ... ON CONFLICT(domain) DO NOTHING` executemany (the ORM's
+per-field value preparation costs more than the insert itself at this scale)
+and one CrawlerStats update by the number of rows actually inserted.
+Existing domains are never modified. Blank lines and `#` comments are skipped.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from search.models import DomainRank, CrawlerStats
+from search.modules.simplified_pagerank import extract_domain
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 20000
+
+_SPLIT_RE = re.compile(r'[\s,;]+')
+_DOMAIN_RE = re.compile(r'^[a-z0-9.-]+(:\d+)?$')
+
+
+def parse_seed_line(line: str, default_rank: int = 0) -> Optional[Tuple[str, int]]:
+    """(domain, rank) from one list line, or None if the line holds no usable domain"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    domain, rank = None, default_rank
+    for field in _SPLIT_RE.split(line):
+        if field.isdigit():
+            rank = int(field)
+        elif field and domain is None:
+            domain = field.lower()
+            # Bare host names are already normalized - only URLs and www. hosts need parsing
+            if domain.startswith('www.') or not _DOMAIN_RE.match(domain):
+                domain = extract_domain(field)
+
+    if not domain or '.' not in domain or len(domain) > 255 or not _DOMAIN_RE.match(domain):
+        return None
+    return domain, rank
+
+
+def iter_seeds(lines: Iterable[str], default_rank: int = 0) -> Iterator[Tuple[str, int]]:
+    for line in lines:
+        seed = parse_seed_line(line, default_rank)
+        if seed is not None:
+            yield seed
+
+
+def _insert_chunk(seeds: Dict[str, int], using: str) -> int:
+    connection = connections[using]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    table = DomainRank._meta.db_table
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (domain, rank, processed, snapshot_rank, created_at, updated_at) "
+                f"VALUES (%s, %s, 0, 0, %s, %s) ON CONFLICT(domain) DO NOTHING",
+                [(domain, rank, now, now) for domain, rank in seeds.items()],
+            )
+            # Only already known domains are skipped (any other constraint error raises); skipped rows
+            # aren't counted in rowcount, trigger writes neither
+            inserted = cursor.rowcount
+        CrawlerStats.increment(total=inserted, using=using)
+    return inserted
+
+
+def import_seeds(lines: Iterable[str], default_rank: int = 0, chunk_size: int = CHUNK_SIZE,
+                 using: str = 'search_db') -> Dict[str, int]:
+    """
+    Insert every new domain from `lines` as an unprocessed DomainRank
+
+    Returns:
+        Counts: lines (usable seeds read), inserted, existing (already known or repeated)
+    """
+    read = inserted = 0
+    pending = {}
+    for domain, rank in iter_seeds(lines, default_rank):
+        read += 1
+        # Repeats within a chunk keep the highest rank
+        if rank >= pending.get(domain, -1):
+            pending[domain] = rank
+        if len(pending) >= chunk_size:
+            inserted += _insert_chunk(pending, using)
+            pending = {}
+            logger.info(f"🌱 {read} seeds read, {inserted} inserted")
+    if pending:
+        inserted += _insert_chunk(pending, using)
+
+    return {'lines': read, 'inserted': inserted, 'existing': read - inserted}
@@ -0,0 +1,129 @@
+"""
+SimHash Near-Duplicate Detection
+================================
+
+Listing, tag and paginated pages inside a domain are often near-identical and
+bring no new external domains. Each fetched page gets a 64-bit SimHash of its
+visible text (weighted word 3-shingles); two pages whose fingerprints differ in
+at most `max_distance` bits are treated as near-duplicates.
+
+Lookups use multi-index tables: the fingerprint is split into
+`max_distance + 1` blocks, and by the pigeonhole principle any fingerprint
+within the distance matches at least one block exactly. So a lookup only
+compares against candidates sharing a block, not against every page seen.
+
+NearDuplicateTracker keeps one index per domain crawl and tracks the
+near-duplicate rate per URL pattern, so the crawler can stop expanding
+patterns that keep producing the same page.
+"""
+
+import re
+from collections import Counter, defaultdict
+from hashlib import blake2b
+from typing import Optional
+
+from search.modules.url_patterns import url_pattern
+
+FINGERPRINT_BITS = 64
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash fingerprint of a text built from weighted word shingles"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle_size:
+        features = Counter(words)
+    else:
+        features = Counter(' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+    if not features:
+        return 0
+
+    vector = [0] * FINGERPRINT_BITS
+    for feature, weight in features.items():
+        h = _feature_hash(feature)
+        for bit in range(FINGERPRINT_BITS):
+            if h >> bit & 1:
+                vector[bit] += weight
+            else:
+                vector[bit] -= weight
+
+    fingerprint = 0
+    for bit, total in enumerate(vector):
+        if total > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    """Multi-index table for Hamming-distance lookups over 64-bit fingerprints"""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        blocks = max_distance + 1
+        width = FINGERPRINT_BITS // blocks
+        # (shift, mask) per block, the last block takes the leftover bits
+        self._blocks = []
+        for i in range(blocks):
+            bits = width if i < blocks - 1 else FINGERPRINT_BITS - width * (blocks - 1)
+            self._blocks.append((i * width, (1 << bits) - 1))
+        self._tables = [defaultdict(list) for _ in self._blocks]
+        self.size = 0
+
+    def find_near(self, fingerprint: int) -> Optional[int]:
+        """A stored fingerprint within max_distance bits, or None"""
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            for candidate in table.get((fingerprint >> shift) & mask, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint: int):
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            table[(fingerprint >> shift) & mask].append(fingerprint)
+        self.size += 1
+
+
+class NearDuplicateTracker:
+    """Per-domain near-duplicate bookkeeping for one crawl"""
+
+    def __init__(self, max_distance: int = 3, threshold: float = 0.6, min_samples: int = 4):
+        """
+        Args:
+            max_distance: Max differing bits for two pages to count as near-duplicates
+            threshold: Near-duplicate rate at which a URL pattern stops being expanded
+            min_samples: Pages of a pattern to see before judging it
+        """
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.index = SimHashIndex(max_distance=max_distance)
+        self._pages = Counter()
+        self._duplicates = Counter()
+        self.duplicates_found = 0
+
+    def check(self, url: str, text: str) -> bool:
+        """Fingerprint a fetched page; True if it nearly duplicates a page seen before"""
+        pattern = url_pattern(url)
+        self._pages[pattern] += 1
+
+        fingerprint = simhash(text)
+        if fingerprint and self.index.find_near(fingerprint) is not None:
+            self._duplicates[pattern] += 1
+            self.duplicates_found += 1
+            return True
+
+        self.index.add(fingerprint)
+        return False
+
+    def is_exhausted(self, url: str) -> bool:
+        """True once the URL's pattern mostly yields near-duplicates"""
+        pattern = url_pattern(url)
+        pages = self._pages[pattern]
+        return pages >= self.min_samples and self._duplicates[pattern] / pages >= self.threshold
@@ -17,43 +17,113 @@ Optimization: Uses SETs to prevent duplicates in both external domains and inter
 
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urldefrag
 import time
 import logging
-from typing import Set, List, Tuple
-from django.db import transaction
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Set, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
-from search.models import DomainRank
+from search.models import DomainRank, CrawlerStats, CrawlerEvent
+from search.modules.crawler_events import publish, publish_many
+from search.modules.result_writer import BatchedResultWriter, apply_crawl_results
+from search.modules.crawl_budget import CrawlBudget, CrawlBudgetAllocator
+from search.modules.simhash import NearDuplicateTracker
+from search.modules.url_patterns import UrlPatternAnalyzer, strip_session_params
+from search.modules.warc import WarcWriter, WarcArchive
+from search.modules.frontier import DomainFrontier
+from search.modules.adaptive_concurrency import AdaptiveConcurrency
+from search.modules.snapshots import SnapshotPublisher
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Thread-safe lock for database operations
+# Thread-safe lock for domain claiming
 db_lock = threading.Lock()
 
+# Links to these file types are never pages worth crawling
+SKIPPED_EXTENSIONS = (
+    '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
+    '.pdf', '.zip', '.rar', '.exe', '.dmg', '.mp4', '.mp3', '.avi'
+)
+
+
+def extract_domain(url: str) -> str:
+    """Extract clean domain from URL (no protocol, no path)"""
+    try:
+        parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'http://{url}')
+        domain = parsed.netloc.lower()
+        # Remove www. prefix for consistency
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        return domain
+    except Exception:
+        return ""
+
 
 class SimplifiedPageRank:
     """
     Super simplified PageRank that only tracks domain-level external links
     """
     
-    def __init__(self, max_depth: int = 3, delay: float = 0.1, max_pages_per_domain: int = 50, max_workers: int = 4):
+    def __init__(self, max_depth: int = 3, delay: float = 0.1, max_pages_per_domain: int = 50, max_workers: int = 4,
+                 write_batch_size: int = 50, write_batch_wait: float = 2.0, pages_per_hour: int = 0,
+                 warc_writer: WarcWriter = None, replay_archive: WarcArchive = None,
+                 frontier_reconcile_interval: float = 600.0, max_workers_limit: int = None, host_concurrency: int = 4,
+                 snapshot_interval: float = 5.0):
         """
         Initialize the simplified PageRank crawler
         
         Args:
             max_depth: How deep to crawl within each domain for finding external links
-            delay: Delay between requests in seconds (default: 0.1 = 100ms)
-            max_pages_per_domain: Maximum pages to crawl per domain to avoid infinite loops
-            max_workers: Number of concurrent threads for parallel processing
+            delay: Delay between request waves to the same domain in seconds (default: 0.1 = 100ms)
+            max_pages_per_domain: Page budget of an average domain (scaled per domain by rank and yield)
+            max_workers: Initial number of domains crawled concurrently (adapts to host health)
+            write_batch_size: Crawl results per group commit (parallel mode)
+            write_batch_wait: Max seconds a result waits for its group commit (parallel mode)
+            pages_per_hour: Global crawl rate target the budgets are tuned towards (0 = no target)
+            warc_writer: Archive every fetched response to WARC files
+            replay_archive: Serve pages from recorded WARC files instead of the network
+            frontier_reconcile_interval: Seconds between reloads of the in-memory frontier from the database
+            max_workers_limit: Ceiling the adaptive worker count may grow to (default: 4 x max_workers)
+            host_concurrency: Most requests in flight to a single host
+            snapshot_interval: Min seconds between read-path snapshots published after commits (0 = never)
         """
         self.max_depth = max_depth
         self.delay = delay
         self.max_pages_per_domain = max_pages_per_domain
         self.max_workers = max_workers
+        self.write_batch_size = write_batch_size
+        self.write_batch_wait = write_batch_wait
+        self.warc_writer = warc_writer
+        self.replay_archive = replay_archive
+        # Domains claimed by a fetcher whose results are not committed yet
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        # Rank at claim time, used to size each domain's crawl budget
+        self._claimed_ranks = {}
+        # Pending domains by rank, kept in sync with every commit instead of re-querying per claim
+        self.frontier = DomainFrontier(reconcile_interval=frontier_reconcile_interval)
+        # Worker count, per-host parallelism and request timeouts follow observed latency and errors
+        self.concurrency = AdaptiveConcurrency(
+            initial_global=max_workers,
+            max_global=max(max_workers, max_workers_limit or max_workers * 4),
+            max_host=host_concurrency,
+        )
+        # Dashboard reads are served from these files instead of search_db
+        self.snapshots = SnapshotPublisher(min_interval=snapshot_interval) if snapshot_interval else None
+        self._page_pool = ThreadPoolExecutor(
+            max_workers=int(self.concurrency.global_limit.maximum) * host_concurrency,
+            thread_name_prefix='page-fetch',
+        )
+        self.budgets = CrawlBudgetAllocator(
+            base_pages=max_pages_per_domain,
+            max_pages=max_pages_per_domain * 10,
+            max_depth=max_depth,
+            pages_per_hour=pages_per_hour,
+            seconds_per_page=delay + 1.0,
+        )
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; SimplifiedPageRank/1.0; +http://unicorner.coffee/search)'
@@ -61,120 +131,133 @@ class SimplifiedPageRank:
     
     def extract_domain(self, url: str) -> str:
         """Extract clean domain from URL (no protocol, no path)"""
-        try:
-            parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'http://{url}')
-            domain = parsed.netloc.lower()
-            # Remove www. prefix for consistency
-            if domain.startswith('www.'):
-                domain = domain[4:]
-            return domain
-        except Exception:
-            return ""
+        return extract_domain(url)
     
-    def fetch_page_links(self, url: str) -> Set[str]:
+    def fetch_html(self, url: str) -> Optional[bytes]:
         """
-        Fetch only meaningful external links from a single page
-        Filters out CSS, JS, images, and other non-content links
-        Returns set of absolute URLs pointing to OTHER domains only
+        Download a single page (the only place the crawler touches the network)
+        Returns the raw HTML body, or None if the fetch failed
         """
+        if self.replay_archive is not None:
+            return self._replay_html(url)
+        
         try:
             logger.info(f"🔍 Fetching: {url}")
-            response = self.session.get(url, timeout=10)
+            with self.concurrency.request(urlparse(url).netloc.lower()) as call:
+                try:
+                    response = self.session.get(url, timeout=call.timeout)
+                except requests.Timeout:
+                    call.timed_out = True
+                    raise
+                call.status = response.status_code
+            if self.warc_writer is not None:
+                self.warc_writer.write_requests_response(url, response)
             response.raise_for_status()
+            return response.content
+        except Exception as e:
+            logger.warning(f"❌ Failed to fetch {url}: {str(e)[:100]}")
+            return None
+    
+    def fetch_many(self, urls: List[str]) -> List[Optional[bytes]]:
+        """Fetch several pages of one host concurrently (as many as its adaptive limit admits)"""
+        if len(urls) == 1:
+            return [self.fetch_html(urls[0])]
+        return list(self._page_pool.map(self.fetch_html, urls))
+    
+    def _replay_html(self, url: str) -> Optional[bytes]:
+        """Offline fetch: the recorded body for `url`, None if it wasn't captured or was an error"""
+        archived = self.replay_archive.get(url)
+        if archived is None:
+            logger.info(f"📼 Not in archive: {url}")
+            return None
+        if archived.status >= 400:
+            logger.warning(f"❌ Archived error {archived.status} for {url}")
+            return None
+        logger.info(f"📼 Replaying: {url}")
+        return archived.body
+    
+    def parse_page(self, url: str, html: bytes, domain: str) -> Tuple[Set[str], Set[str], str]:
+        """
+        Extract everything the crawler needs from one page in a single parse
+        Filters out CSS, JS, images, and other non-content links
+        
+        Args:
+            url: URL the page was fetched from (base for relative links)
+            html: Raw page body
+            domain: Domain being crawled (decides internal vs external)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            links = set()
-            current_domain = self.extract_domain(url)
+        Returns:
+            Tuple of (external link URLs, internal link URLs, visible page text)
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        external_links = set()
+        internal_links = set()
+        
+        # Extract only meaningful href links from content areas
+        for link in soup.find_all('a', href=True):
+            href = link.get('href', '').strip()
             
-            # Extract only meaningful href links from content areas
-            for link in soup.find_all('a', href=True):
-                href = link.get('href', '').strip()
-                
-                # Skip empty hrefs
-                if not href:
-                    continue
-                
-                # Skip non-HTTP links (mailto, tel, javascript, etc.)
-                if href.startswith(('mailto:', 'tel:', 'javascript:', '#', 'data:')):
-                    continue
-                
-                # Convert to absolute URL
-                absolute_url = urljoin(url, href)
-                
-                # Only keep HTTP/HTTPS URLs
-                if not absolute_url.startswith(('http://', 'https://')):
-                    continue
-                
-                # Extract domain from this link
-                link_domain = self.extract_domain(absolute_url)
-                
-                # Skip if no domain or same domain (internal link)
-                if not link_domain or link_domain == current_domain:
-                    continue
-                
-                # Skip common non-content file extensions
-                if any(absolute_url.lower().endswith(ext) for ext in [
-                    '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
-                    '.pdf', '.zip', '.rar', '.exe', '.dmg', '.mp4', '.mp3', '.avi'
-                ]):
-                    continue
-                
-                # This is an external content link - add it
-                links.add(absolute_url)
+            # Skip empty hrefs
+            if not href:
+                continue
             
-            logger.info(f"✅ Found {len(links)} external links on {url}")
-            return links
+            # Skip non-HTTP links (mailto, tel, javascript, etc.)
+            if href.startswith(('mailto:', 'tel:', 'javascript:', '#', 'data:')):
+                continue
             
-        except Exception as e:
-            logger.warning(f"❌ Failed to fetch {url}: {str(e)[:100]}")
+            # Convert to absolute URL (fragments point at the same page)
+            absolute_url = urldefrag(urljoin(url, href))[0]
+            
+            # Only keep HTTP/HTTPS URLs
+            if not absolute_url.startswith(('http://', 'https://')):
+                continue
+            
+            # Skip common non-content file extensions
+            if absolute_url.lower().endswith(SKIPPED_EXTENSIONS):
+                continue
+            
+            # Extract domain from this link
+            link_domain = self.extract_domain(absolute_url)
+            if not link_domain:
+                continue
+            
+            if link_domain == domain:
+                internal_links.add(absolute_url)
+            else:
+                # This is an external content link - add it
+                external_links.add(absolute_url)
+        
+        # Visible text for near-duplicate fingerprinting
+        for tag in soup(['script', 'style', 'noscript']):
+            tag.decompose()
+        text = soup.get_text(' ', strip=True)
+        
+        return external_links, internal_links, text
+    
+    def fetch_page_links(self, url: str) -> Set[str]:
+        """
+        Fetch only meaningful external links from a single page
+        Returns set of absolute URLs pointing to OTHER domains only
+        """
+        html = self.fetch_html(url)
+        if html is None:
             return set()
+        external_links, _, _ = self.parse_page(url, html, self.extract_domain(url))
+        logger.info(f"✅ Found {len(external_links)} external links on {url}")
+        return external_links
     
     def fetch_internal_links(self, url: str, domain: str) -> Set[str]:
         """
         Fetch only internal links from a page for navigation within domain
         Used only to discover more pages within the same domain
         """
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            internal_links = set()
-            
-            # Extract only internal navigation links
-            for link in soup.find_all('a', href=True):
-                href = link.get('href', '').strip()
-                
-                if not href:
-                    continue
-                
-                # Skip non-HTTP links
-                if href.startswith(('mailto:', 'tel:', 'javascript:', 'data:')):
-                    continue
-                
-                # Convert to absolute URL
-                absolute_url = urljoin(url, href)
-                
-                # Only keep HTTP/HTTPS URLs
-                if not absolute_url.startswith(('http://', 'https://')):
-                    continue
-                
-                # Check if it's internal to this domain
-                link_domain = self.extract_domain(absolute_url)
-                if link_domain == domain:
-                    # Skip non-content file extensions
-                    if not any(absolute_url.lower().endswith(ext) for ext in [
-                        '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
-                        '.pdf', '.zip', '.rar', '.exe', '.dmg', '.mp4', '.mp3', '.avi'
-                    ]):
-                        internal_links.add(absolute_url)
-            
-            return internal_links
-            
-        except Exception as e:
+        html = self.fetch_html(url)
+        if html is None:
             return set()
+        _, internal_links, _ = self.parse_page(url, html, domain)
+        return internal_links
     
-    def crawl_domain_for_external_links(self, start_domain: str) -> Set[str]:
+    def crawl_domain_for_external_links(self, start_domain: str, budget: CrawlBudget = None) -> Set[str]:
         """
         Crawl a domain to find UNIQUE external domains (no duplicates)
         
@@ -182,13 +265,24 @@ class SimplifiedPageRank:
         regardless of how many times it appears across different pages.
         This prevents rank inflation from repeated links (like Facebook on every page).
         
+        Each page is fetched and parsed once. Pages that nearly duplicate an
+        earlier page (SimHash) are not expanded, and URL patterns that keep
+        producing near-duplicates are dropped from the queue. URL patterns that
+        look like crawl traps (calendars, facets, session IDs) are fetched last
+        and blocked once they prove unproductive.
+        
         Args:
             start_domain: Domain to crawl (e.g., "example.com")
+            budget: Page/depth/time limits (default: allocated from the domain's claimed rank)
             
         Returns:
             Set of unique external domain names that this domain links to
         """
-        logger.info(f"🌐 Starting domain crawl: {start_domain}")
+        rank = self._claimed_ranks.pop(start_domain, 0)
+        if budget is None:
+            budget = self.budgets.allocate(rank)
+        logger.info(f"🌐 Starting domain crawl: {start_domain} (budget: {budget.max_pages} pages, depth {budget.max_depth}, {budget.max_seconds:.0f}s)")
+        started = time.monotonic()
         
         # Initialize with root URL
         start_url = f"https://{start_domain}"
@@ -196,63 +290,102 @@ class SimplifiedPageRank:
         visited_urls = set()                  # URLs already processed (prevents revisiting)
         # Use SET to automatically prevent duplicates - each external domain counted only once!
         unique_external_domains = set()
+        duplicates = NearDuplicateTracker()
+        patterns = UrlPatternAnalyzer()
         pages_crawled = 0
+        pages_since_new_domain = 0
+        budget_left = True
         
         # Breadth-first crawl within domain
-        for depth in range(self.max_depth):
-            if not internal_urls_to_visit or pages_crawled >= self.max_pages_per_domain:
+        for depth in range(budget.max_depth):
+            if not internal_urls_to_visit or not budget_left:
                 break
                 
-            logger.info(f"📏 Depth {depth + 1}/{self.max_depth}: {len(internal_urls_to_visit)} URLs to visit")
-            current_level_urls = internal_urls_to_visit.copy()
+            logger.info(f"📏 Depth {depth + 1}/{budget.max_depth}: {len(internal_urls_to_visit)} URLs to visit")
+            # Productive URL patterns first, suspected traps last
+            current_level_urls = sorted(internal_urls_to_visit, key=patterns.priority)
             internal_urls_to_visit.clear()
             
-            for url in current_level_urls:
-                if pages_crawled >= self.max_pages_per_domain:
-                    break
+            level_urls = iter(current_level_urls)
+            while budget_left:
+                # Fetch the level in waves as wide as the host currently takes
+                wave = []
+                width = self.concurrency.host_limit(start_domain)
+                for url in level_urls:
+                    budget_left = self.budgets.keep_crawling(budget, pages_crawled, pages_since_new_domain, started)
+                    if not budget_left:
+                        break
                     
-                if url in visited_urls:
-                    continue
+                    if url in visited_urls:
+                        continue
                     
-                visited_urls.add(url)
-                pages_crawled += 1
-                
-                # Fetch external links from this page
-                external_links = self.fetch_page_links(url)
-                
-                # Track unique external domains (SET automatically prevents duplicates)
-                domains_found_on_this_page = set()
-                for external_link in external_links:
-                    external_domain = self.extract_domain(external_link)
-                    if external_domain and external_domain != start_domain:
-                        # Add to unique set - duplicates are automatically ignored
-                        if external_domain not in unique_external_domains:
-                            unique_external_domains.add(external_domain)
-                            domains_found_on_this_page.add(external_domain)
-                
-                # Log only NEW domains found on this page (to reduce noise)
-                if domains_found_on_this_page:
-                    logger.info(f"🔗 Found {len(domains_found_on_this_page)} new unique domains on {url}")
+                    # Pattern already known to produce near-duplicates or to be a trap - save the fetch
+                    if duplicates.is_exhausted(url) or patterns.is_blocked(url):
+                        continue
+                    
+                    visited_urls.add(url)
+                    pages_crawled += 1
+                    wave.append(url)
+                    if len(wave) >= width:
+                        break
+                if not wave:
+                    break
                 
-                # For internal navigation, fetch internal links separately
-                if depth < self.max_depth - 1:
-                    internal_links = self.fetch_internal_links(url, start_domain)
-                    new_internal_links_count = 0
-                    for internal_link in internal_links:
-                        # Avoid duplicates: check both visited URLs and URLs already queued for visiting
-                        if internal_link not in visited_urls and internal_link not in internal_urls_to_visit:
-                            internal_urls_to_visit.add(internal_link)
-                            new_internal_links_count += 1
+                # Each page is fetched once, then parsed in crawl order
+                for url, html in zip(wave, self.fetch_many(wave)):
+                    if html is None:
+                        pages_since_new_domain += 1
+                        patterns.record_fetch(url, 0)
+                        continue
+                    external_links, internal_links, text = self.parse_page(url, html, start_domain)
+                    
+                    # Track unique external domains (SET automatically prevents duplicates)
+                    domains_found_on_this_page = set()
+                    for external_link in external_links:
+                        external_domain = self.extract_domain(external_link)
+                        if external_domain and external_domain != start_domain:
+                            # Add to unique set - duplicates are automatically ignored
+                            if external_domain not in unique_external_domains:
+                                unique_external_domains.add(external_domain)
+                                domains_found_on_this_page.add(external_domain)
+                    
+                    # Log only NEW domains found on this page (to reduce noise)
+                    if domains_found_on_this_page:
+                        logger.info(f"🔗 Found {len(domains_found_on_this_page)} new unique domains on {url}")
+                        pages_since_new_domain = 0
+                    else:
+                        pages_since_new_domain += 1
+                    patterns.record_fetch(url, len(domains_found_on_this_page))
+                    
+                    # Near-duplicate pages (mirrors, pagination, tag listings) are not expanded
+                    if duplicates.check(url, text):
+                        logger.info(f"🪞 Near-duplicate page, not expanding: {url}")
+                        continue
                     
-                    # Log only if we found new internal links (to reduce noise)
-                    if new_internal_links_count > 0:
-                        logger.info(f"📄 Added {new_internal_links_count} new internal URLs from {url}")
+                    # Queue internal links for the next level
+                    if depth < budget.max_depth - 1:
+                        new_internal_links_count = 0
+                        for internal_link in internal_links:
+                            internal_link = strip_session_params(internal_link)
+                            # Avoid duplicates: check both visited URLs and URLs already queued for visiting
+                            if internal_link not in visited_urls and internal_link not in internal_urls_to_visit:
+                                if not patterns.admit(internal_link):
+                                    continue
+                                internal_urls_to_visit.add(internal_link)
+                                new_internal_links_count += 1
+                    
+                        # Log only if we found new internal links (to reduce noise)
+                        if new_internal_links_count > 0:
+                            logger.info(f"📄 Added {new_internal_links_count} new internal URLs from {url}")
                 
                 # Rate limiting
                 time.sleep(self.delay)
         
+        # Feed the observed yield back into future budgets
+        self.budgets.record(rank, pages_crawled, len(unique_external_domains), time.monotonic() - started)
+        
         logger.info(f"🎉 Domain crawl complete: {start_domain}")
-        logger.info(f"📄 Pages crawled: {pages_crawled}")
+        logger.info(f"📄 Pages crawled: {pages_crawled}/{budget.max_pages} ({duplicates.duplicates_found} near-duplicates, {patterns.blocked_urls} trap URLs skipped)")
         logger.info(f"🌐 UNIQUE external domains found: {len(unique_external_domains)}")
         
         return unique_external_domains
@@ -272,29 +405,12 @@ class SimplifiedPageRank:
         """
         logger.info(f"💾 Updating ranks for {len(unique_external_domains)} UNIQUE domains")
         
-        with transaction.atomic(using='search_db'):
-            # Mark source domain as processed
-            source_obj, created = DomainRank.objects.using('search_db').get_or_create(
-                domain=source_domain,
-                defaults={'rank': 0, 'processed': True}
-            )
-            if not created:
-                source_obj.processed = True
-                source_obj.save(using='search_db')
-            
-            # Update ranks for unique external domains (each gets +1 regardless of link count)
-            for external_domain in unique_external_domains:
-                if external_domain and external_domain != source_domain:
-                    domain_obj, created = DomainRank.objects.using('search_db').get_or_create(
-                        domain=external_domain,
-                        defaults={'rank': 1, 'processed': False}
-                    )
-                    if not created:
-                        # Domain exists, increment rank by 1 (not by number of links)
-                        domain_obj.rank += 1
-                        domain_obj.save(using='search_db')
-                    
-                    logger.info(f"📈 {external_domain}: rank = {domain_obj.rank}")
+        summary = apply_crawl_results([(source_domain, unique_external_domains)])
+        self.frontier.apply_commit(summary)
+        if self.snapshots:
+            self.snapshots.maybe_publish()
+        for external_domain, rank in summary['rank_changes'].items():
+            logger.info(f"📈 {external_domain}: rank = {rank}")
         
         logger.info("✅ Database updated successfully")
     
@@ -303,11 +419,17 @@ class SimplifiedPageRank:
         Get the next domain to process from database
         Priority: highest rank unprocessed domains first
         """
-        unprocessed = DomainRank.objects.using('search_db').filter(processed=False).order_by('-rank', 'domain').first()
+        if not self.frontier:
+            self.frontier.invalidate()  # Pick up domains added while we were idle
+        self.frontier.reconcile_if_due()
+        claimed = self.frontier.pop_many(1)
         
-        if unprocessed:
-            logger.info(f"🎯 Next domain to process: {unprocessed.domain} (rank: {unprocessed.rank})")
-            return unprocessed.domain
+        if claimed:
+            domain, rank = claimed[0]
+            logger.info(f"🎯 Next domain to process: {domain} (rank: {rank})")
+            self._claimed_ranks[domain] = rank
+            publish(CrawlerEvent.CLAIMED, domain, rank=rank)
+            return domain
         else:
             logger.info("🏁 No unprocessed domains found")
             return None
@@ -316,10 +438,13 @@ class SimplifiedPageRank:
         """Add a starting domain to the database"""
         clean_domain = self.extract_domain(domain)
         if clean_domain:
-            DomainRank.objects.using('search_db').get_or_create(
+            _, created = DomainRank.objects.using('search_db').get_or_create(
                 domain=clean_domain,
                 defaults={'rank': 1, 'processed': False}
             )
+            if created:
+                CrawlerStats.increment(total=1)
+                self.frontier.push(clean_domain, 1)
             logger.info(f"🌱 Added seed domain: {clean_domain}")
     
     def process_domain_parallel(self, domain: str) -> Tuple[str, Set[str]]:
@@ -352,11 +477,39 @@ class SimplifiedPageRank:
             List of domain names to process
         """
         with db_lock:
-            domains = list(DomainRank.objects.using('search_db').filter(
-                processed=False
-            ).order_by('-rank').values_list('domain', flat=True)[:count])
+            with self._in_flight_lock:
+                in_flight = list(self._in_flight)
             
-            return domains
+            # Reloads skip domains still being crawled or waiting in the writer queue
+            if not self.frontier and not in_flight:
+                self.frontier.invalidate()  # Idle: pick up domains added by other processes
+            self.frontier.reconcile_if_due(exclude=in_flight)
+            claimed = self.frontier.pop_many(count)
+            
+            with self._in_flight_lock:
+                self._in_flight.update(domain for domain, _ in claimed)
+            self._claimed_ranks.update(claimed)
+            
+            publish_many((CrawlerEvent.CLAIMED, domain, {'rank': rank}) for domain, rank in claimed)
+            return [domain for domain, _ in claimed]
+    
+    def _release_committed(self, batch, summary):
+        """Writer callback: committed (or failed) domains can be claimed again if still pending"""
+        with self._in_flight_lock:
+            self._in_flight.difference_update(domain for domain, _ in batch)
+        if summary is None:
+            # Failed sources are still pending in the DB - reload rather than guess their ranks
+            self.frontier.invalidate()
+        else:
+            self.frontier.apply_commit(summary)
+            if self.snapshots:
+                self.snapshots.maybe_publish()
+    
+    def crawl_and_submit(self, domain: str, writer: BatchedResultWriter):
+        """Fetcher task: crawl one domain and hand the result to the writer (never touches SQLite)"""
+        processed_domain, external_domains = self.process_domain_parallel(domain)
+        writer.submit(processed_domain, external_domains)
+        return processed_domain, external_domains
     
     def run_parallel_crawler(self, seed_domain: str = None):
         """
@@ -366,62 +519,60 @@ class SimplifiedPageRank:
         if seed_domain:
             domain_name = self.extract_domain(seed_domain)
             logger.info(f"🌱 Added seed domain: {domain_name}")
-            DomainRank.objects.using('search_db').get_or_create(
+            _, created = DomainRank.objects.using('search_db').get_or_create(
                 domain=domain_name,
                 defaults={'rank': 0, 'processed': False}
             )
+            if created:
+                CrawlerStats.increment(total=1)
+                self.frontier.push(domain_name, 0)
         
-        iteration = 0
         logger.info("🚀 Starting parallel simplified PageRank crawler")
         
-        while True:
-            iteration += 1
-            logger.info(f"\n🔄 Parallel Iteration {iteration}")
-            
-            # Get multiple domains to process in parallel
-            domains_to_process = self.get_multiple_unprocessed_domains(self.max_workers)
-            
-            if not domains_to_process:
-                logger.info("😴 No domains to process. Waiting for new domains...")
-                time.sleep(5)
-                continue
-            
-            logger.info(f"🎯 Processing {len(domains_to_process)} domains in parallel: {domains_to_process}")
-            
-            # Process domains in parallel using ThreadPoolExecutor
-            results = []
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit all domains for processing
-                future_to_domain = {
-                    executor.submit(self.process_domain_parallel, domain): domain 
-                    for domain in domains_to_process
-                }
-                
-                # Collect results as they complete
-                for future in as_completed(future_to_domain):
-                    domain = future_to_domain[future]
-                    try:
-                        processed_domain, external_domains = future.result()
-                        results.append((processed_domain, external_domains))
-                    except Exception as e:
-                        logger.error(f"❌ Parallel processing failed for {domain}: {e}")
-                        results.append((domain, set()))
-            
-            # Update database with all results (thread-safe)
-            total_new_domains = 0
-            for processed_domain, unique_external_domains in results:
-                with db_lock:
-                    self.update_domain_ranks(processed_domain, unique_external_domains)
-                    total_new_domains += len(unique_external_domains)
-            
-            logger.info(f"🎉 Parallel batch complete: {len(results)} domains processed, {total_new_domains} new domains discovered")
-            
-            # Show current top domains
-            self.show_top_domains()
-            
-            # Brief pause between parallel batches
-            time.sleep(0.5)
-
+        # Fetchers only crawl; one writer thread owns all rank updates
+        writer = BatchedResultWriter(
+            max_batch=self.write_batch_size,
+            max_wait=self.write_batch_wait,
+            queue_size=self.max_workers * 4,
+            on_commit=self._release_committed,
+        ).start()
+        
+        completed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=int(self.concurrency.global_limit.maximum)) as executor:
+                running = set()
+                while True:
+                    # Keep every worker busy: claim as many domains as the adaptive limit has free slots
+                    free_slots = self.concurrency.worker_limit - len(running)
+                    if free_slots > 0:
+                        domains_to_process = self.get_multiple_unprocessed_domains(free_slots)
+                        if domains_to_process:
+                            logger.info(f"🎯 Processing {len(domains_to_process)} domains in parallel: {domains_to_process}")
+                        for domain in domains_to_process:
+                            running.add(executor.submit(self.crawl_and_submit, domain, writer))
+                    
+                    if not running:
+                        logger.info("😴 No domains to process. Waiting for new domains...")
+                        time.sleep(5)
+                        continue
+                    
+                    done, running = wait(running, timeout=5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"❌ Parallel processing failed: {e}")
+                        completed += 1
+                        
+                        # Show current top domains every full round of workers
+                        if completed % self.max_workers == 0:
+                            logger.info(f"🎉 {completed} domains crawled | {writer.commits} group commits | writer backlog: {writer.backlog}")
+                            logger.info(f"🚦 Concurrency: {self.concurrency.snapshot()}")
+                            self.show_top_domains()
+        finally:
+            writer.close()
+            self._page_pool.shutdown(wait=False)
+    
     def run_infinite_crawler(self, seed_domain: str = None):
         """
         Run the infinite domain crawler
@@ -462,8 +613,10 @@ class SimplifiedPageRank:
                 # Mark as processed even if failed to avoid infinite retries
                 try:
                     domain_obj = DomainRank.objects.using('search_db').get(domain=current_domain)
-                    domain_obj.processed = True
-                    domain_obj.save(using='search_db')
+                    if not domain_obj.processed:
+                        domain_obj.processed = True
+                        domain_obj.save(using='search_db')
+                        CrawlerStats.increment(processed=1)
                 except:
                     pass
             
@@ -479,13 +632,15 @@ class SimplifiedPageRank:
             status = "✅" if domain.processed else "⏳"
             logger.info(f"  {i:2d}. {status} {domain.domain:30} (rank: {domain.rank})")
         
-        total_domains = DomainRank.objects.using('search_db').count()
-        processed_count = DomainRank.objects.using('search_db').filter(processed=True).count()
-        logger.info(f"\n📊 Total domains: {total_domains} | Processed: {processed_count} | Pending: {total_domains - processed_count}")
+        stats = CrawlerStats.load()
+        logger.info(f"\n📊 Total domains: {stats.total_domains} | Processed: {stats.processed_count} | Pending: {stats.pending_count}")
 
 
 # Convenience function for easy usage
-def start_simplified_pagerank(seed_domain: str = "unicorner.coffee", max_depth: int = 3, delay: float = 0.1, parallel: bool = True, max_workers: int = 4):
+def start_simplified_pagerank(seed_domain: str = "unicorner.coffee", max_depth: int = 3, delay: float = 0.1, parallel: bool = True, max_workers: int = 4,
+                              write_batch_size: int = 50, write_batch_wait: float = 2.0, max_pages_per_domain: int = 20, pages_per_hour: int = 0,
+                              warc_dir: str = None, warc_max_size: int = 256 * 1024 * 1024, replay_dir: str = None,
+                              max_workers_limit: int = None, host_concurrency: int = 4, snapshot_interval: float = 5.0):
     """
     Start the simplified PageRank crawler with default settings
     
@@ -494,14 +649,38 @@ def start_simplified_pagerank(seed_domain: str = "unicorner.coffee", max_depth:
         max_depth: How deep to crawl within each domain
         delay: Delay between requests in seconds
         parallel: Use parallel processing (default: True)
-        max_workers: Number of parallel threads (default: 4)
+        max_workers: Initial number of parallel domain crawls (default: 4)
+        write_batch_size: Crawl results per group commit (default: 50)
+        write_batch_wait: Max seconds before a partial batch is committed (default: 2.0)
+        max_pages_per_domain: Page budget of an average domain (default: 20)
+        pages_per_hour: Global crawl rate target for the budget allocator (default: 0 = none)
+        warc_dir: Record every fetched response into WARC files in this directory
+        warc_max_size: Rotate WARC files at this size in bytes (default: 256 MB)
+        replay_dir: Crawl offline from the WARC files in this directory (no network, no delay)
+        max_workers_limit: Ceiling for the adaptive number of parallel crawls (default: 4 x max_workers)
+        host_concurrency: Most concurrent requests to one host (default: 4)
+        snapshot_interval: Min seconds between dashboard snapshots (default: 5, 0 = off)
     """
-    crawler = SimplifiedPageRank(max_depth=max_depth, delay=delay, max_pages_per_domain=20, max_workers=max_workers)
+    warc_writer = WarcWriter(warc_dir, max_file_size=warc_max_size) if warc_dir else None
+    replay_archive = WarcArchive(replay_dir) if replay_dir else None
+    if replay_archive is not None:
+        delay = 0
+    
+    crawler = SimplifiedPageRank(max_depth=max_depth, delay=delay, max_pages_per_domain=max_pages_per_domain, max_workers=max_workers,
+                                 write_batch_size=write_batch_size, write_batch_wait=write_batch_wait, pages_per_hour=pages_per_hour,
+                                 warc_writer=warc_writer, replay_archive=replay_archive,
+                                 max_workers_limit=max_workers_limit, host_concurrency=host_concurrency,
+                                 snapshot_interval=snapshot_interval)
     
-    if parallel:
-        crawler.run_parallel_crawler(seed_domain)
-    else:
-        crawler.run_infinite_crawler(seed_domain)
+    try:
+        if parallel:
+            crawler.run_parallel_crawler(seed_domain)
+        else:
+            crawler.run_infinite_crawler(seed_domain)
+    finally:
+        if warc_writer is not None:
+            warc_writer.close()
+            logger.info(f"🗄️ {warc_writer.records_written} responses archived to {warc_dir}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,282 @@
+"""
+Read-Path Snapshots
+===================
+
+The dashboard and its JSON APIs read search_db while the crawler holds write
+transactions on it. After crawl batches the crawler publishes immutable JSON
+snapshots of what those views show:
+
+    <SEARCH_SNAPSHOT_DIR>/
+        v-20260101120000-4242-000042/
+            manifest.json                       {name: etag}, created
+            stats.json                          crawler_api payload
+            domains-<filter>-first.json         first listing page per filter
+            domains-<filter>-<direction>-<hash of cursor>.json
+        current -> v-20260101120000-4242-000042 swapped atomically (rename)
+
+A version directory is never modified once `current` points at it, so a
+file's ETag (content hash) stays valid for as long as it is served, and
+readers never see a half-written snapshot. The views serve from `current`
+(304 on a matching If-None-Match) and only fall back to the database for
+requests a snapshot doesn't cover, or when it is older than
+SEARCH_SNAPSHOT_MAX_AGE (crawler stopped - no writer to contend with).
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from hashlib import blake2b
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from search.models import DomainRank, CrawlerStats
+from search.modules.keyset_pagination import paginate_domains
+
+logger = logging.getLogger(__name__)
+
+LISTING_FILTERS = ('all', 'yes', 'no')
+SNAPSHOT_PAGES = 5
+KEEP_VERSIONS = 3
+
+_serial = 0
+_serial_lock = threading.Lock()
+
+
+def snapshot_dir() -> str:
+    return str(getattr(settings, 'SEARCH_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'search', 'database', 'snapshots')))
+
+
+def page_name(show_processed: str, after: str = None, before: str = None) -> str:
+    """Snapshot file name of a listing page, by filter and cursor"""
+    if before:
+        key = 'before-' + blake2b(before.encode(), digest_size=10).hexdigest()
+    elif after:
+        key = 'after-' + blake2b(after.encode(), digest_size=10).hexdigest()
+    else:
+        key = 'first'
+    return f'domains-{show_processed}-{key}.json'
+
+
+def stats_payload(using: str = 'search_db') -> Dict:
+    """Payload of crawler_api"""
+    stats = CrawlerStats.load(using=using)
+    domains = DomainRank.objects.using(using)
+
+    top_domains = list(domains.order_by('-rank')[:10].values('domain', 'rank', 'processed', 'updated_at'))
+    recent = list(domains.filter(processed=True).order_by('-updated_at')[:5].values('domain', 'rank', 'updated_at'))
+    # Currently being processed (recently updated, not processed)
+    currently_processing = domains.filter(processed=False).order_by('-updated_at').first()
+
+    return {
+        'stats': {
+            'total_domains': stats.total_domains,
+            'processed_count': stats.processed_count,
+            'pending_count': stats.pending_count,
+        },
+        'top_domains': top_domains,
+        'recent_activity': recent,
+        'currently_processing': {
+            'domain': currently_processing.domain if currently_processing else None,
+            'rank': currently_processing.rank if currently_processing else 0,
+        }
+    }
+
+
+def page_payload(page) -> Dict:
+    """Payload of domains_api for one KeysetPage"""
+    return {
+        'results': [
+            {
+                'domain': d.domain,
+                'rank': d.rank,
+                'processed': d.processed,
+                'updated_at': d.updated_at,
+            }
+            for d in page
+        ],
+        'total': page.total,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def _encode(payload: Dict) -> bytes:
+    return json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def _etag(body: bytes) -> str:
+    return '"' + blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def build_snapshot(using: str = 'search_db', pages: int = SNAPSHOT_PAGES) -> Dict[str, bytes]:
+    """Render every snapshot document {file name: JSON bytes}"""
+    stats = CrawlerStats.load(using=using)
+    totals = {'all': stats.total_domains, 'yes': stats.processed_count, 'no': stats.pending_count}
+    files = {'stats.json': _encode(stats_payload(using))}
+
+    for show_processed in LISTING_FILTERS:
+        domains = DomainRank.objects.using(using).all()
+        if show_processed != 'all':
+            domains = domains.filter(processed=show_processed == 'yes')
+
+        after = None
+        previous_name = None
+        for _ in range(pages):
+            page = paginate_domains(domains, after=after, total=totals[show_processed])
+            body = _encode(page_payload(page))
+            files[page_name(show_processed, after=after)] = body
+            if previous_name is not None and page.previous_cursor:
+                # "Previous" from this page lands exactly on the page before it
+                files[page_name(show_processed, before=page.previous_cursor)] = files[previous_name]
+            if not page.has_next:
+                break
+            previous_name = page_name(show_processed, after=after)
+            after = page.next_cursor
+    return files
+
+
+def publish_snapshot(using: str = 'search_db', pages: int = SNAPSHOT_PAGES, directory: str = None) -> str:
+    """
+    Write a new snapshot version and atomically point `current` at it
+
+    Returns:
+        Path of the published version directory
+    """
+    global _serial
+    directory = directory or snapshot_dir()
+    files = build_snapshot(using=using, pages=pages)
+
+    with _serial_lock:
+        _serial += 1
+        version = f"v-{datetime.now(dt_timezone.utc):%Y%m%d%H%M%S}-{os.getpid()}-{_serial:06d}"
+    version_dir = os.path.join(directory, version)
+    os.makedirs(version_dir)
+
+    manifest = {'created': time.time(), 'etags': {}}
+    for name, body in files.items():
+        with open(os.path.join(version_dir, name), 'wb') as f:
+            f.write(body)
+        manifest['etags'][name] = _etag(body)
+    with open(os.path.join(version_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    # rename() over an existing symlink is atomic - readers see the old or the new version, never a mix
+    link = os.path.join(directory, 'current')
+    tmp_link = os.path.join(directory, f'.current-{version}')
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, link)
+
+    _prune_versions(directory, keep=version)
+    return version_dir
+
+
+def _prune_versions(directory: str, keep: str):
+    versions = sorted(name for name in os.listdir(directory) if name.startswith('v-'))
+    # Keep a few previous versions for readers that resolved `current` just before the swap
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class SnapshotPublisher:
+    """
+    Throttled publisher the crawler pokes after its commits
+
+    `maybe_publish()` only sets a flag; a daemon thread of its own renders and
+    writes the snapshot on its own database connection, so the listing and
+    stats queries never run on (and stall) the single writer thread.
+    """
+
+    def __init__(self, min_interval: float = 5.0, using: str = 'search_db'):
+        self.min_interval = min_interval
+        self.using = using
+        self.published = 0
+        self._requested = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def maybe_publish(self):
+        """Request a snapshot; published at most once per `min_interval` seconds, off the calling thread"""
+        self._requested.set()
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='snapshot-publisher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            try:
+                publish_snapshot(using=self.using)
+                self.published += 1
+            except Exception as e:
+                # The read path falls back to the database - never fail a crawl over a snapshot
+                logger.warning(f"⚠️ Snapshot publish failed: {e}")
+            finally:
+                connections[self.using].close()  # This thread's own connection
+            # Commits during the pause coalesce into the next snapshot
+            time.sleep(self.min_interval)
+
+
+class SnapshotReader:
+    """Serves files of the current snapshot version (per-process cache of immutable files)"""
+
+    def __init__(self, directory: str = None, max_age: float = None):
+        self.directory = directory
+        self.max_age = max_age
+        self._version = None
+        self._manifest = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _current(self) -> Optional[Tuple[str, Dict]]:
+        """(version, manifest) that `current` points at right now"""
+        directory = self.directory or snapshot_dir()
+        try:
+            version = os.readlink(os.path.join(directory, 'current'))
+        except OSError:
+            return None
+        with self._lock:
+            if version != self._version:
+                try:
+                    with open(os.path.join(directory, version, 'manifest.json'), encoding='utf-8') as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    return None
+                self._version, self._manifest, self._cache = version, manifest, {}
+            return self._version, self._manifest
+
+    def get(self, name: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) of a snapshot file, None if there is no fresh snapshot containing it"""
+        current = self._current()
+        if current is None:
+            return None
+        version, manifest = current
+        max_age = self.max_age if self.max_age is not None else getattr(settings, 'SEARCH_SNAPSHOT_MAX_AGE', 300)
+        if max_age and time.time() - manifest['created'] > max_age:
+            return None
+        etag = manifest['etags'].get(name)
+        if etag is None:
+            return None
+
+        cached = self._cache.get((version, name))
+        if cached is None:
+            try:
+                with open(os.path.join(self.directory or snapshot_dir(), version, name), 'rb') as f:
+                    cached = (f.read(), etag)
+            except OSError:
+                return None  # Version pruned under us - next request sees the new one
+            self._cache[(version, name)] = cached
+        return cached
+
+
+reader = SnapshotReader()
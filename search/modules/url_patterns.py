@@ -0,0 +1,164 @@
+"""
+URL Patterns
+============
+
+Collapse concrete URLs into pattern signatures so pages produced by the same
+template (pagination, tag listings, item pages) can be reasoned about together:
+
+    https://shop.com/tag/shoes?page=12              ->  /tag/*?page
+    https://shop.com/item/48213                     ->  /item/{n}
+    https://cal.org/events/2031/07/14?view=day      ->  /events/{n}/{n}/{n}?view
+    https://a.com/p/9f86d081884c7d659a2feaa0c55ad015 ->  /p/{id}
+
+UrlPatternAnalyzer watches one domain crawl: how many unique URLs each pattern
+produces and how many new external domains its pages actually yield. Patterns
+that keep minting new URLs without yielding links (calendars, faceted search,
+session IDs) are de-prioritized and then blocked. Its state is bounded per
+domain no matter how many URLs the site generates.
+"""
+
+import re
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+_NUMBER_RE = re.compile(r'\d+')
+_HEX_ID_RE = re.compile(r'^[0-9a-f]{16,}$|^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+_TOKEN_RE = re.compile(r'^(?=.*\d)(?=.*[a-zA-Z])[A-Za-z0-9_-]{20,}$')
+
+# Query keys that carry per-visitor state rather than content
+SESSION_KEYS = {'sid', 'sessionid', 'session_id', 'phpsessid', 'jsessionid', 'sessid', 'aspsessionid', 'zenid', 'oscsid'}
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_KEYS = {'fbclid', 'gclid', 'ref', 'ref_src'}
+
+
+def _is_session_key(key: str) -> bool:
+    key = key.lower()
+    return key in SESSION_KEYS or key in TRACKING_KEYS or key.startswith(TRACKING_PREFIXES)
+
+
+def _templatize_segment(segment: str) -> str:
+    if segment.isdigit():
+        return '{n}'
+    if _HEX_ID_RE.match(segment):
+        return '{id}'
+    if _TOKEN_RE.match(segment):
+        return '{token}'
+    return _NUMBER_RE.sub('{n}', segment)
+
+
+def strip_session_params(url: str) -> str:
+    """Drop session and tracking query parameters so the same page has one URL"""
+    parsed = urlparse(url)
+    if not parsed.query:
+        return url
+    params = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True) if not _is_session_key(key)]
+    return urlunparse(parsed._replace(query=urlencode(params)))
+
+
+def url_pattern(url: str) -> str:
+    """Pattern signature of a URL: templatized path plus sorted query keys (values dropped)"""
+    parsed = urlparse(url)
+    segments = [_templatize_segment(s) for s in parsed.path.split('/') if s]
+    # The last segment of a listing path is usually the variable part (/tag/<name>)
+    if len(segments) >= 2 and '{' not in segments[-1]:
+        segments[-1] = '*'
+    keys = sorted({
+        '{session}' if _is_session_key(key) else key
+        for key, _ in parse_qsl(parsed.query, keep_blank_values=True)
+    })
+    signature = '/' + '/'.join(segments)
+    if keys:
+        signature += '?' + '&'.join(keys)
+    return signature
+
+
+class _PatternStats:
+    __slots__ = ('discovered', 'fetched', 'new_links', 'blocked')
+
+    def __init__(self):
+        self.discovered = 0   # Unique URLs of this pattern queued
+        self.fetched = 0      # Pages of this pattern fetched
+        self.new_links = 0    # New external domains those pages yielded
+        self.blocked = False
+
+
+class UrlPatternAnalyzer:
+    """Per-domain crawl-trap detector with bounded state"""
+
+    def __init__(self, max_patterns: int = 256, min_fetches: int = 4, min_yield: float = 0.1,
+                 max_path_depth: int = 8, max_segment_repeats: int = 2, max_query_keys: int = 4):
+        """
+        Args:
+            max_patterns: Patterns tracked per domain (least recently used are forgotten)
+            min_fetches: Pages of a pattern to fetch before judging its yield
+            min_yield: New external domains per page below which a pattern is a trap suspect
+            max_path_depth: Paths deeper than this are treated as traps
+            max_segment_repeats: Same path segment appearing more often than this is a loop
+            max_query_keys: More query keys than this looks like faceted search
+        """
+        self.max_patterns = max_patterns
+        self.min_fetches = min_fetches
+        self.min_yield = min_yield
+        self.max_path_depth = max_path_depth
+        self.max_segment_repeats = max_segment_repeats
+        self.max_query_keys = max_query_keys
+        self._patterns = OrderedDict()
+        self.blocked_urls = 0
+
+    def _stats(self, pattern: str) -> _PatternStats:
+        stats = self._patterns.get(pattern)
+        if stats is None:
+            stats = self._patterns[pattern] = _PatternStats()
+            if len(self._patterns) > self.max_patterns:
+                self._patterns.popitem(last=False)
+        else:
+            self._patterns.move_to_end(pattern)
+        return stats
+
+    def _looks_structurally_trapped(self, url: str) -> bool:
+        parsed = urlparse(url)
+        segments = [s for s in parsed.path.split('/') if s]
+        if len(segments) > self.max_path_depth:
+            return True
+        if segments and max(segments.count(s) for s in set(segments)) > self.max_segment_repeats:
+            return True  # /a/b/a/b/a/b relative-link loops
+        keys = {key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)}
+        return len(keys) > self.max_query_keys
+
+    def admit(self, url: str) -> bool:
+        """Whether a newly discovered internal URL should be queued at all"""
+        if self._looks_structurally_trapped(url):
+            self.blocked_urls += 1
+            return False
+        stats = self._stats(url_pattern(url))
+        if stats.blocked:
+            self.blocked_urls += 1
+            return False
+        stats.discovered += 1
+        return True
+
+    def is_blocked(self, url: str) -> bool:
+        stats = self._patterns.get(url_pattern(url))
+        return bool(stats and stats.blocked)
+
+    def record_fetch(self, url: str, new_links: int):
+        """Feed back how many new external domains a fetched page produced"""
+        stats = self._stats(url_pattern(url))
+        stats.fetched += 1
+        stats.new_links += new_links
+
+        if stats.fetched >= self.min_fetches and stats.new_links / stats.fetched < self.min_yield:
+            # Keeps minting URLs but not links - calendar, facets, session IDs
+            if stats.discovered >= stats.fetched * 2:
+                stats.blocked = True
+
+    def priority(self, url: str) -> float:
+        """Sort key for a crawl level: lower is fetched first"""
+        stats = self._patterns.get(url_pattern(url))
+        if stats is None or not stats.fetched:
+            return 1.0  # Unexplored pattern
+        if stats.blocked:
+            return 10.0
+        page_yield = stats.new_links / stats.fetched
+        # Productive patterns first, then by how much the pattern is already sampled
+        return 1.0 / (1.0 + page_yield) + stats.fetched / (stats.fetched + 20.0)
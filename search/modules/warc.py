@@ -0,0 +1,188 @@
+"""
+WARC Capture & Replay
+=====================
+
+WarcWriter records every response the crawler fetches into rotating
+`.warc.gz` files (WARC/1.1, one gzip member per record so any record can be
+read on its own) and writes a CDXJ index next to each file:
+
+    <url> <14-digit timestamp> {"status": 200, "offset": 1234, "length": 5678, "filename": "..."}
+
+WarcArchive loads those indexes and serves recorded responses by URL, so the
+crawler can re-run link extraction and ranking from disk with no network.
+
+Bodies are stored decoded (as `requests` hands them over); Content-Encoding and
+Transfer-Encoding headers are dropped and Content-Length is rewritten to match.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DROPPED_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+
+
+class ArchivedResponse(NamedTuple):
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _warc_date(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _warc_record(warc_type: str, headers: Dict[str, str], block: bytes) -> bytes:
+    lines = [
+        'WARC/1.1',
+        f'WARC-Type: {warc_type}',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+    ]
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    lines.append(f'Content-Length: {len(block)}')
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+    return gzip.compress(head + block + b'\r\n\r\n')
+
+
+class WarcWriter:
+    """Thread-safe writer of rotating, gzip-per-record WARC files with CDXJ indexes"""
+
+    def __init__(self, directory: str, max_file_size: int = 256 * 1024 * 1024, prefix: str = 'crawl'):
+        """
+        Args:
+            directory: Where .warc.gz and .cdxj files are written
+            max_file_size: Start a new WARC file once the current one reaches this many bytes
+            prefix: File name prefix
+        """
+        self.directory = directory
+        self.max_file_size = max_file_size
+        self.prefix = prefix
+        self.records_written = 0
+        self._lock = threading.Lock()
+        self._serial = 0
+        self._warc = None
+        self._index = None
+        self._filename = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        self._close_files()
+        self._serial += 1
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        self._filename = f'{self.prefix}-{stamp}-{os.getpid()}-{self._serial:05d}.warc.gz'
+        self._warc = open(os.path.join(self.directory, self._filename), 'ab')
+        self._index = open(os.path.join(self.directory, self._filename[:-len('.warc.gz')] + '.cdxj'), 'a', encoding='utf-8')
+
+        info = 'software: SimplifiedPageRank\r\nformat: WARC File Format 1.1\r\n'.encode('utf-8')
+        self._warc.write(_warc_record('warcinfo', {
+            'WARC-Date': _warc_date(datetime.now(timezone.utc)),
+            'WARC-Filename': self._filename,
+            'Content-Type': 'application/warc-fields',
+        }, info))
+        logger.info(f"🗄️ Writing WARC file {self._filename}")
+
+    def write_response(self, url: str, status: int, reason: str, headers: Dict[str, str], body: bytes):
+        """Archive one HTTP response fetched for `url`"""
+        now = datetime.now(timezone.utc)
+        http_head = [f'HTTP/1.1 {status} {reason or ""}'.rstrip()]
+        http_head += [f'{name}: {value}' for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS]
+        http_head.append(f'Content-Length: {len(body)}')
+        block = ('\r\n'.join(http_head) + '\r\n\r\n').encode('utf-8', 'replace') + body
+
+        record = _warc_record('response', {
+            'WARC-Date': _warc_date(now),
+            'WARC-Target-URI': url,
+            'Content-Type': 'application/http; msgtype=response',
+        }, block)
+
+        with self._lock:
+            if self._warc is None or self._warc.tell() >= self.max_file_size:
+                self._rotate()
+            offset = self._warc.tell()
+            self._warc.write(record)
+            self._index.write(f'{url} {now.strftime("%Y%m%d%H%M%S")} ' + json.dumps({
+                'status': status,
+                'offset': offset,
+                'length': len(record),
+                'filename': self._filename,
+            }) + '\n')
+            self.records_written += 1
+
+    def write_requests_response(self, url: str, response):
+        """Archive a `requests.Response`"""
+        self.write_response(url, response.status_code, response.reason, dict(response.headers), response.content)
+
+    def _close_files(self):
+        for handle in (self._warc, self._index):
+            if handle is not None:
+                handle.close()
+        self._warc = self._index = None
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+
+class WarcArchive:
+    """Read-only view of a directory of WARC files, looked up by URL through their CDXJ indexes"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index: Dict[str, Tuple[str, int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.cdxj'):
+                continue
+            with open(os.path.join(directory, name), encoding='utf-8') as index:
+                for line in index:
+                    try:
+                        url, _, data = line.rstrip('\n').split(' ', 2)
+                        entry = json.loads(data)
+                    except ValueError:
+                        continue
+                    # Later captures of the same URL win
+                    self._index[url] = (entry['filename'], entry['offset'], entry['length'])
+        logger.info(f"🗄️ Loaded {len(self._index)} archived URLs from {directory}")
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url: str):
+        return url in self._index
+
+    def get(self, url: str) -> Optional[ArchivedResponse]:
+        """Recorded response for `url`, or None if it was never captured"""
+        entry = self._index.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        filename, offset, length = entry
+        with open(os.path.join(self.directory, filename), 'rb') as warc:
+            warc.seek(offset)
+            raw = gzip.decompress(warc.read(length))
+        self.hits += 1
+        return self._parse_response(url, raw)
+
+    @staticmethod
+    def _parse_response(url: str, raw: bytes) -> ArchivedResponse:
+        _, _, block = raw.partition(b'\r\n\r\n')
+        if block.endswith(b'\r\n\r\n'):
+            block = block[:-4]
+        http_head, _, body = block.partition(b'\r\n\r\n')
+        lines = http_head.decode('utf-8', 'replace').split('\r\n')
+        status = int(lines[0].split(' ')[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip()] = value.strip()
+        return ArchivedResponse(url=url, status=status, headers=headers, body=body)
@@ -0,0 +1,564 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from search.models import DomainRank, DomainLink, DomainFingerprint, CrawlerStats, CrawlerEvent, RankEpoch
+from search.modules.adaptive_concurrency import AdaptiveConcurrency
+from search.modules import crawler_events
+from search.modules.crawl_budget import CrawlBudget, CrawlBudgetAllocator
+from search.modules.crawler_events import stream_events, publish_many
+from search.modules.frontier import DomainFrontier
+from search.modules.keyset_pagination import encode_cursor, decode_cursor, paginate_domains
+from search.modules.domain_search import search_domains, drop_trigram_triggers, rebuild_trigram_index, trigram_index_ready
+from search.modules import result_writer
+from search.modules.personalized_pagerank import (
+    pack_fingerprint, unpack_fingerprint, compute_fingerprints, personalized_scores, related_domains,
+)
+from search.modules.rank_history import take_snapshot, domain_series, top_movers, compact_history
+from search.modules.result_writer import BatchedResultWriter, apply_crawl_results
+from search.modules.seed_import import import_seeds, _insert_chunk
+from search.modules.simhash import SimHashIndex, NearDuplicateTracker, simhash, hamming_distance
+from search.modules.snapshots import SnapshotPublisher
+from search.modules.url_patterns import UrlPatternAnalyzer, strip_session_params, url_pattern
+
+
+class SeedImportTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def test_inserts_new_domains(self):
+        counts = import_seeds(['example.com', 'https://www.example.org/page', 'example.net,42'])
+
+        self.assertEqual(counts, {'lines': 3, 'inserted': 3, 'existing': 0})
+        domains = DomainRank.objects.using('search_db')
+        self.assertEqual(
+            sorted(domains.values_list('domain', 'rank', 'processed', 'snapshot_rank')),
+            [('example.com', 0, False, 0), ('example.net', 42, False, 0), ('example.org', 0, False, 0)],
+        )
+        self.assertEqual(CrawlerStats.load().total_domains, 3)
+
+    def test_counts_only_new_domains(self):
+        import_seeds(['example.com', 'example.org'])
+        counts = import_seeds(['example.com', 'example.com,5', 'example.io'])
+
+        self.assertEqual(counts, {'lines': 3, 'inserted': 1, 'existing': 2})
+        self.assertEqual(DomainRank.objects.using('search_db').get(domain='example.com').rank, 0)  # Never modified
+        self.assertEqual(CrawlerStats.load().total_domains, 3)
+
+    def test_constraint_errors_are_not_swallowed(self):
+        with self.assertRaises(IntegrityError):
+            _insert_chunk({'example.com': -1}, 'search_db')  # rank is unsigned
+
+
+class CrawlerEventsTests(TransactionTestCase):
+    databases = {'default', 'search_db'}
+
+    def test_wsgi_request_is_told_to_stop(self):
+        # The test client is WSGI - an endless stream would be buffered and pin the worker
+        response = self.client.get(reverse('search:crawler_events'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_stream_ends_after_its_lifetime(self):
+        async def read():
+            return [frame async for frame in stream_events(heartbeat=0.05, lifetime=0.2)]
+
+        frames = async_to_sync(read)()
+        self.assertEqual(frames[0], 'retry: 3000\n\n')
+        self.assertIn(': keep-alive\n\n', frames)
+
+    def test_failed_publish_leaves_the_callers_transaction_usable(self):
+        with mock.patch.object(crawler_events, 'PRUNE_EVERY', 1), \
+                mock.patch.object(crawler_events, 'prune_events', side_effect=DatabaseError('disk I/O error')):
+            with transaction.atomic(using='search_db'):
+                DomainRank.objects.using('search_db').create(domain='example.com')
+                publish_many([('finished', 'example.com', {})])
+
+        self.assertFalse(CrawlerEvent.objects.using('search_db').exists())  # Rolled back to the savepoint
+        self.assertTrue(DomainRank.objects.using('search_db').filter(domain='example.com').exists())
+
+
+class AdaptiveConcurrencyTests(SimpleTestCase):
+    def _request(self, limiter, host, status, latency=0.1):
+        slot = limiter.acquire(host)
+        slot.status = status
+        limiter.release(slot, latency)
+
+    def test_one_failing_host_only_cuts_its_own_limit(self):
+        limiter = AdaptiveConcurrency(initial_global=8, initial_host=4)
+        for _ in range(60):
+            self._request(limiter, 'good.example', 200)
+            self._request(limiter, 'bad.example', 503)
+            self.assertGreaterEqual(limiter.worker_limit, 8)
+
+        self.assertLess(limiter.host_limit('bad.example'), 4)
+
+    def test_congestion_across_hosts_cuts_the_global_limit(self):
+        limiter = AdaptiveConcurrency(initial_global=8, initial_host=4)
+        for _ in range(30):
+            for host in ('a.example', 'b.example', 'c.example'):
+                self._request(limiter, host, 503)
+            self._request(limiter, 'good.example', 200)
+
+        self.assertLess(limiter.worker_limit, 8)
+
+
+class SnapshotPublisherTests(TransactionTestCase):
+    databases = {'default', 'search_db'}
+
+    def test_publishes_off_the_calling_thread(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        DomainRank.objects.using('search_db').create(domain='example.com', rank=3)
+
+        with override_settings(SEARCH_SNAPSHOT_DIR=directory):
+            publisher = SnapshotPublisher(min_interval=0.05)
+            publisher.maybe_publish()
+            self.assertNotEqual(publisher._thread, threading.current_thread())
+            deadline = time.monotonic() + 5
+            while not publisher.published and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(publisher.published, 1)
+        self.assertTrue(os.path.exists(os.path.join(directory, 'current', 'stats.json')))
+
+
+class BatchedResultWriterTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def setUp(self):
+        import_seeds(['good.com', 'bad.com'])
+        self.commits = []
+        self.writer = BatchedResultWriter(on_commit=lambda batch, summary: self.commits.append((batch, summary)),
+                                          max_attempts=2)
+
+        real_apply = result_writer.apply_crawl_results
+
+        def apply(results, using='search_db'):
+            if any(source == 'bad.com' for source, _ in results):
+                raise IntegrityError('bad row')
+            return real_apply(results, using=using)
+
+        patcher = mock.patch.object(result_writer, 'apply_crawl_results', side_effect=apply)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_batch_commits_its_good_results(self):
+        self.writer._commit([('good.com', {'a.com'}), ('bad.com', {'b.com'})])
+
+        (committed, summary), (failed, failed_summary) = self.commits
+        self.assertEqual(committed, [('good.com', {'a.com'})])
+        self.assertEqual(summary['sources'], {'good.com'})
+        self.assertEqual(failed, [('bad.com', {'b.com'})])
+        self.assertIsNone(failed_summary)
+        domains = DomainRank.objects.using('search_db')
+        self.assertTrue(domains.get(domain='good.com').processed)
+        self.assertFalse(domains.get(domain='bad.com').processed)  # Claimed again later
+        self.assertTrue(domains.filter(domain='a.com').exists())
+
+    def test_gives_up_after_max_attempts(self):
+        self.writer._commit([('bad.com', {'b.com'})])
+        self.writer._commit([('bad.com', {'b.com'})])
+
+        self.assertIsNone(self.commits[0][1])
+        self.assertEqual(self.commits[1][1]['sources'], {'bad.com'})
+        self.assertTrue(DomainRank.objects.using('search_db').get(domain='bad.com').processed)
+        self.assertFalse(DomainRank.objects.using('search_db').filter(domain='b.com').exists())
+        self.assertEqual(CrawlerStats.load().processed_count, 1)
+        self.assertEqual(self.writer.abandoned, 1)
+
+
+class ApplyCrawlResultsTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def setUp(self):
+        import_seeds(['source.com'])
+
+    def test_counts_only_domains_it_inserted(self):
+        real_insert = result_writer._insert_domains
+
+        def insert_after_rival(domains, using):
+            # Another writer inserts two of the domains between the existence check and the INSERT
+            DomainRank.objects.using(using).bulk_create([DomainRank(domain='a.com'), DomainRank(domain='other.com')])
+            CrawlerStats.increment(total=2, using=using)
+            return real_insert(domains, using)
+
+        with mock.patch.object(result_writer, '_insert_domains', side_effect=insert_after_rival):
+            apply_crawl_results([('source.com', {'a.com', 'b.com'}), ('other.com', {'b.com'})])
+
+        stats = CrawlerStats.load()
+        self.assertEqual(stats.total_domains, DomainRank.objects.using('search_db').count())
+        self.assertEqual(stats.processed_count, DomainRank.objects.using('search_db').filter(processed=True).count())
+        self.assertTrue(DomainRank.objects.using('search_db').get(domain='other.com').processed)
+
+
+class KeysetPaginationTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def setUp(self):
+        # Rank ties on purpose: order falls back to processed, then domain
+        DomainRank.objects.using('search_db').bulk_create([
+            DomainRank(domain=f'site{i}.com', rank=i // 3, processed=i % 2 == 0) for i in range(10)
+        ])
+        self.domains = DomainRank.objects.using('search_db').all()
+
+    def test_cursor_round_trip(self):
+        row = self.domains.get(domain='site4.com')
+        self.assertEqual(decode_cursor(encode_cursor(row)), (1, True, 'site4.com'))
+
+    def test_malformed_cursors_start_from_the_first_page(self):
+        for cursor in ['', 'not base64!', 'bm9wZQ', encode_cursor(DomainRank(domain='x', rank=0))[:-4]]:
+            self.assertIsNone(decode_cursor(cursor), cursor)
+        page = paginate_domains(self.domains, after='garbage', page_size=4)
+        self.assertEqual([row.domain for row in page], [row.domain for row in self.domains[:4]])
+        self.assertFalse(page.has_previous)
+
+    def test_forward_and_back_paging_follow_the_listing_order(self):
+        expected = list(self.domains.order_by('-rank', 'processed', 'domain').values_list('domain', flat=True))
+
+        pages, page = [], paginate_domains(self.domains, page_size=4)
+        pages.append(page)
+        while page.has_next:
+            page = paginate_domains(self.domains, after=page.next_cursor, page_size=4)
+            pages.append(page)
+        self.assertEqual([row.domain for page in pages for row in page], expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertIsNone(pages[-1].next_cursor)
+
+        # Walking back from the last page lands on the same earlier pages
+        back = paginate_domains(self.domains, before=pages[-1].previous_cursor, page_size=4)
+        self.assertEqual(list(back), pages[1].object_list)
+        self.assertTrue(back.has_previous and back.has_next)
+        first = paginate_domains(self.domains, before=back.previous_cursor, page_size=4)
+        self.assertEqual(list(first), pages[0].object_list)
+        self.assertFalse(first.has_previous)
+
+    def test_rank_ties_are_split_by_processed_then_domain(self):
+        tied = self.domains.filter(rank=1)  # site3 and site5 pending, site4 processed
+        seen, page = [], paginate_domains(tied, page_size=1)
+        seen.extend(page)
+        while page.has_next:
+            page = paginate_domains(tied, after=page.next_cursor, page_size=1)
+            seen.extend(page)
+        self.assertEqual([row.domain for row in seen], ['site3.com', 'site5.com', 'site4.com'])
+
+
+class DomainFrontierTests(SimpleTestCase):
+    def setUp(self):
+        self.frontier = DomainFrontier()
+        for domain, rank in [('c.com', 5), ('a.com', 5), ('d.com', 1), ('b.com', 9), ('e.com', 3)]:
+            self.frontier.push(domain, rank)
+
+    def test_pops_by_rank_then_domain(self):
+        self.assertEqual(self.frontier.pop_many(10),
+                         [('b.com', 9), ('a.com', 5), ('c.com', 5), ('e.com', 3), ('d.com', 1)])
+        self.assertEqual(len(self.frontier), 0)
+
+    def test_reprioritises_in_place(self):
+        self.frontier.update('d.com', 20)  # Up from the bottom
+        self.frontier.push('b.com', 0)  # Already queued: moved down, not duplicated
+        self.frontier.update('missing.com', 50)  # Not queued: ignored
+        self.assertEqual(len(self.frontier), 5)
+        self.assertEqual([domain for domain, _ in self.frontier.pop_many(10)],
+                         ['d.com', 'a.com', 'c.com', 'e.com', 'b.com'])
+
+    def test_apply_commit_mirrors_the_writer(self):
+        self.frontier.apply_commit({
+            'sources': {'b.com'},
+            'rank_changes': {'e.com': 7, 'new.com': 6, 'done.com': 99},
+            'created': {'new.com'},
+        })
+        self.assertNotIn('b.com', self.frontier)
+        self.assertNotIn('done.com', self.frontier)  # Processed elsewhere, not created by this batch
+        self.assertEqual(self.frontier.pop_many(3), [('e.com', 7), ('new.com', 6), ('a.com', 5)])
+
+    def test_heap_stays_ordered_under_mixed_operations(self):
+        rng = random.Random(7)
+        ranks = {}
+        for _ in range(500):
+            domain = f'site{rng.randrange(60)}.com'
+            if rng.random() < 0.2:
+                self.frontier.discard(domain)
+                ranks.pop(domain, None)
+            else:
+                rank = rng.randrange(100)
+                self.frontier.push(domain, rank)
+                ranks[domain] = rank
+        ranks.update({'a.com': 5, 'b.com': 9, 'c.com': 5, 'd.com': 1, 'e.com': 3})
+        expected = sorted(ranks.items(), key=lambda item: (-item[1], item[0]))
+        self.assertEqual(self.frontier.pop_many(len(ranks)), expected)
+
+
+class RankHistoryTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def setUp(self):
+        DomainRank.objects.using('search_db').bulk_create([DomainRank(domain=d) for d in ('a.com', 'b.com', 'c.com')])
+        self.noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def snapshot(self, ranks, days_ago, minutes=0):
+        for domain, rank in ranks.items():
+            DomainRank.objects.using('search_db').filter(domain=domain).update(rank=rank)
+        epoch = take_snapshot()
+        created_at = self.noon - timedelta(days=days_ago) + timedelta(minutes=minutes)
+        RankEpoch.objects.using('search_db').filter(pk=epoch.pk).update(created_at=created_at)
+        return epoch.pk
+
+    def series(self, domain):
+        return [(point['epoch'], point['rank']) for point in domain_series(domain)]
+
+    def test_snapshot_records_only_changed_domains(self):
+        first = self.snapshot({'a.com': 4}, 0)
+        second = self.snapshot({'a.com': 4, 'b.com': 2}, 0)
+        self.assertEqual(RankEpoch.objects.using('search_db').get(pk=second).changed_count, 1)
+        self.assertEqual(self.series('a.com'), [(first, 4)])
+        self.assertEqual(self.series('b.com'), [(second, 2)])
+
+    def test_compaction_folds_dropped_epochs_into_the_next_kept_one(self):
+        expired = self.snapshot({'c.com': 9}, 400)  # Past max_days
+        morning = self.snapshot({'a.com': 1, 'b.com': 1}, 40)
+        evening = self.snapshot({'a.com': 2}, 40, minutes=60)  # Last epoch of that day: kept
+        next_day = self.snapshot({'b.com': 5}, 39)
+        recent = self.snapshot({'c.com': 3}, 1)
+
+        self.assertEqual(compact_history(keep_days=30, max_days=365), 2)
+
+        self.assertEqual(set(RankEpoch.objects.using('search_db').values_list('pk', flat=True)),
+                         {evening, next_day, recent})
+        self.assertFalse(RankEpoch.objects.using('search_db').filter(pk__in=[expired, morning]).exists())
+        # Ranks at every kept epoch are unchanged: the latest change of the dropped ones is what survives
+        self.assertEqual(self.series('a.com'), [(evening, 2)])
+        self.assertEqual(self.series('b.com'), [(evening, 1), (next_day, 5)])
+        self.assertEqual(self.series('c.com'), [(evening, 9), (recent, 3)])
+
+        movers = [(row.domain, row.rank_from, row.rank_to, row.gain) for row in top_movers(evening, recent)]
+        self.assertEqual(movers, [('b.com', 1, 5, 4), ('c.com', 9, 3, -6)])
+
+
+class PersonalizedPageRankTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def setUp(self):
+        # hub -> a, b; a -> c; b -> c; c and lonely have no outlinks
+        domains = DomainRank.objects.using('search_db')
+        domains.bulk_create([DomainRank(domain=d) for d in ('hub.com', 'a.com', 'b.com', 'c.com', 'lonely.com')])
+        self.ids = dict(domains.values_list('domain', 'pk'))
+        DomainLink.objects.using('search_db').bulk_create([
+            DomainLink(source_id=self.ids[source], target_id=self.ids[target])
+            for source, target in [('hub.com', 'a.com'), ('hub.com', 'b.com'), ('a.com', 'c.com'), ('b.com', 'c.com')]
+        ])
+
+    def test_fingerprint_packing_round_trips(self):
+        self.assertEqual(unpack_fingerprint(pack_fingerprint([(7, 3), (2 ** 32 - 1, 70000)])), [(7, 3), (2 ** 32 - 1, 0xFFFF)])
+
+    def test_fingerprints_estimate_the_exact_ppr(self):
+        self.assertEqual(compute_fingerprints(walks=4000, seed=1), 3)  # Only domains with outlinks
+        scores = personalized_scores({self.ids['hub.com']: 1.0})
+        # Exact PPR from hub with alpha 0.15: stop at once, after one hop, or run into the dead end c
+        exact = {'hub.com': 0.15, 'a.com': 0.85 * 0.5 * 0.15, 'b.com': 0.85 * 0.5 * 0.15, 'c.com': 0.85 * 0.85}
+        for domain, expected in exact.items():
+            self.assertAlmostEqual(scores[self.ids[domain]], expected, delta=0.03, msg=domain)
+        self.assertAlmostEqual(sum(scores.values()), 1.0)
+
+    def test_seed_sets_combine_linearly(self):
+        compute_fingerprints(walks=1000, seed=1)
+        hub = personalized_scores({self.ids['hub.com']: 1.0})
+        mixed = personalized_scores({self.ids['hub.com']: 3.0, self.ids['lonely.com']: 1.0})
+        self.assertAlmostEqual(mixed[self.ids['c.com']], 0.75 * hub[self.ids['c.com']])
+        self.assertAlmostEqual(mixed[self.ids['lonely.com']], 0.25)  # No fingerprint: its walks never leave
+
+        related = related_domains(['hub.com'], limit=2)
+        self.assertEqual([domain.domain for domain, _ in related][0], 'c.com')
+        self.assertNotIn('hub.com', [domain.domain for domain, _ in related])
+
+    def test_recompute_drops_domains_without_links(self):
+        compute_fingerprints(walks=10, seed=1)
+        DomainLink.objects.using('search_db').filter(source_id=self.ids['a.com']).delete()
+        compute_fingerprints(walks=10, seed=1)
+        self.assertFalse(DomainFingerprint.objects.using('search_db').filter(domain_id=self.ids['a.com']).exists())
+
+
+class CrawlBudgetTests(SimpleTestCase):
+    def test_budget_grows_with_rank_relative_to_the_running_mean(self):
+        allocator = CrawlBudgetAllocator(base_pages=20, max_pages=200)
+        self.assertEqual(allocator.allocate(0).max_pages, 20)  # The first domain sets the mean
+        top = allocator.allocate(1023)  # Log weight 11 against a mean of 2
+        self.assertEqual(top.max_pages, 110)
+        self.assertEqual(top.max_depth, 3)
+        low = allocator.allocate(0)
+        self.assertEqual(low.max_pages, 11)  # 20 / 1.9
+
+    def test_budget_follows_the_yield_of_the_rank_band(self):
+        allocator = CrawlBudgetAllocator(base_pages=20, min_pages=3, max_pages=200)
+        allocator.record(rank=0, pages=10, new_domains=0, seconds=10)
+        allocator.record(rank=1023, pages=10, new_domains=20, seconds=10)
+        barren = allocator.allocate(0)
+        self.assertEqual(barren.max_pages, 5)  # Yield factor floored at 1/4
+        self.assertEqual(barren.max_depth, 2)  # Small budgets stay near the root
+        allocator._rank_weight = 11.0  # Same rank share, so only the yield differs
+        self.assertEqual(allocator.allocate(1023).max_pages, 80)  # Yield factor capped at 4
+
+    def test_budget_follows_the_hourly_target(self):
+        ahead = CrawlBudgetAllocator(base_pages=20, pages_per_hour=1000)
+        ahead._started -= 3600
+        ahead._pages_last_hour = 4000
+        self.assertEqual(ahead.allocate(0).max_pages, 5)
+
+        behind = CrawlBudgetAllocator(base_pages=20, pages_per_hour=1000)
+        behind._started -= 3600
+        behind._pages_last_hour = 100
+        self.assertEqual(behind.allocate(0).max_pages, 40)  # Pace capped at 2
+
+    def test_keep_crawling_stops_on_pages_time_or_dry_yield(self):
+        allocator = CrawlBudgetAllocator(probe_pages=5)
+        budget = CrawlBudget(max_pages=20, max_depth=3, max_seconds=60)
+        now = time.monotonic()
+        self.assertTrue(allocator.keep_crawling(budget, 10, 4, now))
+        self.assertFalse(allocator.keep_crawling(budget, 20, 0, now))
+        self.assertFalse(allocator.keep_crawling(budget, 10, 0, now - 61))
+        self.assertFalse(allocator.keep_crawling(budget, 10, 5, now))
+
+
+class SimHashTests(SimpleTestCase):
+    ARTICLE = ' '.join(f'word{i % 40} topic{i % 7} filler' for i in range(300))
+
+    def test_similar_texts_get_close_fingerprints(self):
+        edited = self.ARTICLE.replace('word3 topic3', 'changed text', 1)
+        unrelated = ' '.join(f'other{i} content{i % 11}' for i in range(120))
+        self.assertLessEqual(hamming_distance(simhash(self.ARTICLE), simhash(edited)), 3)
+        self.assertGreater(hamming_distance(simhash(self.ARTICLE), simhash(unrelated)), 10)
+        self.assertEqual(simhash(''), 0)
+
+    def test_index_finds_fingerprints_within_the_distance_in_any_block(self):
+        index = SimHashIndex(max_distance=3)
+        base = 0x0123456789ABCDEF
+        index.add(base)
+        # Flips spread over several blocks, still within 3 bits
+        for bits in [(0,), (1, 20), (5, 33, 63), (15, 16, 47)]:
+            near = base
+            for bit in bits:
+                near ^= 1 << bit
+            self.assertEqual(index.find_near(near), base, bits)
+        self.assertIsNone(index.find_near(base ^ 0b1111))  # 4 bits off
+
+    def test_index_matches_a_linear_scan(self):
+        rng = random.Random(3)
+        stored = [rng.getrandbits(64) for _ in range(300)]
+        index = SimHashIndex(max_distance=4)
+        for fingerprint in stored:
+            index.add(fingerprint)
+        for _ in range(300):
+            probe = rng.choice(stored)
+            for bit in rng.sample(range(64), rng.randrange(7)):
+                probe ^= 1 << bit
+            found = index.find_near(probe)
+            in_range = [fingerprint for fingerprint in stored if hamming_distance(fingerprint, probe) <= 4]
+            if in_range:
+                self.assertIn(found, in_range)
+            else:
+                self.assertIsNone(found)
+
+    def test_tracker_exhausts_patterns_that_repeat_a_page(self):
+        tracker = NearDuplicateTracker(min_samples=4)
+        self.assertFalse(tracker.check('https://a.com/tag/1', self.ARTICLE))
+        for page in range(2, 5):
+            self.assertTrue(tracker.check(f'https://a.com/tag/{page}', self.ARTICLE))
+        self.assertFalse(tracker.check('https://a.com/about', 'something else entirely here'))
+        self.assertTrue(tracker.is_exhausted('https://a.com/tag/99'))
+        self.assertFalse(tracker.is_exhausted('https://a.com/about'))
+        self.assertEqual(tracker.duplicates_found, 3)
+
+
+class UrlPatternTests(SimpleTestCase):
+    def test_urls_collapse_to_their_template(self):
+        for url, pattern in [
+            ('https://shop.com/tag/shoes?page=12', '/tag/*?page'),
+            ('https://shop.com/item/48213', '/item/{n}'),
+            ('https://cal.org/events/2031/07/14?view=day', '/events/{n}/{n}/{n}?view'),
+            ('https://a.com/p/9f86d081884c7d659a2feaa0c55ad015', '/p/{id}'),
+            ('https://a.com/cart?PHPSESSID=abc&utm_source=x', '/cart?{session}'),
+            ('https://a.com/', '/'),
+        ]:
+            self.assertEqual(url_pattern(url), pattern, url)
+
+    def test_strips_session_and_tracking_params(self):
+        self.assertEqual(strip_session_params('https://a.com/list?page=2&sid=abc&utm_medium=mail&fbclid=1'),
+                         'https://a.com/list?page=2')
+        self.assertEqual(strip_session_params('https://a.com/list'), 'https://a.com/list')
+
+    def test_structural_traps_are_refused_up_front(self):
+        analyzer = UrlPatternAnalyzer(max_path_depth=8, max_segment_repeats=2, max_query_keys=4)
+        self.assertTrue(analyzer.admit('https://a.com/docs/guide/intro'))
+        self.assertFalse(analyzer.admit('https://a.com/' + '/'.join(f'd{i}' for i in range(9))))
+        self.assertFalse(analyzer.admit('https://a.com/a/b/a/b/a/b'))
+        self.assertFalse(analyzer.admit('https://a.com/search?color=1&size=2&brand=3&sort=4&price=5'))
+        self.assertEqual(analyzer.blocked_urls, 3)
+
+    def test_patterns_minting_urls_without_links_get_blocked(self):
+        analyzer = UrlPatternAnalyzer(min_fetches=4, min_yield=0.1)
+        for day in range(1, 11):
+            analyzer.admit(f'https://a.com/calendar/2031/01/{day}')
+            analyzer.admit(f'https://a.com/item/{day}')
+        for day in range(1, 5):
+            analyzer.record_fetch(f'https://a.com/calendar/2031/01/{day}', new_links=0)
+            analyzer.record_fetch(f'https://a.com/item/{day}', new_links=3)
+
+        self.assertTrue(analyzer.is_blocked('https://a.com/calendar/2031/02/1'))
+        self.assertFalse(analyzer.admit('https://a.com/calendar/2031/02/1'))
+        self.assertFalse(analyzer.is_blocked('https://a.com/item/99'))
+        self.assertLess(analyzer.priority('https://a.com/item/99'), analyzer.priority('https://a.com/new/page'))
+        self.assertEqual(analyzer.priority('https://a.com/calendar/2031/02/1'), 10.0)
+
+    def test_pattern_state_is_bounded(self):
+        analyzer = UrlPatternAnalyzer(max_patterns=3)
+        for section in 'abcdefghij':
+            analyzer.admit(f'https://a.com/{section}/page')
+        self.assertEqual(len(analyzer._patterns), 3)
+
+
+class ReplayCommandTests(SimpleTestCase):
+    def test_replay_refuses_the_live_database(self):
+        with self.assertRaisesMessage(CommandError, '--replay-db=PATH'):
+            call_command('run_pagerank', replay='/nonexistent', sequential=True)
+
+
+class DomainSearchTests(TestCase):
+    databases = {'default', 'search_db'}
+
+    def search(self, query):
+        return [domain.domain for domain in search_domains(query)]
+
+    def test_writes_keep_substring_search_in_sync(self):
+        self.assertTrue(trigram_index_ready())
+        domains = DomainRank.objects.using('search_db')
+        domains.create(domain='coffeeshop.com', rank=5)
+        tea = domains.create(domain='teahouse.org', rank=9)
+        self.assertEqual(self.search('ffee'), ['coffeeshop.com'])
+
+        domains.filter(pk=tea.pk).update(domain='coffeehouse.org')
+        self.assertEqual(self.search('COFFEE'), ['coffeehouse.org', 'coffeeshop.com'])
+        self.assertEqual(self.search('teahouse'), [])
+
+        domains.filter(domain='coffeeshop.com').delete()
+        self.assertEqual(self.search('coffee'), ['coffeehouse.org'])
+        self.assertEqual(self.search('co'), ['coffeehouse.org'])  # Too short for trigrams
+
+    def test_falls_back_while_the_triggers_are_dropped(self):
+        drop_trigram_triggers()
+        self.assertFalse(trigram_index_ready())
+        DomainRank.objects.using('search_db').create(domain='coffeeshop.com')
+        self.assertEqual(self.search('ffee'), ['coffeeshop.com'])
+
+        rebuild_trigram_index()
+        self.assertTrue(trigram_index_ready())
+        self.assertEqual(self.search('ffee'), ['coffeeshop.com'])
@@ -7,4 +7,10 @@ urlpatterns = [
     path('', views.search_view, name='search'),
     path('dashboard/', views.crawler_dashboard, name='crawler_dashboard'),
     path('api/crawler/', views.crawler_api, name='crawler_api'),
+    path('api/domains/', views.domains_api, name='domains_api'),
+    path('api/domains/search/', views.domain_search_api, name='domain_search_api'),
+    path('api/domains/history/', views.domain_history_api, name='domain_history_api'),
+    path('api/domains/movers/', views.rank_movers_api, name='rank_movers_api'),
+    path('api/crawler/events/', views.crawler_events, name='crawler_events'),
+    path('api/related/', views.related_api, name='related_api'),
 ]
@@ -1,58 +1,145 @@
+import json
+from hashlib import blake2b
+from types import SimpleNamespace
+
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.db.models import Q
-from .models import DomainRank
+from django.utils.dateparse import parse_datetime
+from .models import DomainRank, CrawlerStats, RankEpoch
+from .modules.keyset_pagination import KeysetPage, paginate_domains, PAGE_SIZE
+from .modules.snapshots import LISTING_FILTERS, page_name, page_payload, stats_payload, reader as snapshot_reader
+from .modules.crawler_events import stream_events
+from .modules.domain_search import filter_domains, search_domains
+from .modules.personalized_pagerank import related_domains
+from .modules.rank_history import domain_series, top_movers
 
 
 def search_view(request):
     """Handle search requests"""
     query = request.GET.get('q', '')
     
-    # For now, just print to console (placeholder for future functionality)
+    # Domains matching the query seed a personalized PageRank, weighted by their global rank
+    matches = []
+    related = []
     if query:
-        print(f"Search query received: {query}")
+        matches = search_domains(query.strip(), limit=10)
+        if matches:
+            related = related_domains({d.domain: 1 + d.rank for d in matches}, limit=20)
     
     context = {
         'query': query,
+        'matches': matches,
+        'related': related,
     }
     
     return render(request, 'search/search.html', context)
 
 
-def crawler_dashboard(request):
-    """
-    Real-time dashboard showing crawler progress and domain rankings
-    """
-    # Get filter parameters
-    show_processed = request.GET.get('processed', 'all')  # all, yes, no
-    search_query = request.GET.get('search', '')
-    page_num = request.GET.get('page', 1)
-    
-    # Base queryset
+def _filtered_domains(show_processed, search_query):
+    """Dashboard listing queryset plus its total from the materialized counters (None if unknown)"""
     domains = DomainRank.objects.using('search_db').all()
+    stats = CrawlerStats.load()
+    total = stats.total_domains
     
     # Filter by processing status
     if show_processed == 'yes':
         domains = domains.filter(processed=True)
+        total = stats.processed_count
     elif show_processed == 'no':
         domains = domains.filter(processed=False)
+        total = stats.pending_count
     
-    # Filter by search query
+    # Filter by search query (trigram index, not a LIKE scan)
     if search_query:
-        domains = domains.filter(domain__icontains=search_query)
+        domains = filter_domains(domains, search_query)
+        total = None
     
-    # Order by rank descending
-    domains = domains.order_by('-rank', 'processed', 'domain')
+    return domains, total, stats
+
+
+def _etag_matches(request, etag):
+    return etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+
+
+def _snapshot_response(request, name):
+    """Serve a snapshot file with its ETag (304 if the client has it), None if it isn't snapshotted"""
+    snapshot = snapshot_reader.get(name)
+    if snapshot is None:
+        return None
+    body, etag = snapshot
+    response = HttpResponseNotModified() if _etag_matches(request, etag) else HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'  # Always revalidate - a new snapshot may be out
+    return response
+
+
+def _snapshot_dashboard(request, show_processed):
+    """Dashboard rendered from the published snapshot (no search_db access), None if unavailable"""
+    stats_snapshot = snapshot_reader.get('stats.json')
+    page_snapshot = snapshot_reader.get(page_name(show_processed, request.GET.get('after'), request.GET.get('before')))
+    if stats_snapshot is None or page_snapshot is None:
+        return None
     
-    # Pagination
-    paginator = Paginator(domains, 50)  # 50 domains per page
-    page_obj = paginator.get_page(page_num)
+    etag = '"' + blake2b((stats_snapshot[1] + page_snapshot[1]).encode(), digest_size=12).hexdigest() + '"'
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
     
-    # Statistics
-    total_domains = DomainRank.objects.using('search_db').count()
-    processed_count = DomainRank.objects.using('search_db').filter(processed=True).count()
-    pending_count = total_domains - processed_count
+    data = json.loads(stats_snapshot[0])
+    listing = json.loads(page_snapshot[0])
+    rows = [
+        SimpleNamespace(domain=row['domain'], rank=row['rank'], processed=row['processed'], updated_at=parse_datetime(row['updated_at']))
+        for row in listing['results']
+    ]
+    for row in data['recent_activity']:
+        row['updated_at'] = parse_datetime(row['updated_at'])
+    
+    context = {
+        'page_obj': KeysetPage(
+            rows,
+            has_next=listing['next_cursor'] is not None,
+            has_previous=listing['previous_cursor'] is not None,
+            total=listing['total'],
+        ),
+        'total_domains': data['stats']['total_domains'],
+        'processed_count': data['stats']['processed_count'],
+        'pending_count': data['stats']['pending_count'],
+        'top_domains': data['top_domains'],
+        'recent_processed': data['recent_activity'],
+        'show_processed': show_processed,
+        'search_query': '',
+    }
+    response = render(request, 'search/crawler_dashboard.html', context)
+    response['ETag'] = etag
+    return response
+
+
+def crawler_dashboard(request):
+    """
+    Real-time dashboard showing crawler progress and domain rankings
+    """
+    # Get filter parameters
+    show_processed = request.GET.get('processed', 'all')  # all, yes, no
+    search_query = request.GET.get('search', '')
+    
+    # Served from the crawler's published snapshot while it is fresh
+    if not search_query and show_processed in LISTING_FILTERS:
+        response = _snapshot_dashboard(request, show_processed)
+        if response is not None:
+            return response
+    
+    domains, total, stats = _filtered_domains(show_processed, search_query)
+    
+    # Keyset pagination - constant cost per page regardless of depth
+    page_obj = paginate_domains(
+        domains,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        total=total,
+    )
     
     # Top domains
     top_domains = DomainRank.objects.using('search_db').order_by('-rank')[:10]
@@ -64,9 +151,9 @@ def crawler_dashboard(request):
     
     context = {
         'page_obj': page_obj,
-        'total_domains': total_domains,
-        'processed_count': processed_count,
-        'pending_count': pending_count,
+        'total_domains': stats.total_domains,
+        'processed_count': stats.processed_count,
+        'pending_count': stats.pending_count,
         'top_domains': top_domains,
         'recent_processed': recent_processed,
         'show_processed': show_processed,
@@ -76,42 +163,168 @@ def crawler_dashboard(request):
     return render(request, 'search/crawler_dashboard.html', context)
 
 
+def domains_api(request):
+    """
+    JSON listing of ranked domains with cursor pagination
+    
+    Query params: processed (all/yes/no), search, after, before, limit (max 200)
+    """
+    show_processed = request.GET.get('processed', 'all')
+    search_query = request.GET.get('search', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', PAGE_SIZE)), 200))
+    except ValueError:
+        limit = PAGE_SIZE
+    
+    # First pages of each listing come from the published snapshot
+    if not search_query and limit == PAGE_SIZE and show_processed in LISTING_FILTERS:
+        response = _snapshot_response(request, page_name(show_processed, request.GET.get('after'), request.GET.get('before')))
+        if response is not None:
+            return response
+    
+    domains, total, _ = _filtered_domains(show_processed, search_query)
+    page = paginate_domains(
+        domains,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=limit,
+        total=total,
+    )
+    
+    return JsonResponse(page_payload(page))
+
+
 def crawler_api(request):
     """
     JSON API for real-time data updates
     """
-    # Statistics
-    total_domains = DomainRank.objects.using('search_db').count()
-    processed_count = DomainRank.objects.using('search_db').filter(processed=True).count()
-    pending_count = total_domains - processed_count
+    response = _snapshot_response(request, 'stats.json')
+    if response is not None:
+        return response
     
-    # Top 10 domains
-    top_domains = list(DomainRank.objects.using('search_db').order_by('-rank')[:10].values(
-        'domain', 'rank', 'processed', 'updated_at'
-    ))
+    return JsonResponse(stats_payload())
+
+
+def domain_search_api(request):
+    """
+    Substring search over all ranked domains, best ranked first
     
-    # Recent activity
-    recent = list(DomainRank.objects.using('search_db').filter(
-        processed=True
-    ).order_by('-updated_at')[:5].values(
-        'domain', 'rank', 'updated_at'
-    ))
+    Query params: q (substring), limit (max 100)
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
     
-    # Currently being processed (recently updated, not processed)
-    currently_processing = DomainRank.objects.using('search_db').filter(
-        processed=False
-    ).order_by('-updated_at').first()
+    results = search_domains(query, limit=limit) if query else []
     
     return JsonResponse({
-        'stats': {
-            'total_domains': total_domains,
-            'processed_count': processed_count,
-            'pending_count': pending_count,
-        },
-        'top_domains': top_domains,
-        'recent_activity': recent,
-        'currently_processing': {
-            'domain': currently_processing.domain if currently_processing else None,
-            'rank': currently_processing.rank if currently_processing else 0,
-        }
+        'query': query,
+        'results': [
+            {'domain': d.domain, 'rank': d.rank, 'processed': d.processed}
+            for d in results
+        ],
+    })
+
+
+def related_api(request):
+    """
+    Domains related to a seed set by personalized PageRank (precomputed fingerprints)
+    
+    Query params: domain (repeatable, or comma-separated), limit (max 100)
+    """
+    seeds = []
+    for value in request.GET.getlist('domain'):
+        seeds.extend(part.strip().lower() for part in value.split(',') if part.strip())
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    
+    if not seeds:
+        return JsonResponse({'error': 'At least one domain parameter is required'}, status=400)
+    
+    return JsonResponse({
+        'seeds': seeds,
+        'results': [
+            {'domain': d.domain, 'score': round(score, 6), 'rank': d.rank}
+            for d, score in related_domains(seeds, limit=limit)
+        ],
+    })
+
+
+def domain_history_api(request):
+    """
+    Rank history of one domain: its recorded changes per snapshot epoch
+    
+    Query params: domain
+    """
+    domain = request.GET.get('domain', '').strip().lower()
+    if not domain:
+        return JsonResponse({'error': 'The domain parameter is required'}, status=400)
+    
+    current = DomainRank.objects.using('search_db').filter(domain=domain).values_list('rank', flat=True).first()
+    if current is None:
+        return JsonResponse({'error': f'Unknown domain: {domain}'}, status=404)
+    
+    return JsonResponse({
+        'domain': domain,
+        'rank': current,
+        'series': [
+            {'epoch': point['epoch'], 'at': point['at'].isoformat(), 'rank': point['rank']}
+            for point in domain_series(domain)
+        ],
+    })
+
+
+def rank_movers_api(request):
+    """
+    Domains with the biggest rank gains between two snapshot epochs
+    
+    Query params: from, to (epoch ids - default: the two latest epochs), limit (max 100)
+    """
+    latest = list(RankEpoch.objects.using('search_db').order_by('-id').values_list('id', flat=True)[:2])
+    try:
+        to_epoch = int(request.GET.get('to') or (latest[0] if latest else 0))
+        from_epoch = int(request.GET.get('from') or (latest[1] if len(latest) > 1 else 0))
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        return JsonResponse({'error': 'from, to and limit must be integers'}, status=400)
+    
+    if from_epoch > to_epoch:
+        from_epoch, to_epoch = to_epoch, from_epoch
+    
+    return JsonResponse({
+        'from': from_epoch,
+        'to': to_epoch,
+        'movers': [
+            {'domain': d.domain, 'rank_from': d.rank_from, 'rank_to': d.rank_to, 'gain': d.gain}
+            for d in top_movers(from_epoch, to_epoch, limit=limit)
+        ],
     })
+
+
+async def crawler_events(request):
+    """
+    Server-sent events stream of live crawler activity
+    
+    Pushes `claimed`, `finished` and `ranks` events as the crawler publishes them.
+    Needs an ASGI server (gunicorn with uvicorn workers, see unicorner/asgi.py). Under WSGI
+    (gunicorn's sync workers) Django would buffer the endless stream and pin a
+    worker per tab, so it answers 204 instead - EventSource then stops for good
+    and the dashboard falls back to polling `crawler_api`.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    
+    response = StreamingHttpResponse(stream_events(last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
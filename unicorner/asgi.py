@@ -3,6 +3,12 @@ ASGI config for unicorner project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived streaming endpoints (e.g. the crawler dashboard's server-sent
+events at /search/api/crawler/events/) need this entry point rather than WSGI.
+Production runs it under gunicorn with uvicorn workers (both in requirements.txt):
+
+    gunicorn --workers 8 --worker-class uvicorn_worker.UvicornWorker unicorner.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
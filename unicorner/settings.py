@@ -1,5 +1,6 @@
 from pathlib import Path
 from decouple import config
+from unicorner.sqlite import sqlite_database
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -70,20 +71,55 @@ WSGI_APPLICATION = 'unicorner.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Both SQLite files are tuned for concurrent readers/writers (WAL, busy timeout,
+# IMMEDIATE transactions, persistent connections) - see unicorner/sqlite.py
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    },
-    'search_db': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'search' / 'database' / 'search.sqlite3',
-    }
+    'default': sqlite_database(
+        BASE_DIR / 'db.sqlite3',
+        synchronous=config('DB_SYNCHRONOUS', default='NORMAL'),
+        busy_timeout=config('DB_BUSY_TIMEOUT_MS', default=5000, cast=int),
+        mmap_size=config('DB_MMAP_SIZE', default=64 * 1024 * 1024, cast=int),
+        cache_size_kib=config('DB_CACHE_SIZE_KIB', default=8 * 1024, cast=int),
+        conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
+    ),
+    # Crawler writes constantly while the dashboard reads - bigger cache/mmap, longer wait
+    'search_db': sqlite_database(
+        BASE_DIR / 'search' / 'database' / 'search.sqlite3',
+        synchronous=config('SEARCH_DB_SYNCHRONOUS', default='NORMAL'),
+        busy_timeout=config('SEARCH_DB_BUSY_TIMEOUT_MS', default=10000, cast=int),
+        mmap_size=config('SEARCH_DB_MMAP_SIZE', default=512 * 1024 * 1024, cast=int),
+        cache_size_kib=config('SEARCH_DB_CACHE_SIZE_KIB', default=64 * 1024, cast=int),
+        conn_max_age=config('SEARCH_DB_CONN_MAX_AGE', default=600, cast=int),
+    ),
 }
 
 # Database routing for search app independence
 DATABASE_ROUTERS = ['search.database.config.SearchDatabaseRouter']
 
+# Immutable JSON snapshots the crawler publishes for the dashboard read path
+SEARCH_SNAPSHOT_DIR = config('SEARCH_SNAPSHOT_DIR', default=str(BASE_DIR / 'search' / 'database' / 'snapshots'))
+# Older snapshots (crawler stopped) are ignored and the views read search_db directly
+SEARCH_SNAPSHOT_MAX_AGE = config('SEARCH_SNAPSHOT_MAX_AGE', default=300, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# File-based so every process (web workers, management commands) shares and invalidates the same entries
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'cache')),
+    }
+}
+
+# Upper bound on how long cached warehouse dashboard aggregates live (writes invalidate them sooner)
+WAREHOUSE_DASHBOARD_CACHE_TIMEOUT = config('WAREHOUSE_DASHBOARD_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Purchase order zips rendered in the background for the reorder page (removed after a day)
+WAREHOUSE_PURCHASE_ORDER_DIR = config('WAREHOUSE_PURCHASE_ORDER_DIR', default=str(BASE_DIR / 'purchase_orders'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
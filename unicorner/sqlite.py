@@ -0,0 +1,77 @@
+"""
+SQLite connection tuning for concurrent readers and writers.
+
+The crawler writes search.sqlite3 while the dashboard reads it, and warehouse
+staff write db.sqlite3 while the site reads it. With the default rollback
+journal readers and writers block each other; with deferred transactions a
+reader that later writes can fail immediately with "database is locked".
+
+`sqlite_database()` builds a DATABASES entry that, on every new connection:
+    - switches to WAL (readers never block the writer and vice versa)
+    - relaxes fsync to synchronous=NORMAL (safe with WAL)
+    - memory-maps the file and enlarges the page cache
+    - waits `busy_timeout` ms for the write lock instead of failing
+    - starts write transactions as BEGIN IMMEDIATE (no lock-upgrade deadlocks)
+and keeps connections open between requests (CONN_MAX_AGE).
+
+Each alias passes its own values, so settings.py stays the single place to tune.
+"""
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def sqlite_pragmas(journal_mode='WAL', synchronous='NORMAL', busy_timeout=5000,
+                   mmap_size=256 * 1024 * 1024, cache_size_kib=16 * 1024):
+    """Return the PRAGMA statements for a tuning profile, in execution order"""
+    journal_mode = journal_mode.upper()
+    synchronous = synchronous.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLite journal_mode '{journal_mode}'")
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Unknown SQLite synchronous level '{synchronous}'")
+
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={int(busy_timeout)}",
+        f"PRAGMA mmap_size={int(mmap_size)}",
+        f"PRAGMA cache_size={-int(cache_size_kib)}",  # Negative = KiB rather than pages
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def sqlite_database(name, journal_mode='WAL', synchronous='NORMAL', busy_timeout=5000,
+                    mmap_size=256 * 1024 * 1024, cache_size_kib=16 * 1024,
+                    conn_max_age=600, transaction_mode='IMMEDIATE'):
+    """
+    Build a DATABASES entry for a tuned SQLite file
+
+    Args:
+        name: Path of the database file
+        journal_mode: WAL lets readers and the writer run concurrently
+        synchronous: NORMAL is durable across app crashes when using WAL
+        busy_timeout: Milliseconds to wait for a lock before raising "database is locked"
+        mmap_size: Bytes of the file to memory-map (0 disables)
+        cache_size_kib: Page cache per connection in KiB
+        conn_max_age: Seconds to keep a connection open (persistent connections)
+        transaction_mode: BEGIN mode for atomic blocks (IMMEDIATE takes the write lock up front)
+    """
+    pragmas = sqlite_pragmas(
+        journal_mode=journal_mode,
+        synchronous=synchronous,
+        busy_timeout=busy_timeout,
+        mmap_size=mmap_size,
+        cache_size_kib=cache_size_kib,
+    )
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(pragmas),
+            'transaction_mode': transaction_mode,
+            'timeout': busy_timeout / 1000,  # sqlite3 module's own wait, kept in step with busy_timeout
+        },
+    }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.db.models import Count, Q
-from .models import Supplier, Category, Stock
+from .models import Supplier, Category, Stock, StockMovement, StockBalanceSnapshot
 from .forms import CategoryForm, StockForm
 
 
@@ -14,7 +14,7 @@ class SupplierAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'is_active')
+            'fields': ('name', 'is_active', 'lead_time_days')
         }),
         ('Contact Details', {
             'fields': ('contact_person', 'email', 'phone', 'address')
@@ -58,7 +58,10 @@ class StockAdmin(admin.ModelAdmin):
     ]
     search_fields = ['name', 'description', 'supplier__name']
     list_editable = ['current_quantity', 'minimum_quantity', 'unit_price', 'is_active']
-    readonly_fields = ['needs_reorder', 'created_at', 'updated_at']
+    readonly_fields = [
+        'needs_reorder', 'created_at', 'updated_at',
+        'forecast_daily_usage', 'suggested_minimum_quantity', 'suggested_order_quantity', 'forecast_at',
+    ]
     
     fieldsets = (
         ('Basic Information', {
@@ -71,6 +74,11 @@ class StockAdmin(admin.ModelAdmin):
             'fields': ('needs_reorder',),
             'classes': ('collapse',)
         }),
+        ('Forecast', {
+            'fields': ('forecast_daily_usage', 'suggested_minimum_quantity', 'suggested_order_quantity', 'forecast_at'),
+            'description': 'Written by the forecast_reorder_levels command; empty until it has run with enough consumption history.',
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -80,7 +88,19 @@ class StockAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('category', 'supplier')
 
-    actions = ['mark_for_reorder', 'unmark_for_reorder']
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Keep the ledger complete for quantities edited here (including list_editable)
+        if 'current_quantity' in form.changed_data:
+            previous = form.initial.get('current_quantity') if change else 0
+            delta = obj.current_quantity - (previous or 0)
+            if delta:
+                StockMovement.objects.create(
+                    stock=obj, kind=StockMovement.ADJUSTMENT, quantity=delta,
+                    note='Edited in admin', created_by=request.user
+                )
+
+    actions = ['mark_for_reorder', 'unmark_for_reorder', 'recalculate_reorder_flags']
 
     def mark_for_reorder(self, request, queryset):
         updated = queryset.update(needs_reorder=True)
@@ -92,6 +112,11 @@ class StockAdmin(admin.ModelAdmin):
         self.message_user(request, f"{updated} items unmarked for reorder.")
     unmark_for_reorder.short_description = "Unmark selected items for reorder"
 
+    def recalculate_reorder_flags(self, request, queryset):
+        corrected = queryset.sync_reorder_flags()
+        self.message_user(request, f"Reorder flags recalculated, {corrected} items corrected.")
+    recalculate_reorder_flags.short_description = "Recalculate reorder flags from quantities"
+
     def get_stock_status(self, obj):
         return obj.stock_status
     get_stock_status.short_description = 'Status'
@@ -100,3 +125,37 @@ class StockAdmin(admin.ModelAdmin):
     def get_total_value(self, obj):
         return f"₪{obj.total_value:.2f}"
     get_total_value.short_description = 'Total Value'
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'stock', 'kind', 'quantity', 'note', 'created_by']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['stock__name', 'note']
+    list_select_related = ['stock__supplier', 'created_by']
+    raw_id_fields = ['stock']
+    date_hierarchy = 'created_at'
+
+    # The ledger is append-only and written through warehouse.ledger together with the stock quantity
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockBalanceSnapshot)
+class StockBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['taken_at', 'stock', 'quantity', 'last_movement_id']
+    search_fields = ['stock__name']
+    list_select_related = ['stock__supplier']
+    date_hierarchy = 'taken_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,69 @@
+"""
+Cached warehouse dashboard aggregates.
+
+All stock figures come from one GROUP BY over active stocks (per supplier and
+category, with conditional counts and the value sum), and the supplier and
+category lists are filled from those groups. The result is cached as plain
+data; Stock/Supplier/Category signals (warehouse.signals) and StockQuerySet's
+bulk writes drop it after their transaction commits.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Supplier, Category, Stock
+
+
+DASHBOARD_CACHE_KEY = 'warehouse:dashboard:v1'
+
+
+def compute_dashboard_data():
+    """Dashboard figures computed from the database"""
+    groups = Stock.objects.filter(is_active=True).order_by().values('supplier_id', 'category_id').annotate(
+        stocks=Count('id'),
+        low=Count('id', filter=Q(needs_reorder=True)),
+        out=Count('id', filter=Q(current_quantity=0)),
+        value=Sum(F('current_quantity') * F('unit_price')),
+    )
+
+    stats = {'total_stocks': 0, 'low_stock_items': 0, 'out_of_stock': 0, 'total_value': Decimal('0')}
+    per_supplier = {}
+    per_category = {}
+    for group in groups:
+        stats['total_stocks'] += group['stocks']
+        stats['low_stock_items'] += group['low']
+        stats['out_of_stock'] += group['out']
+        stats['total_value'] += group['value'] or 0
+        per_supplier[group['supplier_id']] = per_supplier.get(group['supplier_id'], 0) + group['stocks']
+        per_category[group['category_id']] = per_category.get(group['category_id'], 0) + group['stocks']
+    stats['has_reorder_items'] = stats['low_stock_items'] > 0
+
+    suppliers = [
+        {**supplier, 'stock_count': per_supplier.get(supplier['id'], 0)}
+        for supplier in Supplier.objects.filter(is_active=True).values('id', 'name', 'contact_person')
+    ]
+    categories = [
+        {**category, 'stock_count': per_category.get(category['id'], 0)}
+        for category in Category.objects.values('id', 'name')
+    ]
+    return {'stats': stats, 'suppliers': suppliers, 'categories': categories}
+
+
+def get_dashboard_data():
+    """Dashboard figures from the cache, computed on a miss"""
+    data = cache.get(DASHBOARD_CACHE_KEY)
+    if data is None:
+        data = compute_dashboard_data()
+        cache.set(DASHBOARD_CACHE_KEY, data, getattr(settings, 'WAREHOUSE_DASHBOARD_CACHE_TIMEOUT', 3600))
+    return data
+
+
+def invalidate_dashboard_data():
+    """
+    Drop the cached figures once the current transaction commits (immediately
+    outside one), so a concurrent request can't re-cache pre-commit data.
+    """
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_CACHE_KEY))
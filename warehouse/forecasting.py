@@ -0,0 +1,174 @@
+"""
+Consumption forecasting for reorder levels.
+
+Daily usage per stock comes from the movement ledger (consumptions, and the
+shortfalls found by counts) as one grouped query, laid out as a stocks x days
+matrix. Exponential smoothing then runs over the days with every stock
+updated at once as a numpy vector, giving each stock a usage level and a
+variance. With the supplier's lead time these give a reorder point (usage
+over the lead time plus safety stock) and an order quantity (usage over the
+cover period).
+
+numpy is imported lazily, like openpyxl for XLSX imports, so the rest of the
+warehouse works without it.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Min, Sum
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_data
+from .models import Stock, StockMovement
+
+
+HISTORY_DAYS = 90
+SMOOTHING = 0.2  # Weight of the newest day in the smoothed level
+SAFETY_FACTOR = 1.65  # Standard deviations of lead-time usage held as safety stock (~95% service level)
+COVER_DAYS = 14  # An order covers this many days of usage
+MIN_HISTORY_DAYS = 14  # Stocks with a shorter ledger history keep their hand-entered levels
+USAGE_KINDS = (StockMovement.CONSUMPTION, StockMovement.COUNT)
+BATCH_SIZE = 500
+CHUNK_SIZE = 20000
+MAX_QUANTITY = 99999999.99  # Largest value the quantity fields hold
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Forecasting requires numpy (pip install numpy)')
+    return numpy
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _usage_matrix(np, index, start, days):
+    """Daily usage of the indexed stocks from `start`, as a len(index) x days matrix"""
+    usage = np.zeros((len(index), days))
+    # The local day is computed by SQLite ('localtime' follows TIME_ZONE, which Django exports as TZ);
+    # TruncDate would call back into Python for every movement
+    day = RawSQL(
+        f"CAST(julianday(date({StockMovement._meta.db_table}.created_at, 'localtime')) - julianday(%s) AS INTEGER)",
+        [start.isoformat()],
+    )
+    daily = StockMovement.objects.filter(
+        kind__in=USAGE_KINDS,
+        quantity__lt=0,
+        created_at__gte=_day_start(start),
+        created_at__lt=_day_start(start + timedelta(days=days)),
+    ).annotate(day=day).values('stock_id', 'day').annotate(
+        used=Sum('quantity'),
+    ).order_by().values_list('stock_id', 'day', 'used')
+
+    # Plain cursor rows: Django's per-row converters would cost more than the query
+    with connection.cursor() as cursor:
+        cursor.execute(*daily.query.sql_with_params())
+        while chunk := cursor.fetchmany(CHUNK_SIZE):
+            # Stocks activated since the stock list was read aren't indexed
+            known = [row for row in chunk if row[0] in index and 0 <= row[1] < days]
+            if not known:
+                continue
+            stock_ids, offsets, used = zip(*known)
+            positions = np.array([index[stock_id] for stock_id in stock_ids])
+            np.add.at(usage, (positions, np.array(offsets)), -np.array(used, dtype=float))  # Usage is the negative delta
+    return usage
+
+
+def forecast_reorder_levels(history_days=HISTORY_DAYS, smoothing=SMOOTHING, safety_factor=SAFETY_FACTOR,
+                            cover_days=COVER_DAYS, min_history_days=MIN_HISTORY_DAYS):
+    """
+    Forecast every active stock in one vectorized pass.
+
+    Returns {stock_id: (daily_usage, reorder_point, order_quantity)} as
+    Decimals, for the stocks with at least min_history_days of ledger history.
+    """
+    np = _numpy()
+    today = timezone.localdate()
+    start = today - timedelta(days=history_days)  # Today is still incomplete
+
+    stocks = list(Stock.objects.filter(is_active=True).order_by('id').values_list('id', 'supplier__lead_time_days'))
+    if not stocks or history_days <= 0:
+        return {}
+    ids = np.array([stock_id for stock_id, _ in stocks])
+    lead_times = np.array([lead_time for _, lead_time in stocks], dtype=float)
+    index = {stock_id: position for position, stock_id in enumerate(ids.tolist())}
+
+    # Days before a stock's first ledger entry are unknown, not zero usage
+    first_day = np.full(len(ids), history_days)
+    ledger_start = StockMovement.objects.values('stock_id').annotate(first=Min('created_at')).order_by().values_list('stock_id', 'first')
+    for stock_id, first in ledger_start.iterator(chunk_size=CHUNK_SIZE):
+        if stock_id in index:
+            first_day[index[stock_id]] = min(max((timezone.localdate(first) - start).days, 0), history_days)
+
+    usage = _usage_matrix(np, index, start, history_days)
+    observed = np.arange(history_days)[None, :] >= first_day[:, None]
+    observed_days = observed.sum(axis=1)
+    forecastable = observed_days >= max(min_history_days, 1)
+
+    # Warm start from each stock's mean and variance over its observed days
+    count = np.maximum(observed_days, 1)
+    level = (usage * observed).sum(axis=1) / count
+    variance = (((usage - level[:, None]) ** 2) * observed).sum(axis=1) / count
+    for day in range(history_days):
+        error = usage[:, day] - level
+        active = observed[:, day]
+        level = np.where(active, level + smoothing * error, level)
+        variance = np.where(active, (1 - smoothing) * (variance + smoothing * error ** 2), variance)
+
+    reorder_point = level * lead_times + safety_factor * np.sqrt(variance * lead_times)
+    order_quantity = level * cover_days
+
+    def cents(values):
+        return np.minimum(np.ceil(np.round(values * 100, 6)) / 100, MAX_QUANTITY)
+
+    results = {}
+    for position in np.flatnonzero(forecastable):
+        results[int(ids[position])] = (
+            Decimal(f'{level[position]:.3f}'),
+            Decimal(f'{cents(reorder_point[position]):.2f}'),
+            Decimal(f'{cents(order_quantity[position]):.2f}'),
+        )
+    return results
+
+
+def save_forecasts(forecasts, apply=False, batch_size=BATCH_SIZE):
+    """
+    Store forecasts on the stocks and clear those of active stocks without one.
+
+    With apply, forecast reorder points also replace minimum_quantity and
+    needs_reorder is recomputed. Returns the number of stocks given a forecast.
+    """
+    now = timezone.now()
+    table = Stock._meta.db_table
+    assignments = 'forecast_daily_usage = %s, suggested_minimum_quantity = %s, suggested_order_quantity = %s, forecast_at = %s'
+    if apply:
+        assignments += ', minimum_quantity = %s, updated_at = %s'
+    # One executemany per batch; bulk_update's CASE per field and row costs far more to build than to run
+    sql = f"UPDATE {table} SET {assignments} WHERE id = %s"
+    stamp = connection.ops.adapt_datetimefield_value(now)
+    params = [
+        (str(usage), str(reorder_point), str(order_quantity), stamp)
+        + ((str(reorder_point), stamp) if apply else ())
+        + (stock_id,)
+        for stock_id, (usage, reorder_point, order_quantity) in forecasts.items()
+    ]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for start in range(0, len(params), batch_size):
+                cursor.executemany(sql, params[start:start + batch_size])
+        Stock.objects.filter(is_active=True, forecast_at__isnull=False).exclude(forecast_at=now).update(
+            forecast_daily_usage=None,
+            suggested_minimum_quantity=None,
+            suggested_order_quantity=None,
+            forecast_at=None,
+        )
+        if apply:
+            Stock.objects.filter(forecast_at=now).sync_reorder_flags()
+        invalidate_dashboard_data()
+    return len(forecasts)
@@ -0,0 +1,150 @@
+"""
+Bulk stock quantity updates.
+
+A stock count submits many {stock_id: quantity} pairs at once. They are
+validated together, written with one bulk_update inside a single transaction
+(ledgered as COUNT movements), and StockQuerySet.bulk_update recomputes
+needs_reorder for the touched rows set-wise instead of a save() per row.
+
+Terminals (POS, bar tablets) instead send consumption/receipt events, which
+are applied as deltas by ledger.record_movements, so concurrent terminals
+never overwrite each other's changes.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .ledger import record_counts, record_movements
+from .models import Stock, StockMovement
+
+
+MAX_BATCH = 5000
+BULK_BATCH_SIZE = 500
+
+# Same bounds as Stock.current_quantity (max_digits=10, decimal_places=2)
+QUANTITY_STEP = Decimal('0.01')
+MAX_QUANTITY = Decimal('99999999.99')
+
+# Event kinds a terminal may send, with the sign of their delta
+EVENT_SIGNS = {StockMovement.CONSUMPTION: -1, StockMovement.RECEIPT: 1}
+
+
+def parse_quantity(value):
+    """Return the quantity as a Decimal rounded to the field's precision, or raise ValueError"""
+    if isinstance(value, bool) or value is None or value == '':
+        raise ValueError('Missing quantity')
+    try:
+        quantity = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError('Invalid quantity value')
+    if not quantity.is_finite():
+        raise ValueError('Invalid quantity value')
+    quantity = quantity.quantize(QUANTITY_STEP)
+    if quantity < 0:
+        raise ValueError('Quantity cannot be negative')
+    if quantity > MAX_QUANTITY:
+        raise ValueError('Quantity is too large')
+    return quantity
+
+
+def apply_quantity_updates(updates, user=None, note=''):
+    """
+    Set current_quantity for many stocks in one transaction.
+
+    `updates` maps stock ids to new quantities. Invalid entries are reported
+    and skipped; the valid ones are still applied.
+
+    Returns a dict of per-item results keyed by the stock id as given:
+    {'success': True, 'quantity', 'needs_reorder', 'status'} or
+    {'success': False, 'error'}.
+    """
+    results = {}
+    parsed = {}
+    for key, value in updates.items():
+        try:
+            stock_id = int(key)
+        except (TypeError, ValueError):
+            results[str(key)] = {'success': False, 'error': 'Invalid stock id'}
+            continue
+        try:
+            parsed[stock_id] = (str(key), parse_quantity(value))
+        except ValueError as e:
+            results[str(key)] = {'success': False, 'error': str(e)}
+
+    if not parsed:
+        return results
+
+    with transaction.atomic():
+        found = record_counts(
+            {stock_id: quantity for stock_id, (_, quantity) in parsed.items()},
+            note=note, user=user, batch_size=BULK_BATCH_SIZE,
+        )
+        for stock_id, quantity, needs_reorder in Stock.objects.filter(id__in=found).values_list(
+            'id', 'current_quantity', 'needs_reorder'
+        ):
+            results[parsed[stock_id][0]] = {
+                'success': True,
+                'quantity': str(quantity),
+                'needs_reorder': needs_reorder,
+                'status': _status(quantity, needs_reorder),
+            }
+
+    for stock_id, (key, _) in parsed.items():
+        results.setdefault(key, {'success': False, 'error': 'Stock item not found'})
+    return results
+
+
+def _status(quantity, needs_reorder):
+    return 'Out of Stock' if quantity <= 0 else 'Low Stock' if needs_reorder else 'In Stock'
+
+
+def apply_stock_events(events, user=None, note=''):
+    """
+    Apply consumption/receipt events in order, in one transaction.
+
+    Each event is {"stock": id, "kind": "consumption"|"receipt", "quantity": amount}
+    with a positive amount. Consumptions that would take a stock below zero
+    are refused; the other events are still applied.
+
+    Returns one result per event, in order: {'success': True, 'stock',
+    'quantity', 'needs_reorder', 'status'} or {'success': False, 'stock', 'error'}.
+    """
+    results = [None] * len(events)
+    deltas = []
+    positions = []
+    for position, event in enumerate(events):
+        stock = event.get('stock') if isinstance(event, dict) else None
+        try:
+            stock_id = int(stock)
+        except (TypeError, ValueError):
+            results[position] = {'success': False, 'stock': stock, 'error': 'Invalid stock id'}
+            continue
+        kind = event.get('kind', StockMovement.CONSUMPTION)
+        if kind not in EVENT_SIGNS:
+            results[position] = {'success': False, 'stock': stock_id, 'error': f"Unknown event kind '{kind}'"}
+            continue
+        try:
+            quantity = parse_quantity(event.get('quantity'))
+        except ValueError as e:
+            results[position] = {'success': False, 'stock': stock_id, 'error': str(e)}
+            continue
+        if not quantity:
+            results[position] = {'success': False, 'stock': stock_id, 'error': 'Quantity must be positive'}
+            continue
+        deltas.append((stock_id, kind, quantity * EVENT_SIGNS[kind]))
+        positions.append(position)
+
+    if deltas:
+        applied = record_movements(deltas, note=note, user=user, batch_size=BULK_BATCH_SIZE)
+        for position, (stock_id, _, _), (quantity, needs_reorder, error) in zip(positions, deltas, applied):
+            if error:
+                results[position] = {'success': False, 'stock': stock_id, 'error': error}
+            else:
+                results[position] = {
+                    'success': True,
+                    'stock': stock_id,
+                    'quantity': str(quantity),
+                    'needs_reorder': needs_reorder,
+                    'status': _status(quantity, needs_reorder),
+                }
+    return results
@@ -0,0 +1,234 @@
+"""
+Stock movement ledger.
+
+Every quantity change is appended to StockMovement as a signed delta, and
+Stock.current_quantity is moved by the same delta inside one UPDATE, so
+concurrent receipts and consumptions add up instead of overwriting each
+other. Counts are the one absolute write: they record the difference between
+the counted and the booked quantity.
+
+StockBalanceSnapshot rows pin a stock's quantity after a known movement id.
+The quantity at any moment is the last snapshot before it plus the movements
+after that snapshot, so reads only scan the tail since the last snapshot run.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import Stock, StockMovement, StockBalanceSnapshot
+
+
+SNAPSHOT_BATCH_SIZE = 500
+DELTA_KINDS = (StockMovement.RECEIPT, StockMovement.CONSUMPTION, StockMovement.ADJUSTMENT)
+
+
+def _apply_delta(stock_id, quantity, now, active_only):
+    """
+    Move a stock by a signed delta with one F() UPDATE, so concurrent writers
+    add up instead of overwriting each other. StockQuerySet.update sets
+    needs_reorder from the same expression, and the filter refuses deltas
+    that would take the balance below zero.
+
+    Returns (balance, needs_reorder), read back inside the caller's
+    transaction (which holds the write lock), or None if it was refused.
+    """
+    stocks = Stock.objects.filter(pk=stock_id, current_quantity__gte=-quantity)
+    if active_only:
+        stocks = stocks.filter(is_active=True)
+    # Rounded like the column, so float arithmetic in SQLite can't leave sub-cent residue
+    if not stocks.update(current_quantity=Round(F('current_quantity') + quantity, 2), updated_at=now):
+        return None
+    return Stock.objects.filter(pk=stock_id).values_list('current_quantity', 'needs_reorder').get()
+
+
+def _signed_quantity(kind, quantity):
+    """
+    A delta validated and rounded like terminal event quantities, with its
+    sign checked against the kind (receipts add, consumptions take away).
+    Raises ValueError.
+    """
+    from .inventory import EVENT_SIGNS, parse_quantity  # inventory imports this module
+
+    if kind not in DELTA_KINDS:
+        raise ValueError(f"Unknown movement kind '{kind}'")
+    text = str(quantity).strip()
+    negative = text.startswith('-')
+    amount = parse_quantity(text[1:] if negative else text)
+    if not amount:
+        raise ValueError('Quantity must not be zero')
+    sign = EVENT_SIGNS.get(kind)
+    if sign is not None and (sign < 0) != negative:
+        raise ValueError(f"A {kind} quantity must be {'negative' if sign < 0 else 'positive'}")
+    return -amount if negative else amount
+
+
+def _refusal(stock_id, active_only):
+    """Why a delta on stock_id was refused"""
+    stock = Stock.objects.filter(pk=stock_id).values('is_active', 'current_quantity').first()
+    if stock is None or (active_only and not stock['is_active']):
+        return 'Stock item not found'
+    return f"Insufficient stock ({stock['current_quantity']} available)"
+
+
+def record_movement(stock_id, kind, quantity, note='', user=None):
+    """
+    Apply a signed quantity change to a stock and append it to the ledger.
+
+    Raises Stock.DoesNotExist for an unknown stock and ValueError for a
+    kind that is not a delta (counts go through record_counts), an invalid
+    quantity or one whose sign doesn't match the kind, or a change that
+    would make the quantity negative. The movement is returned with the new
+    balance as `balance`.
+    """
+    quantity = _signed_quantity(kind, quantity)
+
+    with transaction.atomic():
+        now = timezone.now()
+        applied = _apply_delta(stock_id, quantity, now, active_only=False)
+        if applied is None:
+            if not Stock.objects.filter(pk=stock_id).exists():
+                raise Stock.DoesNotExist(f"Stock {stock_id} not found")
+            raise ValueError(_refusal(stock_id, active_only=False))
+        movement = StockMovement.objects.create(
+            stock_id=stock_id, kind=kind, quantity=quantity, note=note, created_by=user, created_at=now
+        )
+    movement.balance = applied[0]
+    return movement
+
+
+def record_movements(events, note='', user=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Apply many (stock_id, kind, signed quantity) deltas of active stocks in
+    one transaction, in order, and ledger the ones applied.
+
+    Each delta is a single F() UPDATE, so the same stock can be moved by
+    concurrent terminals without lost updates. Returns one
+    (balance, needs_reorder, error) tuple per event; error is None when the
+    delta was applied and balance/needs_reorder are None when it wasn't.
+    """
+    results = []
+    movements = []
+    with transaction.atomic():
+        now = timezone.now()
+        for stock_id, kind, quantity in events:
+            try:
+                quantity = _signed_quantity(kind, quantity)
+            except ValueError as e:
+                results.append((None, None, str(e)))
+                continue
+            applied = _apply_delta(stock_id, quantity, now, active_only=True)
+            if applied is None:
+                results.append((None, None, _refusal(stock_id, active_only=True)))
+                continue
+            results.append((*applied, None))
+            movements.append(StockMovement(
+                stock_id=stock_id, kind=kind, quantity=quantity, note=note, created_by=user, created_at=now
+            ))
+
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+    return results
+
+
+def record_counts(counts, note='', user=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Set counted quantities {stock_id: Decimal} of active stocks.
+
+    The booked quantities are read and replaced inside one transaction (it
+    holds the write lock), and the differences are ledgered as COUNT
+    movements. Returns {stock_id: counted quantity} for the stocks found.
+    """
+    with transaction.atomic():
+        stocks = list(
+            Stock.objects.select_for_update()
+            .filter(id__in=list(counts), is_active=True)
+            .only('id', 'current_quantity')
+        )
+        now = timezone.now()
+        movements = []
+        for stock in stocks:
+            counted = counts[stock.id]
+            if counted != stock.current_quantity:
+                movements.append(StockMovement(
+                    stock_id=stock.id,
+                    kind=StockMovement.COUNT,
+                    quantity=counted - stock.current_quantity,
+                    note=note,
+                    created_by=user,
+                    created_at=now,
+                ))
+            stock.current_quantity = counted
+            stock.updated_at = now
+
+        Stock.objects.bulk_update(stocks, ['current_quantity', 'updated_at'], batch_size=batch_size)
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+    return {stock.id: stock.current_quantity for stock in stocks}
+
+
+def take_balance_snapshots(batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Snapshot every stock whose balance moved since its last snapshot.
+
+    Runs in one transaction, so each snapshot's quantity matches exactly the
+    movements up to its last_movement_id. Returns the number of snapshots.
+    """
+    last_snapshot = StockBalanceSnapshot.objects.filter(stock=OuterRef('pk')).order_by('-taken_at', '-id')
+    last_movement = StockMovement.objects.filter(stock=OuterRef('pk')).order_by('-id').values('id')[:1]
+
+    with transaction.atomic():
+        now = timezone.now()
+        changed = Stock.objects.order_by().annotate(
+            last_movement=Coalesce(Subquery(last_movement), 0),
+            snapshot_movement=Subquery(last_snapshot.values('last_movement_id')[:1]),
+            snapshot_quantity=Subquery(last_snapshot.values('quantity')[:1]),
+        ).filter(
+            # Quantity edits that bypassed the ledger are picked up as well
+            Q(snapshot_movement__isnull=True) |
+            Q(last_movement__gt=F('snapshot_movement')) |
+            ~Q(current_quantity=F('snapshot_quantity'))
+        ).values_list('id', 'current_quantity', 'last_movement')
+
+        created = 0
+        batch = []
+        for stock_id, quantity, movement_id in changed.iterator(chunk_size=batch_size):
+            batch.append(StockBalanceSnapshot(
+                stock_id=stock_id, quantity=quantity, last_movement_id=movement_id, taken_at=now
+            ))
+            if len(batch) >= batch_size:
+                created += len(StockBalanceSnapshot.objects.bulk_create(batch))
+                batch = []
+        created += len(StockBalanceSnapshot.objects.bulk_create(batch))
+    return created
+
+
+def quantity_at(stock_id, at=None):
+    """
+    Quantity of a stock at time `at` (now if omitted): the last snapshot
+    taken by then plus the ledger movements after it.
+
+    Without such a snapshot the ledger may not hold the opening balance
+    (stocks created or edited outside it), so the quantity is worked back
+    from current_quantity instead: minus the movements after `at`.
+    """
+    snapshots = StockBalanceSnapshot.objects.filter(stock_id=stock_id)
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+    snapshot = snapshots.order_by('-taken_at', '-id').first()
+
+    movements = StockMovement.objects.filter(stock_id=stock_id)
+    if snapshot is None:
+        current = Stock.objects.filter(pk=stock_id).values_list('current_quantity', flat=True).first()
+        if current is None:
+            raise Stock.DoesNotExist(f"Stock {stock_id} not found")
+        if at is None:
+            return current
+        later = movements.filter(created_at__gt=at).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
+        return current - later
+
+    tail = movements.filter(id__gt=snapshot.last_movement_id)
+    if at is not None:
+        tail = tail.filter(created_at__lte=at)
+    delta = tail.aggregate(total=Sum('quantity'))['total'] or Decimal('0')
+    return snapshot.quantity + delta
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from warehouse.models import Stock
+from warehouse.stock_io import ImportFormatError, detect_format, export_rows, iter_csv_lines, write_xlsx
+
+
+class Command(BaseCommand):
+    help = 'Export stock items to a CSV or XLSX file in the import column layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Output file, or - to write CSV to stdout')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='File format (default: from the file extension)')
+        parser.add_argument('--active-only', action='store_true', help='Skip inactive stock items')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stocks = Stock.objects.filter(is_active=True) if options['active_only'] else Stock.objects.all()
+
+        try:
+            fmt = detect_format(path, options['format'] or ('csv' if path == '-' else None))
+            if path == '-':
+                sys.stdout.writelines(iter_csv_lines(export_rows(stocks)))
+                return
+            if fmt == 'csv':
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    f.writelines(iter_csv_lines(export_rows(stocks)))
+            else:
+                write_xlsx(export_rows(stocks), path)
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f'Cannot write {path}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Exported stock items to {path}'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from warehouse import forecasting
+
+
+class Command(BaseCommand):
+    help = 'Forecast consumption from the stock ledger and suggest reorder points and order quantities (requires numpy; run periodically, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=forecasting.HISTORY_DAYS, help='Days of ledger history to use')
+        parser.add_argument('--smoothing', type=float, default=forecasting.SMOOTHING, help='Smoothing factor between 0 and 1 (higher follows recent usage faster)')
+        parser.add_argument('--safety-factor', type=float, default=forecasting.SAFETY_FACTOR, help='Safety stock in standard deviations of lead-time usage')
+        parser.add_argument('--cover-days', type=int, default=forecasting.COVER_DAYS, help='Days of usage an order should cover')
+        parser.add_argument('--apply', action='store_true', help='Also replace minimum quantities with the forecast reorder points')
+
+    def handle(self, *args, **options):
+        if not 0 < options['smoothing'] <= 1:
+            raise CommandError('--smoothing must be between 0 and 1')
+        try:
+            forecasts = forecasting.forecast_reorder_levels(
+                history_days=options['days'],
+                smoothing=options['smoothing'],
+                safety_factor=options['safety_factor'],
+                cover_days=options['cover_days'],
+            )
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        count = forecasting.save_forecasts(forecasts, apply=options['apply'])
+        action = 'Updated minimum quantities of' if options['apply'] else 'Stored suggestions for'
+        self.stdout.write(
+            self.style.SUCCESS(f'{action} {count} stocks with enough consumption history.')
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from warehouse.reorders import write_purchase_orders, _reportlab
+
+
+class Command(BaseCommand):
+    help = 'Write purchase orders (CSV and PDF) for all items that need reordering into a zip file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Output zip file')
+        parser.add_argument('--supplier', type=int, action='append', help='Only this supplier id (repeatable)')
+
+    def handle(self, *args, **options):
+        if _reportlab() is None:
+            self.stderr.write(self.style.WARNING('reportlab is not installed - writing CSV purchase orders only, no PDFs'))
+        try:
+            count = write_purchase_orders(options['path'], options['supplier'])
+        except OSError as e:
+            raise CommandError(f'Cannot write {options["path"]}: {e}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote purchase orders for {count} suppliers to {options["path"]}')
+        )
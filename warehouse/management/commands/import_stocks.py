@@ -0,0 +1,49 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from warehouse.stock_io import (
+    CHUNK_SIZE, ImportFormatError, detect_format, import_stocks, iter_csv_rows, iter_xlsx_rows,
+)
+
+
+class Command(BaseCommand):
+    help = 'Import or update stock items from a CSV or XLSX file (upsert on name + supplier)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='CSV or XLSX file, or - to read CSV from stdin')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='File format (default: from the file extension)')
+        parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help=f'Rows per transaction (default: {CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['chunk'] < 1:
+            raise CommandError('--chunk must be positive')
+
+        started = time.monotonic()
+        try:
+            fmt = detect_format(path, options['format'] or ('csv' if path == '-' else None))
+            if path == '-':
+                counts = import_stocks(iter_csv_rows(sys.stdin.buffer), chunk_size=options['chunk'])
+            else:
+                with open(path, 'rb') as f:
+                    rows = iter_csv_rows(f) if fmt == 'csv' else iter_xlsx_rows(f)
+                    counts = import_stocks(rows, chunk_size=options['chunk'])
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+        for line, message in counts['errors']:
+            self.stdout.write(self.style.WARNING(f'  Line {line}: {message}'))
+        if counts['error_count'] > len(counts['errors']):
+            self.stdout.write(self.style.WARNING(f'  ... and {counts["error_count"] - len(counts["errors"])} more errors'))
+        for model, created in counts['created_related'].items():
+            self.stdout.write(f'  Created {created} new {model.lower()} records')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {counts["rows"]} rows in {time.monotonic() - started:.1f}s: '
+                f'{counts["created"]} created, {counts["updated"]} updated, {counts["error_count"]} skipped.'
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from warehouse.models import Stock
+from warehouse.stock_search import rebuild_stock_index, search_stocks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text index used by the warehouse stock search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', default='', help='Run a test search against the rebuilt index')
+
+    def handle(self, *args, **options):
+        rebuild_stock_index()
+        self.stdout.write(self.style.SUCCESS('Stock search index rebuilt.'))
+
+        if options['query']:
+            for stock in search_stocks(Stock.objects.select_related('supplier'), options['query'])[:20]:
+                self.stdout.write(f'  {stock.name} ({stock.supplier.name})')
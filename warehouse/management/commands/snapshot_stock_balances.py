@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from warehouse.ledger import take_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot stock balances so historical quantities only replay the ledger tail (run periodically, e.g. nightly)'
+
+    def handle(self, *args, **options):
+        created = take_balance_snapshots()
+        self.stdout.write(
+            self.style.SUCCESS(f'Snapshotted {created} stock balances.')
+        )
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q, Value, Case, When, BooleanField
+from django.db.models.lookups import LessThanOrEqual
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 
@@ -10,6 +14,7 @@ class Supplier(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    lead_time_days = models.PositiveIntegerField(default=7, help_text="Days from ordering to delivery, used by the reorder forecast")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -33,6 +38,96 @@ class Category(models.Model):
         return self.name
 
 
+REORDER_FIELDS = ('current_quantity', 'minimum_quantity')
+
+
+def reorder_flag_expression(current_quantity=None, minimum_quantity=None):
+    """
+    needs_reorder as computed by Stock.save(), evaluated by the database.
+
+    Pass the new values of an UPDATE - its SET expressions see the old row.
+    """
+    def as_expression(name, value):
+        if value is None:
+            return F(name)
+        if hasattr(value, 'resolve_expression'):
+            return value
+        return Value(value, output_field=Stock._meta.get_field(name))
+
+    return Case(
+        When(LessThanOrEqual(
+            as_expression('current_quantity', current_quantity),
+            as_expression('minimum_quantity', minimum_quantity),
+        ), then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+
+
+class StockQuerySet(models.QuerySet):
+    """
+    Keeps needs_reorder correct through set-based writes that bypass
+    Stock.save(), and drops the cached dashboard figures after them.
+    """
+
+    def update(self, **kwargs):
+        if 'needs_reorder' not in kwargs and any(name in kwargs for name in REORDER_FIELDS):
+            kwargs['needs_reorder'] = reorder_flag_expression(
+                kwargs.get('current_quantity'), kwargs.get('minimum_quantity')
+            )
+        rows = super().update(**kwargs)
+        if rows:
+            _invalidate_dashboard()
+        return rows
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if 'needs_reorder' not in fields and any(name in fields for name in REORDER_FIELDS):
+            ids = [obj.pk for obj in objs]
+            step = batch_size or 500
+            for start in range(0, len(ids), step):
+                self.model._default_manager.using(self.db).filter(
+                    pk__in=ids[start:start + step]
+                ).sync_reorder_flags()
+        if rows:
+            _invalidate_dashboard()
+        return rows
+    bulk_update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        # Upserts may change quantities of existing rows without updating needs_reorder
+        update_fields = kwargs.get('update_fields') or ()
+        if (kwargs.get('update_conflicts') and 'needs_reorder' not in update_fields
+                and any(name in update_fields for name in REORDER_FIELDS)):
+            ids = [obj.pk for obj in created if obj.pk is not None]
+            step = kwargs.get('batch_size') or 500
+            for start in range(0, len(ids), step):
+                self.model._default_manager.using(self.db).filter(
+                    pk__in=ids[start:start + step]
+                ).sync_reorder_flags()
+        if created:
+            _invalidate_dashboard()
+        return created
+    bulk_create.alters_data = True
+
+    def sync_reorder_flags(self):
+        """Recompute needs_reorder for every row in the queryset with one UPDATE, returns rows corrected"""
+        wrong = self.filter(
+            Q(needs_reorder=False, current_quantity__lte=F('minimum_quantity')) |
+            Q(needs_reorder=True, current_quantity__gt=F('minimum_quantity'))
+        )
+        return wrong.update(needs_reorder=reorder_flag_expression())
+    sync_reorder_flags.alters_data = True
+
+
+def _invalidate_dashboard():
+    from .dashboard import invalidate_dashboard_data  # dashboard imports this module
+    invalidate_dashboard_data()
+
+
 class Stock(models.Model):
     UNIT_CHOICES = [
         ('kg', 'Kilogram'),
@@ -77,12 +172,36 @@ class Stock(models.Model):
     is_active = models.BooleanField(default=True)
     needs_reorder = models.BooleanField(default=False)
     
+    # Consumption forecast (written by the forecast_reorder_levels command, empty without enough history)
+    forecast_daily_usage = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    suggested_minimum_quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Reorder point: forecast usage over the supplier lead time plus safety stock"
+    )
+    suggested_order_quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Forecast usage over the order cover period"
+    )
+    forecast_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = models.Manager.from_queryset(StockQuerySet)()
+
     class Meta:
         ordering = ['category', 'name']
         unique_together = ['name', 'supplier']
+        indexes = [
+            # Keyset order of the stock grid pages
+            models.Index(fields=['name', 'id'], name='warehouse_stock_name_id'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.supplier.name})"
@@ -106,3 +225,56 @@ class Stock(models.Model):
             return "Low Stock"
         else:
             return "In Stock"
+
+
+class StockMovement(models.Model):
+    """Append-only ledger entry: a signed change of one stock's quantity"""
+    RECEIPT = 'receipt'
+    CONSUMPTION = 'consumption'
+    ADJUSTMENT = 'adjustment'
+    COUNT = 'count'
+    KIND_CHOICES = [
+        (RECEIPT, 'Receipt'),
+        (CONSUMPTION, 'Consumption'),
+        (ADJUSTMENT, 'Adjustment'),
+        (COUNT, 'Stock count'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Signed change of current quantity (negative for consumption)"
+    )
+    note = models.CharField(max_length=200, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['stock', 'created_at'], name='warehouse_movement_stock_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+} {self.stock.name}"
+
+
+class StockBalanceSnapshot(models.Model):
+    """A stock's quantity after every ledger movement up to `last_movement_id`"""
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='balance_snapshots')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['stock', 'taken_at'], name='warehouse_snapshot_stock_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock.name}: {self.quantity} at {self.taken_at:%Y-%m-%d %H:%M}"
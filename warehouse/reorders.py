@@ -0,0 +1,219 @@
+"""
+Reorder suggestions and purchase-order documents.
+
+The suggested order quantity and its cost are computed by the database as
+annotations, and the per-supplier totals come from one grouped query, so the
+reorder page never loops over stocks to do arithmetic.
+
+Purchase orders (a CSV and a PDF per supplier; CSV only if reportlab is
+missing from the environment) are rendered by a background thread into a zip file. The job's
+state lives in the cache, so any web worker can report progress and serve
+the finished file.
+"""
+import csv
+import io
+import logging
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Supplier, Stock
+
+
+logger = logging.getLogger(__name__)
+
+SUGGESTED_MULTIPLIER = 2  # Without a forecast, order enough to reach twice the minimum
+JOB_CACHE_PREFIX = 'warehouse:purchase-orders:'
+JOB_TIMEOUT = 24 * 60 * 60  # Jobs and their files are kept for a day
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purchase-orders')
+
+REORDER_FILTER = Q(stocks__is_active=True, stocks__needs_reorder=True)
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _suggested_quantity(prefix=''):
+    """The forecast order quantity (see forecasting.py), else a multiple of the minimum"""
+    return Coalesce(
+        F(f'{prefix}suggested_order_quantity'),
+        _money(F(f'{prefix}minimum_quantity') * Value(SUGGESTED_MULTIPLIER)),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def reorder_stocks():
+    """Active stocks that need reordering, annotated with suggested_quantity and estimated_cost"""
+    suggested = _suggested_quantity()
+    return Stock.objects.filter(is_active=True, needs_reorder=True).annotate(
+        suggested_quantity=suggested,
+        estimated_cost=_money(suggested * F('unit_price')),
+    )
+
+
+def supplier_reorder_totals():
+    """Suppliers with stocks to reorder, annotated with reorder_items and total_cost (one query)"""
+    return Supplier.objects.filter(REORDER_FILTER).annotate(
+        reorder_items=Count('stocks', filter=REORDER_FILTER),
+        total_cost=Sum(
+            _money(_suggested_quantity('stocks__') * F('stocks__unit_price')),
+            filter=REORDER_FILTER,
+        ),
+    ).order_by('name')
+
+
+# Purchase-order documents
+
+PO_COLUMNS = ['Item', 'Category', 'Quantity', 'Unit', 'Unit Price', 'Estimated Cost']
+UNIT_NAMES = dict(Stock.UNIT_CHOICES)
+CENT = Decimal('0.01')
+
+
+def _cents(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+def _po_rows(supplier_id):
+    stocks = reorder_stocks().filter(supplier_id=supplier_id).order_by('category__name', 'name')
+    for row in stocks.values_list('name', 'category__name', 'suggested_quantity', 'unit', 'unit_price', 'estimated_cost').iterator():
+        name, category, quantity, unit, unit_price, cost = row
+        # Annotations come back unrounded from SQLite
+        yield [name, category, _cents(quantity), UNIT_NAMES.get(unit, unit), unit_price, _cents(cost)]
+
+
+def render_purchase_order_csv(supplier):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([f'Purchase order for {supplier.name}', timezone.localdate().isoformat()])
+    writer.writerow(PO_COLUMNS)
+    total = 0
+    for row in _po_rows(supplier.id):
+        writer.writerow(row)
+        total += row[-1]
+    writer.writerow(['Total', '', '', '', '', total])
+    return output.getvalue().encode('utf-8')
+
+
+def _reportlab():
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        return None
+    return A4, canvas
+
+
+def render_purchase_order_pdf(supplier):
+    """PDF purchase order, or None when reportlab isn't installed"""
+    reportlab = _reportlab()
+    if reportlab is None:
+        return None
+    page_size, canvas = reportlab
+    output = io.BytesIO()
+    pdf = canvas.Canvas(output, pagesize=page_size)
+    width, height = page_size
+
+    def header():
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(40, height - 50, f'Purchase order - {supplier.name}')
+        pdf.setFont('Helvetica', 9)
+        pdf.drawString(40, height - 66, timezone.localdate().isoformat())
+        for x, title in zip((40, 260, 360, 420, 480), ('Item', 'Category', 'Quantity', 'Unit', 'Est. Cost')):
+            pdf.drawString(x, height - 90, title)
+        return height - 106
+
+    y = header()
+    total = 0
+    for name, category, quantity, unit, _, cost in _po_rows(supplier.id):
+        if y < 50:
+            pdf.showPage()
+            y = header()
+        for x, value in zip((40, 260, 360, 420, 480), (name[:40], (category or '')[:18], quantity, unit, f'{cost:.2f}')):
+            pdf.drawString(x, y, str(value))
+        total += cost
+        y -= 14
+    pdf.setFont('Helvetica-Bold', 10)
+    pdf.drawString(400, max(y - 10, 30), f'Total: {total:.2f}')
+    pdf.save()
+    return output.getvalue()
+
+
+def purchase_order_dir():
+    return str(getattr(settings, 'WAREHOUSE_PURCHASE_ORDER_DIR', os.path.join(settings.BASE_DIR, 'purchase_orders')))
+
+
+def write_purchase_orders(output, supplier_ids=None):
+    """Write one purchase order per supplier with stocks to reorder into a zip file, returns the supplier count"""
+    suppliers = supplier_reorder_totals()
+    if supplier_ids:
+        suppliers = suppliers.filter(id__in=supplier_ids)
+
+    count = 0
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for supplier in suppliers:
+            base = f"{supplier.id}-{''.join(c if c.isalnum() else '-' for c in supplier.name)[:50]}"
+            archive.writestr(f'{base}.csv', render_purchase_order_csv(supplier))
+            pdf = render_purchase_order_pdf(supplier)
+            if pdf is not None:
+                archive.writestr(f'{base}.pdf', pdf)
+            count += 1
+    return count
+
+
+def _job_key(job_id):
+    return JOB_CACHE_PREFIX + job_id
+
+
+def get_job(job_id):
+    return cache.get(_job_key(job_id))
+
+
+def _run_job(job_id, supplier_ids):
+    job = get_job(job_id) or {}
+    path = os.path.join(purchase_order_dir(), f'{job_id}.zip')
+    try:
+        cache.set(_job_key(job_id), {**job, 'status': 'running'}, JOB_TIMEOUT)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        suppliers = write_purchase_orders(path + '.tmp', supplier_ids)
+        os.replace(path + '.tmp', path)
+        cache.set(_job_key(job_id), {**job, 'status': 'done', 'path': path, 'suppliers': suppliers}, JOB_TIMEOUT)
+    except Exception as e:
+        logger.exception('Purchase order generation failed')
+        cache.set(_job_key(job_id), {**job, 'status': 'failed', 'error': str(e)}, JOB_TIMEOUT)
+    finally:
+        connection.close()  # This thread's own connection
+
+
+def _remove_expired_files():
+    directory = purchase_order_dir()
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - JOB_TIMEOUT
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def start_purchase_order_job(supplier_ids=None):
+    """Queue zip generation in the background, returns the job id"""
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {'status': 'pending', 'created': time.time()}, JOB_TIMEOUT)
+    _remove_expired_files()
+    _executor.submit(_run_job, job_id, supplier_ids)
+    return job_id
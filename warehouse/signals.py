@@ -0,0 +1,25 @@
+from django.db import router
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .dashboard import invalidate_dashboard_data
+from .models import Supplier, Category, Stock
+from .stock_search import create_stock_index
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_dashboard_on_change(sender, **kwargs):
+    """Any change to stocks, suppliers or categories can change the dashboard figures"""
+    invalidate_dashboard_data()
+
+
+@receiver(post_migrate)
+def create_stock_index_after_migrate(sender, using, **kwargs):
+    """The search index and its triggers exist from deploy time, so every write path is indexed"""
+    if sender.name == 'warehouse' and router.allow_migrate_model(using, Stock):
+        create_stock_index(using)
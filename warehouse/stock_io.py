@@ -0,0 +1,318 @@
+"""
+Bulk Stock import and export (CSV and XLSX).
+
+Imports stream the file row by row and work in chunks: each chunk is
+validated, its suppliers and categories are resolved (missing ones created),
+and its stocks are upserted in one transaction with an
+INSERT ... ON CONFLICT(name, supplier) DO UPDATE executemany - the statement
+bulk_create(update_conflicts=True) would build, without the ORM's per-value
+preparation that dominates at 100k rows. Only the columns present in the
+file are updated on existing stocks (blank cells keep their values), so a
+stock count file can carry just name, supplier and current_quantity.
+needs_reorder is computed in the same statement, and quantity changes are
+ledgered as COUNT movements.
+
+Exports iterate the queryset in chunks and yield rows, so memory use does not
+grow with the catalog. A CSV export is streamed as it is rendered; an XLSX
+file is a zip archive whose directory comes last, so it is written to a
+temporary file first and sent from there.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_data
+from .models import Supplier, Category, Stock, StockMovement
+
+
+CHUNK_SIZE = 2000
+MAX_ERRORS = 100
+
+COLUMNS = [
+    'name', 'supplier', 'category', 'description', 'current_quantity',
+    'minimum_quantity', 'unit', 'unit_price', 'is_active',
+]
+REQUIRED_COLUMNS = ('name', 'supplier')
+# Needed to create a stock that doesn't exist yet
+REQUIRED_FOR_NEW = ('category', 'unit_price')
+DECIMAL_COLUMNS = ('current_quantity', 'minimum_quantity', 'unit_price')
+UPDATABLE_FIELDS = ('category_id', 'description', 'current_quantity', 'minimum_quantity', 'unit', 'unit_price', 'is_active')
+NEW_STOCK_DEFAULTS = {
+    'description': '', 'current_quantity': Decimal('0'), 'minimum_quantity': Decimal('0'),
+    'unit': 'pcs', 'is_active': True,
+}
+MAX_DECIMAL = Decimal('99999999.99')
+
+UNITS = {code for code, _ in Stock.UNIT_CHOICES}
+UNIT_NAMES = {label.lower(): code for code, label in Stock.UNIT_CHOICES}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+
+class ImportFormatError(ValueError):
+    """The file can't be imported at all (unreadable, unsupported or missing columns)"""
+
+
+def detect_format(filename, requested=None):
+    fmt = (requested or filename.rsplit('.', 1)[-1]).lower()
+    if fmt not in ('csv', 'xlsx'):
+        raise ImportFormatError(f"Unsupported format '{fmt}' (use csv or xlsx)")
+    return fmt
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFormatError('XLSX support requires openpyxl (pip install openpyxl)')
+    return openpyxl
+
+
+def iter_csv_rows(binary_file):
+    """Header-keyed rows of a CSV file opened in binary mode"""
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        yield header
+        yield from reader
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(binary_file):
+    """Header row, then value rows, of the first worksheet of an XLSX file"""
+    workbook = _openpyxl().load_workbook(binary_file, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def _parse_decimal(value, column):
+    try:
+        number = Decimal(str(value).strip().replace(',', '')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"{column}: '{value}' is not a number")
+    if not number.is_finite() or number < 0 or number > MAX_DECIMAL:
+        raise ValueError(f"{column}: '{value}' is out of range")
+    return number
+
+
+def _clean_row(values):
+    """Validated field values of one row, keyed by column (blank cells omitted)"""
+    row = {}
+    for column, value in values.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value == '' or value is None:
+            continue
+        if column in DECIMAL_COLUMNS:
+            row[column] = _parse_decimal(value, column)
+        elif column == 'unit':
+            unit = str(value).lower()
+            unit = UNIT_NAMES.get(unit, unit)
+            if unit not in UNITS:
+                raise ValueError(f"unit: '{value}' is not one of {', '.join(sorted(UNITS))}")
+            row[column] = unit
+        elif column == 'is_active':
+            flag = str(value).lower()
+            if flag not in TRUE_VALUES | FALSE_VALUES:
+                raise ValueError(f"is_active: '{value}' is not a yes/no value")
+            row[column] = flag in TRUE_VALUES
+        else:
+            row[column] = str(value)
+
+    for column in REQUIRED_COLUMNS:
+        if column not in row:
+            raise ValueError(f"{column} is required")
+    if len(row['name']) > 200 or len(row['supplier']) > 200 or len(row.get('category', '')) > 100:
+        raise ValueError('name, supplier or category is too long')
+    return row
+
+
+def _resolve_names(model, names, created):
+    """{name: id} for the given names, creating the missing objects"""
+    # Oldest object wins when a (non-unique) supplier name is repeated
+    ids = dict(model.objects.filter(name__in=names).order_by('-id').values_list('name', 'id'))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        created[model.__name__] = created.get(model.__name__, 0) + len(missing)
+    return ids
+
+
+def _upsert_sql(columns):
+    """INSERT ... ON CONFLICT(name, supplier) updating the file's columns, needs_reorder and updated_at"""
+    table = Stock._meta.db_table
+    fields = ['name', 'supplier_id', *UPDATABLE_FIELDS, 'needs_reorder', 'created_at', 'updated_at']
+    updated = [field for field in UPDATABLE_FIELDS if field.replace('_id', '') in columns]
+    # Unqualified names in DO UPDATE are the existing row's values
+    current = 'excluded.current_quantity' if 'current_quantity' in columns else 'current_quantity'
+    minimum = 'excluded.minimum_quantity' if 'minimum_quantity' in columns else 'minimum_quantity'
+    assignments = [f'{field} = excluded.{field}' for field in updated] + [
+        f'needs_reorder = ({current} <= {minimum})',
+        'updated_at = excluded.updated_at',
+    ]
+    return (
+        f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT(name, supplier_id) DO UPDATE SET {', '.join(assignments)}"
+    )
+
+
+def _import_chunk(chunk, columns, counts, user):
+    """Upsert one chunk of (line number, cleaned row) pairs"""
+    connection = connections[Stock.objects.db]
+    now = timezone.now()
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+
+    with transaction.atomic():
+        supplier_ids = _resolve_names(Supplier, {row['supplier'] for _, row in chunk}, counts['created_related'])
+        category_names = {row['category'] for _, row in chunk if 'category' in row}
+        category_ids = _resolve_names(Category, category_names, counts['created_related']) if category_names else {}
+
+        # The last row wins when a file repeats a stock
+        rows = {}
+        for line, row in chunk:
+            rows[(row['name'], supplier_ids[row['supplier']])] = (line, row)
+
+        # Known stocks of the chunk - blank cells keep their current values
+        existing = {}
+        for values in Stock.objects.filter(
+            supplier_id__in={supplier_id for _, supplier_id in rows}, name__in={name for name, _ in rows}
+        ).values('id', 'name', 'supplier_id', *UPDATABLE_FIELDS):
+            if (values['name'], values['supplier_id']) in rows:
+                existing[(values['name'], values['supplier_id'])] = values
+
+        params = []
+        created = []
+        movements = []
+        for key, (line, row) in rows.items():
+            previous = existing.get(key)
+            if previous is None:
+                missing = [column for column in REQUIRED_FOR_NEW if column not in row]
+                if missing:
+                    counts['errors'].append((line, f"new item needs {' and '.join(missing)}"))
+                    continue
+                values = dict(NEW_STOCK_DEFAULTS)
+                created.append(key)
+            else:
+                values = dict(previous)
+                counts['updated'] += 1
+            values.update((column, row[column]) for column in UPDATABLE_FIELDS[1:] if column in row)
+            if 'category' in row:
+                values['category_id'] = category_ids[row['category']]
+
+            params.append((
+                key[0], key[1], *(values[field] for field in UPDATABLE_FIELDS),
+                values['current_quantity'] <= values['minimum_quantity'], timestamp, timestamp,
+            ))
+            if previous is not None and values['current_quantity'] != previous['current_quantity']:
+                movements.append((previous['id'], StockMovement.COUNT, values['current_quantity'] - previous['current_quantity']))
+
+        with connection.cursor() as cursor:
+            cursor.executemany(_upsert_sql(columns), [
+                [str(value) if isinstance(value, Decimal) else value for value in row] for row in params
+            ])
+
+        if created:
+            # Opening balances of new stocks go into the ledger as adjustments
+            new_ids = Stock.objects.filter(
+                supplier_id__in={supplier_id for _, supplier_id in created}, name__in={name for name, _ in created}
+            ).values_list('name', 'supplier_id', 'id', 'current_quantity')
+            for name, supplier_id, stock_id, quantity in new_ids:
+                if (name, supplier_id) in rows and (name, supplier_id) not in existing and quantity:
+                    movements.append((stock_id, StockMovement.ADJUSTMENT, quantity))
+            counts['created'] += len(created)
+
+        user_id = user.pk if user is not None else None
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {StockMovement._meta.db_table} (stock_id, kind, quantity, note, created_by_id, created_at) "
+                f"VALUES (%s, %s, %s, %s, %s, %s)",
+                [(stock_id, kind, str(quantity), 'Imported', user_id, timestamp) for stock_id, kind, quantity in movements],
+            )
+
+    invalidate_dashboard_data()
+
+
+def import_stocks(rows, chunk_size=CHUNK_SIZE, user=None):
+    """
+    Upsert stocks from an iterator whose first item is the header row.
+
+    Rows that fail validation are skipped and reported. Returns counts:
+    rows, created, updated, created_related {model: n}, errors [(line, message)].
+    """
+    header = next(rows, None)
+    if not header:
+        raise ImportFormatError('The file is empty')
+    columns = [str(column or '').strip().lower().replace(' ', '_') for column in header]
+    unknown = [column for column in columns if column and column not in COLUMNS]
+    if unknown:
+        raise ImportFormatError(f"Unknown columns: {', '.join(unknown)} (expected {', '.join(COLUMNS)})")
+    for column in REQUIRED_COLUMNS:
+        if column not in columns:
+            raise ImportFormatError(f"Missing required column '{column}'")
+    present = [column for column in columns if column]
+
+    counts = {'rows': 0, 'created': 0, 'updated': 0, 'created_related': {}, 'errors': []}
+    chunk = []
+    for line, values in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        counts['rows'] += 1
+        try:
+            row = _clean_row({column: value for column, value in zip(columns, values) if column})
+        except ValueError as e:
+            counts['errors'].append((line, str(e)))
+            continue
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, present, counts, user)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, present, counts, user)
+
+    counts['error_count'] = len(counts['errors'])
+    counts['errors'] = counts['errors'][:MAX_ERRORS]
+    return counts
+
+
+def export_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    """Header row, then one row per stock, in the import column layout"""
+    if queryset is None:
+        queryset = Stock.objects.all()
+    yield COLUMNS
+    values = queryset.order_by('supplier__name', 'name', 'id').values_list(
+        'name', 'supplier__name', 'category__name', 'description', 'current_quantity',
+        'minimum_quantity', 'unit', 'unit_price', 'is_active',
+    )
+    for row in values.iterator(chunk_size=chunk_size):
+        yield list(row[:-1]) + ['yes' if row[-1] else 'no']
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_lines(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows, output):
+    """Write rows to an XLSX file with openpyxl's constant-memory write-only mode"""
+    workbook = _openpyxl().Workbook(write_only=True)
+    sheet = workbook.create_sheet('Stock')
+    for row in rows:
+        sheet.append([float(value) if isinstance(value, Decimal) else value for value in row])
+    workbook.save(output)
@@ -0,0 +1,167 @@
+"""
+Full-text stock search.
+
+Searching with name/description/supplier__name icontains is a LIKE '%q%'
+scan over a join. This module keeps an SQLite FTS5 table with one row per
+stock (its name, description, supplier name and category name) and answers
+searches from it: every word of the query is matched as a prefix, so
+"arab cof" finds "Arabica Coffee Beans". Every match is returned (the
+queryset is filtered with a subquery on the index), and the best
+RANKED_RESULTS matches by bm25 come first, a name hit weighing more than a
+supplier, category or description hit.
+
+The index is filled by SQLite triggers on the stock, supplier and category
+tables, so saves, queryset updates, bulk creates and the raw import upsert
+all stay indexed without any Python-side bookkeeping. The table and its
+triggers are created by `migrate` (see signals.py), never by a search.
+Without FTS5 there is no index and the search falls back to icontains.
+"""
+import logging
+import re
+
+from django.db import connections, transaction, OperationalError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Supplier, Category, Stock
+
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'warehouse_stock_fts'
+RANKED_RESULTS = 1000  # Best matches listed first; the others follow in the queryset's order
+# bm25 column weights: name, description, supplier, category
+WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _indexed_row_sql(alias):
+    """SELECT of the indexed columns for stock rows aliased `alias`"""
+    return (
+        f"{alias}.id, {alias}.name, {alias}.description, "
+        f"(SELECT name FROM {Supplier._meta.db_table} WHERE id = {alias}.supplier_id), "
+        f"(SELECT name FROM {Category._meta.db_table} WHERE id = {alias}.category_id)"
+    )
+
+
+def create_stock_index(using='default'):
+    """
+    Create the FTS table and its sync triggers if missing (backfilling once).
+
+    Returns True if the index is usable on this database.
+    """
+    stock = Stock._meta.db_table
+    supplier = Supplier._meta.db_table
+    category = Category._meta.db_table
+    columns = '(rowid, name, description, supplier, category)'
+    if stock not in connections[using].introspection.table_names():
+        return False  # migrate without --run-syncdb leaves the unmigrated apps' tables out
+    try:
+        # All or nothing: a table without its triggers would go stale
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            exists = cursor.fetchone() is not None
+
+            if not exists:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"name, description, supplier, category, "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {stock} BEGIN "
+                f"INSERT INTO {FTS_TABLE}{columns} SELECT {_indexed_row_sql('new')}; END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {stock} BEGIN "
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+                f"AFTER UPDATE OF name, description, supplier_id, category_id ON {stock} BEGIN "
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+                f"INSERT INTO {FTS_TABLE}{columns} SELECT {_indexed_row_sql('new')}; END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_supplier_au AFTER UPDATE OF name ON {supplier} BEGIN "
+                f"UPDATE {FTS_TABLE} SET supplier = new.name "
+                f"WHERE rowid IN (SELECT id FROM {stock} WHERE supplier_id = new.id); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_category_au AFTER UPDATE OF name ON {category} BEGIN "
+                f"UPDATE {FTS_TABLE} SET category = new.name "
+                f"WHERE rowid IN (SELECT id FROM {stock} WHERE category_id = new.id); END"
+            )
+            if not exists:
+                # Index everything written before the triggers existed
+                cursor.execute(f"INSERT INTO {FTS_TABLE}{columns} SELECT {_indexed_row_sql('s')} FROM {stock} s")
+                logger.info(f"Built full-text index for {stock}")
+    except OperationalError as e:
+        logger.warning(f"Stock full-text index unavailable, falling back to LIKE scans: {e}")
+        return False
+    return True
+
+
+def stock_index_exists(using='default'):
+    """Whether the FTS table exists (one lookup in SQLite's in-memory schema, so nothing to cache)"""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def rebuild_stock_index(using='default'):
+    """Re-index every stock from scratch (repairs drift after manual table edits or dropped triggers)"""
+    if create_stock_index(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, description, supplier, category) "
+                f"SELECT {_indexed_row_sql('s')} FROM {Stock._meta.db_table} s"
+            )
+
+
+def match_expression(query):
+    """FTS5 query matching every word of `query` as a prefix, or '' if it has no words"""
+    return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(query.lower()))
+
+
+def search_stocks(queryset, query, fields=('name', 'description', 'supplier', 'category'), ranked=True):
+    """
+    Restrict a Stock queryset to matches of `query`, best matches first.
+
+    `fields` limits the indexed columns searched (e.g. without 'supplier'
+    on a single supplier's page). Without `ranked` the queryset keeps its
+    own ordering (keyset paging, exports).
+    """
+    expression = match_expression(query or '')
+    if not expression:
+        return queryset
+
+    using = queryset.db
+    if not stock_index_exists(using):
+        lookups = {'name': 'name', 'description': 'description', 'supplier': 'supplier__name', 'category': 'category__name'}
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{lookups[field]}__icontains': query.strip()})
+        return queryset.filter(condition)
+
+    if set(fields) != {'name', 'description', 'supplier', 'category'}:
+        expression = '{' + ' '.join(fields) + '} : (' + expression + ')'
+    matches = queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+    if not ranked:
+        return matches
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {', '.join(str(weight) for weight in WEIGHTS)}) LIMIT %s",
+            [expression, RANKED_RESULTS],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    if not ids:
+        return queryset.none()
+    # Position of the id in the ranked list, NULL past it (a CASE with one WHEN per id costs more to build than the search)
+    relevance = RawSQL(f"NULLIF(instr(%s, ',' || {Stock._meta.db_table}.id || ','), 0)", [f",{','.join(map(str, ids))},"])
+    return matches.order_by(relevance.asc(nulls_last=True), *(queryset.query.order_by or Stock._meta.ordering))
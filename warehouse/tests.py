@@ -1,3 +1,429 @@
-from django.test import TestCase
+import io
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from unittest import mock
+
+from django.db import connection
+from django.db.models import Count, F, Q, Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .inventory import apply_quantity_updates, apply_stock_events
+from .ledger import quantity_at, record_movement, take_balance_snapshots
+from .forecasting import forecast_reorder_levels, save_forecasts
+from .models import Supplier, Category, Stock, StockMovement, StockBalanceSnapshot
+from . import stock_search
+from .dashboard import get_dashboard_data
+from .reorders import write_purchase_orders
+from .stock_io import import_stocks, export_rows, write_xlsx, iter_xlsx_rows
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WarehouseTestCase(TestCase):
+    """Keeps the dashboard and job caches out of the real file cache"""
+
+
+def create_stock(name='Arabica', current_quantity=10, minimum_quantity=5, **fields):
+    supplier, _ = Supplier.objects.get_or_create(name='Roastery')
+    category, _ = Category.objects.get_or_create(name='Coffee')
+    return Stock.objects.create(name=name, supplier=supplier, category=category, current_quantity=current_quantity,
+                                minimum_quantity=minimum_quantity, unit_price=Decimal('80'), **fields)
+
+
+class StockQuerySetTests(WarehouseTestCase):
+    def test_update_recomputes_needs_reorder(self):
+        low, high = create_stock('Arabica', 2, 5), create_stock('Robusta', 20, 5)
+        self.assertTrue(low.needs_reorder)
+
+        Stock.objects.filter(pk=low.pk).update(current_quantity=8)
+        Stock.objects.filter(pk=high.pk).update(minimum_quantity=F('current_quantity') + 1)
+
+        self.assertEqual(
+            dict(Stock.objects.values_list('name', 'needs_reorder')), {'Arabica': False, 'Robusta': True}
+        )
+
+    def test_update_keeps_an_explicit_flag(self):
+        stock = create_stock('Arabica', 2, 5)
+        Stock.objects.filter(pk=stock.pk).update(current_quantity=1, needs_reorder=False)
+        stock.refresh_from_db()
+        self.assertFalse(stock.needs_reorder)
+
+    def test_bulk_update_recomputes_needs_reorder(self):
+        stocks = [create_stock(f'Stock {number}', 10, 5) for number in range(3)]
+        for stock in stocks[:2]:
+            stock.current_quantity = 1
+
+        Stock.objects.bulk_update(stocks, ['current_quantity'], batch_size=2)
+
+        self.assertEqual(
+            list(Stock.objects.order_by('name').values_list('needs_reorder', flat=True)), [True, True, False]
+        )
+
+
+class DashboardTests(WarehouseTestCase):
+    def setUp(self):
+        create_stock('Arabica', 10, 5)
+        create_stock('Robusta', 0, 5)
+        create_stock('Retired', 3, 5, is_active=False)
+        Supplier.objects.create(name='Idle')
+
+    def test_matches_per_query_figures(self):
+        active = Stock.objects.filter(is_active=True)
+        data = get_dashboard_data()
+
+        self.assertEqual(data['stats'], {
+            'total_stocks': active.count(),
+            'low_stock_items': active.filter(needs_reorder=True).count(),
+            'out_of_stock': active.filter(current_quantity=0).count(),
+            'total_value': active.aggregate(total=Sum(F('current_quantity') * F('unit_price')))['total'],
+            'has_reorder_items': True,
+        })
+        self.assertEqual(
+            {supplier['name']: supplier['stock_count'] for supplier in data['suppliers']},
+            dict(Supplier.objects.filter(is_active=True).annotate(
+                stock_count=Count('stocks', filter=Q(stocks__is_active=True))
+            ).values_list('name', 'stock_count')),
+        )
+        self.assertEqual([(category['name'], category['stock_count']) for category in data['categories']], [('Coffee', 2)])
+
+    def assertInvalidatedBy(self, write):
+        before = get_dashboard_data()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(get_dashboard_data(), before, write.__name__)
+
+    def test_writes_drop_the_cached_figures(self):
+        def save():
+            stock = Stock.objects.get(name='Arabica')
+            stock.current_quantity = 1
+            stock.save()
+
+        def queryset_update():
+            Stock.objects.filter(name='Robusta').update(current_quantity=50)
+
+        def bulk_update():
+            stocks = list(Stock.objects.filter(is_active=True))
+            for stock in stocks:
+                stock.current_quantity += 1
+            Stock.objects.bulk_update(stocks, ['current_quantity'])
+
+        def bulk_create():
+            stock = Stock.objects.first()
+            Stock.objects.bulk_create([Stock(name='Decaf', supplier=stock.supplier, category=stock.category, unit_price=1)])
+
+        def rename_supplier():
+            supplier = Supplier.objects.get(name='Idle')
+            supplier.name = 'Busy'
+            supplier.save()
+
+        def delete():
+            Stock.objects.get(name='Decaf').delete()
+
+        def ledger_event():
+            apply_stock_events([{'stock': Stock.objects.get(name='Arabica').pk, 'quantity': '1'}])
+
+        for write in [save, queryset_update, bulk_update, bulk_create, rename_supplier, delete, ledger_event]:
+            self.assertInvalidatedBy(write)
+
+    def test_reads_are_cached(self):
+        get_dashboard_data()
+        with connection.cursor() as cursor:  # Bypasses the invalidating model and queryset methods
+            cursor.execute(f"UPDATE {Stock._meta.db_table} SET current_quantity = 0")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_data()['stats']['out_of_stock'], 1)
+
+
+class StockMovementTests(WarehouseTestCase):
+    def test_events_apply_deltas_in_order(self):
+        stock = create_stock('Arabica', 10, 5)
+        user = get_user_model().objects.create_user('terminal')
+
+        results = apply_stock_events([
+            {'stock': stock.pk, 'kind': 'consumption', 'quantity': '6'},
+            {'stock': stock.pk, 'kind': 'consumption', 'quantity': '5'},
+            {'stock': stock.pk, 'kind': 'receipt', 'quantity': '1.5'},
+            {'stock': stock.pk + 1, 'quantity': '1'},
+            {'stock': stock.pk, 'kind': 'count', 'quantity': '1'},
+        ], user=user, note='Bar')
+
+        self.assertEqual(results[0], {'success': True, 'stock': stock.pk, 'quantity': '4.00',
+                                      'needs_reorder': True, 'status': 'Low Stock'})
+        self.assertEqual(results[1]['error'], 'Insufficient stock (4.00 available)')
+        self.assertEqual((results[2]['quantity'], results[2]['needs_reorder']), ('5.50', False))
+        self.assertEqual(results[3]['error'], 'Stock item not found')
+        self.assertEqual(results[4]['error'], "Unknown event kind 'count'")
+        stock.refresh_from_db()
+        self.assertEqual((stock.current_quantity, stock.needs_reorder), (Decimal('5.5'), False))
+        self.assertEqual(
+            list(stock.movements.order_by('id').values_list('kind', 'quantity', 'note', 'created_by')),
+            [('consumption', Decimal('-6'), 'Bar', user.pk), ('receipt', Decimal('1.5'), 'Bar', user.pk)],
+        )
+
+    def test_inactive_stocks_refuse_events(self):
+        stock = create_stock('Arabica', 10, 5, is_active=False)
+        [result] = apply_stock_events([{'stock': stock.pk, 'quantity': '1'}])
+        self.assertEqual(result['error'], 'Stock item not found')
+
+    def test_record_movement_returns_the_balance(self):
+        stock = create_stock('Arabica', 10, 5)
+
+        movement = record_movement(stock.pk, StockMovement.CONSUMPTION, '-7.25')
+
+        self.assertEqual(movement.balance, Decimal('2.75'))
+        stock.refresh_from_db()
+        self.assertTrue(stock.needs_reorder)
+        with self.assertRaisesMessage(ValueError, 'Insufficient stock'):
+            record_movement(stock.pk, StockMovement.CONSUMPTION, '-3')
+        with self.assertRaises(Stock.DoesNotExist):
+            record_movement(stock.pk + 1, StockMovement.RECEIPT, '1')
+
+    def test_record_movement_validates_the_quantity(self):
+        stock = create_stock('Arabica', 10, 5)
+
+        self.assertEqual(record_movement(stock.pk, StockMovement.RECEIPT, 0.1).quantity, Decimal('0.10'))
+        self.assertEqual(record_movement(stock.pk, StockMovement.ADJUSTMENT, '-0.114').balance, Decimal('9.99'))
+        for kind, quantity, error in [
+            (StockMovement.RECEIPT, '-5', 'A receipt quantity must be positive'),
+            (StockMovement.CONSUMPTION, '5', 'A consumption quantity must be negative'),
+            (StockMovement.ADJUSTMENT, '0', 'Quantity must not be zero'),
+            (StockMovement.RECEIPT, 'lots', 'Invalid quantity value'),
+            (StockMovement.COUNT, '1', "Unknown movement kind 'count'"),
+        ]:
+            with self.assertRaisesMessage(ValueError, error):
+                record_movement(stock.pk, kind, quantity)
+        self.assertEqual(stock.movements.count(), 2)
+
+    def test_counts_ledger_the_difference(self):
+        stock = create_stock('Arabica', 10, 5)
+
+        results = apply_quantity_updates({str(stock.pk): '3', 'x': '1', str(stock.pk + 1): '1'})
+
+        self.assertEqual(results[str(stock.pk)], {'success': True, 'quantity': '3.00',
+                                                  'needs_reorder': True, 'status': 'Low Stock'})
+        self.assertEqual(results['x']['error'], 'Invalid stock id')
+        self.assertEqual(results[str(stock.pk + 1)]['error'], 'Stock item not found')
+        self.assertEqual(stock.movements.get().quantity, Decimal('-7'))
+
+
+class BalanceHistoryTests(WarehouseTestCase):
+    def move(self, stock, quantity, days_ago):
+        return StockMovement.objects.create(stock=stock, kind=StockMovement.ADJUSTMENT, quantity=quantity,
+                                            created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_opening_balance_outside_the_ledger(self):
+        stock = create_stock('Arabica', 10, 5)
+        record_movement(stock.pk, StockMovement.CONSUMPTION, '-2')
+
+        self.assertEqual(quantity_at(stock.pk), Decimal('8'))
+        self.assertEqual(quantity_at(stock.pk, timezone.now() - timedelta(hours=1)), Decimal('10'))
+
+    def test_snapshot_plus_later_movements(self):
+        stock = create_stock('Arabica', 10, 5)
+        self.assertEqual(take_balance_snapshots(), 1)
+        Stock.objects.filter(pk=stock.pk).update(current_quantity=F('current_quantity') + 5)
+        self.move(stock, 5, days_ago=0)
+
+        self.assertEqual(quantity_at(stock.pk), Decimal('15'))
+
+    def test_past_quantity_from_an_older_snapshot(self):
+        stock = create_stock('Arabica', 10, 5)
+        StockBalanceSnapshot.objects.create(stock=stock, quantity=4, taken_at=timezone.now() - timedelta(days=5))
+        self.move(stock, 3, days_ago=4)
+        self.move(stock, 3, days_ago=1)
+
+        self.assertEqual(quantity_at(stock.pk, timezone.now() - timedelta(days=6)), Decimal('4'))  # No snapshot yet
+        self.assertEqual(quantity_at(stock.pk, timezone.now() - timedelta(days=2)), Decimal('7'))
+        self.assertEqual(quantity_at(stock.pk), Decimal('10'))
+
+    def test_snapshots_only_stocks_that_moved(self):
+        arabica, robusta = create_stock('Arabica', 10, 5), create_stock('Robusta', 3, 5)
+        self.assertEqual(take_balance_snapshots(), 2)
+        self.assertEqual(take_balance_snapshots(), 0)
+
+        movement = record_movement(arabica.pk, StockMovement.RECEIPT, '2')
+        Stock.objects.filter(pk=robusta.pk).update(current_quantity=1)  # Bypasses the ledger
+        self.assertEqual(take_balance_snapshots(), 2)
+
+        snapshot = arabica.balance_snapshots.order_by('-id').first()
+        self.assertEqual((snapshot.quantity, snapshot.last_movement_id), (Decimal('12'), movement.pk))
+        self.assertEqual(robusta.balance_snapshots.order_by('-id').first().quantity, Decimal('1'))
+
+
+class StockSearchTests(WarehouseTestCase):
+    def setUp(self):
+        coffee = Category.objects.create(name='Coffee')
+        roastery = Supplier.objects.create(name='Roastery')
+        self.stocks = {
+            name: Stock.objects.create(name=name, description=description, supplier=roastery, category=coffee,
+                                       unit_price=Decimal('1'))
+            for name, description in [
+                ('Arabica Coffee Beans', ''),
+                ('House Blend', 'Arabica and robusta'),
+                ('Paper Cups', ''),
+            ]
+        }
+
+    def search(self, query, **kwargs):
+        return list(stock_search.search_stocks(Stock.objects.order_by('name'), query, **kwargs).values_list('name', flat=True))
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search('arab bea'), ['Arabica Coffee Beans'])
+        self.assertEqual(self.search('cups paper'), ['Paper Cups'])
+        self.assertEqual(self.search('tea'), [])
+
+    def test_name_hits_rank_first(self):
+        self.assertEqual(self.search('arabica'), ['Arabica Coffee Beans', 'House Blend'])
+        self.assertEqual(self.search('arabica', ranked=False), ['Arabica Coffee Beans', 'House Blend'])
+        self.assertEqual(self.search('arabica', fields=('description',)), ['House Blend'])
+
+    def test_matches_past_the_ranked_ones_are_kept(self):
+        Stock.objects.filter(name='Paper Cups').update(description='Arabica branded')
+        with mock.patch.object(stock_search, 'RANKED_RESULTS', 1):
+            self.assertEqual(self.search('arabica'), ['Arabica Coffee Beans', 'House Blend', 'Paper Cups'])
+
+    def test_renames_are_indexed(self):
+        Supplier.objects.filter(name='Roastery').update(name='Lavazza')
+        Category.objects.update(name='Disposables')
+        Stock.objects.filter(name='Paper Cups').update(name='Paper Lids')
+
+        self.assertEqual(len(self.search('lavazza')), 3)
+        self.assertEqual(len(self.search('dispos')), 3)
+        self.assertEqual(self.search('cups'), [])
+        self.assertEqual(self.search('lids'), ['Paper Lids'])
+
+
+class StockRowsApiTests(WarehouseTestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('staff', password='x', is_staff=True))
+        supplier = Supplier.objects.create(name='Roastery')
+        category = Category.objects.create(name='Coffee')
+        for name in ['Espresso', 'Arabica', 'Decaf', 'Arabica Dark', 'Blend']:
+            Stock.objects.create(name=name, supplier=supplier, category=category, unit_price=Decimal('1'))
+
+    def pages(self, **params):
+        url = reverse('warehouse:stock_rows_api')
+        names, cursor = [], {}
+        while cursor is not None:
+            data = self.client.get(url, {**params, **cursor, 'limit': 2}).json()
+            names.append([row['name'] for row in data['results']])
+            cursor = data['next_cursor']
+        return names
+
+    def test_pages_follow_the_cursor(self):
+        self.assertEqual(self.pages(), [['Arabica', 'Arabica Dark'], ['Blend', 'Decaf'], ['Espresso']])
+
+    def test_search_pages_in_name_order(self):
+        self.assertEqual(self.pages(search='arab'), [['Arabica', 'Arabica Dark']])
+
+    def test_rejects_a_cursor_without_id(self):
+        response = self.client.get(reverse('warehouse:stock_rows_api'), {'after_name': 'Blend'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stock_urls(self):
+        self.assertTemplateUsed(self.client.get('/warehouse/stocks/'), 'warehouse/stock_list.html')
+        self.assertTemplateUsed(self.client.get('/warehouse/stocks/grid/'), 'warehouse/stock_grid.html')
+        self.assertContains(self.client.get(reverse('warehouse:dashboard')), f'href="{reverse("warehouse:stock_grid")}"')
+
+
+class StockImportTests(WarehouseTestCase):
+    def import_rows(self, *rows):
+        return import_stocks(iter(rows))
+
+    def test_creates_stocks_and_related_objects(self):
+        counts = self.import_rows(
+            ['Name', 'Supplier', 'Category', 'Current Quantity', 'Minimum Quantity', 'Unit', 'Unit Price'],
+            ['Arabica', 'Roastery', 'Coffee', '12', '5', 'Kilogram', '80'],
+            ['Filters', 'Roastery', 'Consumables', '2', '10', 'pcs', '0.5'],
+            ['Cups', 'Roastery', 'Consumables', '', '', '', ''],
+        )
+
+        self.assertEqual((counts['rows'], counts['created'], counts['updated']), (3, 2, 0))
+        self.assertEqual(counts['errors'], [(4, 'new item needs unit_price')])
+        self.assertEqual(counts['created_related'], {'Supplier': 1, 'Category': 2})
+        arabica = Stock.objects.get(name='Arabica')
+        self.assertEqual((arabica.current_quantity, arabica.unit, arabica.needs_reorder), (Decimal('12'), 'kg', False))
+        self.assertTrue(Stock.objects.get(name='Filters').needs_reorder)
+        self.assertEqual(
+            list(arabica.movements.values_list('kind', 'quantity')), [(StockMovement.ADJUSTMENT, Decimal('12'))]
+        )
+
+    def test_updates_only_the_cells_given(self):
+        self.import_rows(
+            ['name', 'supplier', 'category', 'description', 'current_quantity', 'minimum_quantity', 'unit_price'],
+            ['Arabica', 'Roastery', 'Coffee', 'Whole beans', '12', '5', '80'],
+        )
+        counts = self.import_rows(
+            ['name', 'supplier', 'description', 'current_quantity', 'minimum_quantity'],
+            ['Arabica', 'Roastery', '', '4', ''],
+        )
+
+        self.assertEqual((counts['created'], counts['updated'], counts['error_count']), (0, 1, 0))
+        arabica = Stock.objects.get(name='Arabica')
+        # Blank cells and missing columns keep the stored values
+        self.assertEqual(arabica.description, 'Whole beans')
+        self.assertEqual((arabica.current_quantity, arabica.minimum_quantity), (Decimal('4'), Decimal('5')))
+        self.assertEqual(arabica.unit_price, Decimal('80'))
+        self.assertTrue(arabica.needs_reorder)
+        self.assertEqual(arabica.movements.filter(kind=StockMovement.COUNT).get().quantity, Decimal('-8'))
+
+    def test_xlsx_export_imports_back(self):
+        self.import_rows(
+            ['name', 'supplier', 'category', 'current_quantity', 'unit_price', 'is_active'],
+            ['Arabica', 'Roastery', 'Coffee', '12.5', '80', 'yes'],
+        )
+        output = io.BytesIO()
+        write_xlsx(export_rows(), output)
+        output.seek(0)
+        Stock.objects.update(current_quantity=0)
+
+        counts = import_stocks(iter_xlsx_rows(output))
+
+        self.assertEqual((counts['updated'], counts['error_count']), (1, 0))
+        self.assertEqual(Stock.objects.get().current_quantity, Decimal('12.5'))
+
+
+class PurchaseOrderTests(WarehouseTestCase):
+    def test_zip_has_a_csv_and_a_pdf_per_supplier(self):
+        supplier = Supplier.objects.create(name='Roastery & Co')
+        Stock.objects.create(name='Arabica', supplier=supplier, category=Category.objects.create(name='Coffee'),
+                             current_quantity=1, minimum_quantity=5, unit_price=Decimal('80'))
+        output = io.BytesIO()
+
+        self.assertEqual(write_purchase_orders(output), 1)
+
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(sorted(archive.namelist()), [f'{supplier.id}-Roastery---Co.csv', f'{supplier.id}-Roastery---Co.pdf'])
+            self.assertTrue(archive.read(f'{supplier.id}-Roastery---Co.pdf').startswith(b'%PDF'))
+
+
+class ForecastTests(WarehouseTestCase):
+    def test_steady_usage_sets_the_reorder_point(self):
+        supplier = Supplier.objects.create(name='Roastery', lead_time_days=7)
+        stock = Stock.objects.create(name='Arabica', supplier=supplier, category=Category.objects.create(name='Coffee'),
+                                     current_quantity=10, minimum_quantity=5, unit_price=Decimal('80'))
+        today = timezone.localdate()
+        StockMovement.objects.bulk_create(
+            StockMovement(stock=stock, kind=StockMovement.CONSUMPTION, quantity=-2,
+                          created_at=timezone.make_aware(datetime.combine(today - timedelta(days=days), time(12))))
+            for days in range(1, 31)
+        )
+
+        forecasts = forecast_reorder_levels()
+        self.assertEqual(forecasts, {stock.id: (Decimal('2.000'), Decimal('14.00'), Decimal('28.00'))})
+
+        save_forecasts(forecasts, apply=True)
+        stock.refresh_from_db()
+        self.assertEqual((stock.minimum_quantity, stock.suggested_order_quantity), (Decimal('14'), Decimal('28')))
+        self.assertTrue(stock.needs_reorder)  # 10 on hand is now below the reorder point
+
+    def test_short_history_gets_no_forecast(self):
+        stock = Stock.objects.create(name='Arabica', supplier=Supplier.objects.create(name='Roastery'),
+                                     category=Category.objects.create(name='Coffee'), unit_price=Decimal('80'))
+        StockMovement.objects.create(stock=stock, kind=StockMovement.CONSUMPTION, quantity=-2,
+                                     created_at=timezone.now() - timedelta(days=3))
+
+        self.assertEqual(forecast_reorder_levels(), {})
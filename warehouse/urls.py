@@ -8,5 +8,14 @@ urlpatterns = [
     path('suppliers/', views.supplier_list, name='supplier_list'),
     path('suppliers/<int:supplier_id>/', views.supplier_detail, name='supplier_detail'),
     path('stocks/', views.stock_list, name='stock_list'),
+    path('stocks/grid/', views.stock_grid, name='stock_grid'),
+    path('stocks/rows/', views.stock_rows_api, name='stock_rows_api'),
+    path('stocks/export/', views.stock_export, name='stock_export'),
+    path('stocks/import/', views.stock_import, name='stock_import'),
+    path('stocks/batch-update/', views.stock_batch_update, name='stock_batch_update'),
+    path('stocks/events/', views.stock_events, name='stock_events'),
     path('reorder/', views.reorder_list, name='reorder_list'),
+    path('reorder/purchase-orders/', views.purchase_orders_start, name='purchase_orders_start'),
+    path('reorder/purchase-orders/<str:job_id>/', views.purchase_orders_status, name='purchase_orders_status'),
+    path('reorder/purchase-orders/<str:job_id>/download/', views.purchase_orders_download, name='purchase_orders_download'),
 ]
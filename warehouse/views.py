@@ -1,47 +1,37 @@
+import json
+import os
+import tempfile
 from django.shortcuts import render, get_object_or_404, redirect
 from django.db.models import Q, Sum, Count, F
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.urls import reverse
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, HttpResponseBadRequest, Http404
+from django.views.decorators.http import require_POST
+from django.utils import timezone
 from .models import Supplier, Category, Stock
 from .forms import StockQuantityFormSet
 from .auth import staff_required
+from .inventory import apply_quantity_updates, apply_stock_events, MAX_BATCH
+from .dashboard import get_dashboard_data
+from .reorders import reorder_stocks, supplier_reorder_totals, start_purchase_order_job, get_job
+from .stock_search import search_stocks
+from .stock_io import (
+    ImportFormatError, detect_format, import_stocks, iter_csv_rows, iter_xlsx_rows,
+    export_rows, iter_csv_lines, write_xlsx, COLUMNS,
+)
+
+
+GRID_PAGE_SIZE = 100
+MAX_GRID_PAGE_SIZE = 500
 
 
 @staff_required
 def warehouse_dashboard(request):
     """Main dashboard view showing overview of warehouse status"""
-    suppliers = Supplier.objects.filter(is_active=True).annotate(
-        stock_count=Count('stocks', filter=Q(stocks__is_active=True))
-    )
-    
-    categories = Category.objects.all().annotate(
-        stock_count=Count('stocks', filter=Q(stocks__is_active=True))
-    )
-    
-    # Summary statistics
-    total_stocks = Stock.objects.filter(is_active=True).count()
-    low_stock_items = Stock.objects.filter(is_active=True, needs_reorder=True).count()
-    out_of_stock = Stock.objects.filter(is_active=True, current_quantity=0).count()
-    
-    # Calculate total inventory value correctly: sum of (quantity * price) for each item
-    total_value = Stock.objects.filter(is_active=True).aggregate(
-        total=Sum(F('current_quantity') * F('unit_price'))
-    )['total'] or 0
-    
-    context = {
-        'suppliers': suppliers,
-        'categories': categories,
-        'stats': {
-            'total_stocks': total_stocks,
-            'low_stock_items': low_stock_items,
-            'out_of_stock': out_of_stock,
-            'total_value': total_value,
-            'has_reorder_items': low_stock_items > 0,  # Add this flag
-        }
-    }
+    # Cached aggregates, dropped whenever stocks, suppliers or categories change (see dashboard.py)
+    context = get_dashboard_data()
     return render(request, 'warehouse/dashboard.html', context)
 
 
@@ -74,12 +64,6 @@ def supplier_detail(request, supplier_id):
     if category_filter:
         stocks = stocks.filter(category__name=category_filter)
     
-    if search_query:
-        stocks = stocks.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
     if stock_status == 'low':
         stocks = stocks.filter(needs_reorder=True)
     elif stock_status == 'out':
@@ -88,6 +72,7 @@ def supplier_detail(request, supplier_id):
         stocks = stocks.filter(current_quantity__gt=0, needs_reorder=False)
     
     stocks = stocks.order_by('category__name', 'name')
+    stocks = search_stocks(stocks, search_query, fields=('name', 'description', 'category'))
     
     # Get categories for filter dropdown
     categories = Category.objects.filter(stocks__supplier=supplier, stocks__is_active=True).distinct()
@@ -103,31 +88,21 @@ def supplier_detail(request, supplier_id):
     return render(request, 'warehouse/supplier_detail.html', context)
 
 
-@staff_required
-def stock_list(request):
-    """List all stocks with filtering options and inline editing"""
+def filter_stocks(params, ranked=True):
+    """Active stocks filtered by the stock list's supplier/category/search/status parameters"""
     stocks = Stock.objects.filter(is_active=True).select_related('supplier', 'category')
     
-    # Get filter parameters
-    supplier_filter = request.GET.get('supplier')
-    category_filter = request.GET.get('category')
-    search_query = request.GET.get('search')
-    stock_status = request.GET.get('status')
+    supplier_filter = params.get('supplier')
+    category_filter = params.get('category')
+    search_query = params.get('search')
+    stock_status = params.get('status')
     
-    # Apply filters
-    if supplier_filter:
+    if supplier_filter and supplier_filter.isdigit():
         stocks = stocks.filter(supplier_id=supplier_filter)
     
     if category_filter:
         stocks = stocks.filter(category__name=category_filter)
     
-    if search_query:
-        stocks = stocks.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query) |
-            Q(supplier__name__icontains=search_query)
-        )
-    
     if stock_status == 'low':
         stocks = stocks.filter(needs_reorder=True)
     elif stock_status == 'out':
@@ -135,7 +110,22 @@ def stock_list(request):
     elif stock_status == 'in_stock':
         stocks = stocks.filter(current_quantity__gt=0, needs_reorder=False)
     
-    stocks = stocks.order_by('supplier__name', 'category__name', 'name')
+    stocks = stocks.order_by('supplier__name', 'category__name', 'name', 'id')
+    
+    # Searches are listed best match first unless the caller orders the rows itself
+    return search_stocks(stocks, search_query, ranked=ranked)
+
+
+@staff_required
+def stock_list(request):
+    """List all stocks with filtering options and inline editing"""
+    # Get filter parameters
+    supplier_filter = request.GET.get('supplier')
+    category_filter = request.GET.get('category')
+    search_query = request.GET.get('search')
+    stock_status = request.GET.get('status')
+    
+    stocks = filter_stocks(request.GET)
     
     # Handle POST request for inline editing
     if request.method == 'POST':
@@ -149,19 +139,12 @@ def stock_list(request):
                 if not stock_id or new_quantity is None:
                     return JsonResponse({'success': False, 'error': 'Missing required data'})
                 
-                # Get the stock object
-                stock = Stock.objects.get(id=stock_id, is_active=True)
-                
-                # Update the quantity
-                stock.current_quantity = float(new_quantity)
-                stock.save()
+                result = apply_quantity_updates({stock_id: new_quantity}, user=request.user)[stock_id]
+                if not result['success']:
+                    return JsonResponse({'success': False, 'error': result['error']})
                 
                 return JsonResponse({'success': True, 'message': 'Stock updated successfully'})
                 
-            except Stock.DoesNotExist:
-                return JsonResponse({'success': False, 'error': 'Stock item not found'})
-            except ValueError:
-                return JsonResponse({'success': False, 'error': 'Invalid quantity value'})
             except Exception as e:
                 return JsonResponse({'success': False, 'error': str(e)})
         
@@ -169,11 +152,12 @@ def stock_list(request):
         else:
             formset = StockQuantityFormSet(request.POST, queryset=stocks)
             if formset.is_valid():
-                updated_count = 0
-                for form in formset:
-                    if form.has_changed():
-                        form.save()
-                        updated_count += 1
+                changes = {
+                    str(form.instance.pk): form.cleaned_data['current_quantity']
+                    for form in formset if form.has_changed()
+                }
+                results = apply_quantity_updates(changes, user=request.user) if changes else {}
+                updated_count = sum(1 for result in results.values() if result['success'])
                 
                 if updated_count > 0:
                     messages.success(request, f'Successfully updated {updated_count} stock quantities.')
@@ -220,43 +204,244 @@ def stock_list(request):
     return render(request, 'warehouse/stock_list.html', context)
 
 
+@staff_required
+def stock_grid(request):
+    """Paged stock editing grid (the navigation's stock page) - rows are loaded from stock_rows_api as the user scrolls"""
+    suppliers = Supplier.objects.filter(is_active=True, stocks__is_active=True).distinct()
+    categories = Category.objects.filter(stocks__is_active=True).distinct()
+    
+    context = {
+        'suppliers': suppliers,
+        'categories': categories,
+        'current_supplier': request.GET.get('supplier'),
+        'current_category': request.GET.get('category'),
+        'current_search': request.GET.get('search'),
+        'current_status': request.GET.get('status'),
+        'page_size': GRID_PAGE_SIZE,
+        'max_batch': MAX_BATCH,
+    }
+    return render(request, 'warehouse/stock_grid.html', context)
+
+
+@staff_required
+def stock_rows_api(request):
+    """
+    One page of stock grid rows as JSON (same filters as the stock list).
+    
+    Rows come in (name, id) order, searches included, and a page starts after
+    the after_name/after_id cursor of the previous one, so deep pages cost the
+    same as the first instead of skipping an OFFSET of rows.
+    """
+    after_name = request.GET.get('after_name')
+    try:
+        after_id = int(request.GET['after_id']) if after_name is not None else None
+        limit = min(max(int(request.GET.get('limit', GRID_PAGE_SIZE)), 1), MAX_GRID_PAGE_SIZE)
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'}, status=400)
+    
+    stocks = filter_stocks(request.GET, ranked=False).order_by('name', 'id')
+    if after_name is not None:
+        stocks = stocks.filter(Q(name__gt=after_name) | Q(name=after_name, id__gt=after_id))
+    # One extra row tells whether there is a next page without a COUNT over the whole catalog
+    rows = list(stocks[:limit + 1].values(
+        'id', 'name', 'supplier_id', 'supplier__name', 'category__name',
+        'current_quantity', 'minimum_quantity', 'unit', 'unit_price', 'needs_reorder',
+    ))
+    has_more = len(rows) > limit
+    unit_names = dict(Stock.UNIT_CHOICES)
+    
+    results = []
+    for row in rows[:limit]:
+        results.append({
+            'id': row['id'],
+            'name': row['name'],
+            'supplier_id': row['supplier_id'],
+            'supplier': row['supplier__name'],
+            'category': row['category__name'],
+            'current_quantity': str(row['current_quantity']),
+            'minimum_quantity': str(row['minimum_quantity']),
+            'unit': unit_names.get(row['unit'], row['unit']),
+            'unit_price': str(row['unit_price']),
+            'needs_reorder': row['needs_reorder'],
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'results': results,
+        'next_cursor': {'after_name': results[-1]['name'], 'after_id': results[-1]['id']} if has_more else None,
+    })
+
+
+@staff_required
+@require_POST
+def stock_batch_update(request):
+    """Apply many stock quantities in one request: {"updates": {stock_id: quantity, ...}}"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    
+    updates = payload.get('updates') if isinstance(payload, dict) else None
+    if not isinstance(updates, dict) or not updates:
+        return JsonResponse({'success': False, 'error': 'Missing required data'}, status=400)
+    if len(updates) > MAX_BATCH:
+        return JsonResponse({'success': False, 'error': f'Too many items (maximum {MAX_BATCH} per request)'}, status=400)
+    
+    results = apply_quantity_updates(updates, user=request.user)
+    updated_count = sum(1 for result in results.values() if result['success'])
+    
+    return JsonResponse({
+        'success': updated_count == len(results),
+        'updated': updated_count,
+        'failed': len(results) - updated_count,
+        'results': results,
+    })
+
+
+@staff_required
+@require_POST
+def stock_events(request):
+    """Apply consumption/receipt events from a terminal: {"events": [{"stock", "kind", "quantity"}, ...], "terminal": name}"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    
+    events = payload.get('events') if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not events:
+        return JsonResponse({'success': False, 'error': 'Missing required data'}, status=400)
+    if len(events) > MAX_BATCH:
+        return JsonResponse({'success': False, 'error': f'Too many events (maximum {MAX_BATCH} per request)'}, status=400)
+    
+    terminal = str(payload.get('terminal') or '').strip()
+    note = f'Terminal: {terminal}'[:200] if terminal else ''
+    results = apply_stock_events(events, user=request.user, note=note)
+    applied_count = sum(1 for result in results if result['success'])
+    
+    return JsonResponse({
+        'success': applied_count == len(results),
+        'applied': applied_count,
+        'failed': len(results) - applied_count,
+        'results': results,
+    })
+
+
+@staff_required
+def stock_export(request):
+    """Download the (filtered) stock list as CSV or XLSX in the import column layout"""
+    fmt = request.GET.get('format', 'csv')
+    stocks = filter_stocks(request.GET, ranked=False)  # Exported in export_rows' order
+    filename = f"stock-{timezone.localdate():%Y-%m-%d}.{fmt}"
+    
+    try:
+        if fmt == 'csv':
+            # Rows are rendered as they are sent - memory use doesn't grow with the catalog
+            response = StreamingHttpResponse(iter_csv_lines(export_rows(stocks)), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        if fmt == 'xlsx':
+            # Not streamed on purpose: the workbook is a zip that is only valid once complete.
+            # Rows are spooled to a temporary file (not memory) and sent from it in chunks.
+            output = tempfile.TemporaryFile()
+            write_xlsx(export_rows(stocks), output)
+            output.seek(0)
+            return FileResponse(output, as_attachment=True, filename=filename)
+    except ImportFormatError as e:
+        return HttpResponseBadRequest(str(e))
+    return HttpResponseBadRequest('Unsupported format (use csv or xlsx)')
+
+
+@staff_required
+def stock_import(request):
+    """Upload a CSV/XLSX file to create or update stock items in bulk"""
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a file to import.')
+        else:
+            try:
+                fmt = detect_format(upload.name)
+                # Large uploads are spooled to a temporary file - read it directly
+                source = getattr(upload.file, 'file', upload.file)
+                rows = iter_csv_rows(source) if fmt == 'csv' else iter_xlsx_rows(source)
+                result = import_stocks(rows, user=request.user)
+                messages.success(
+                    request,
+                    f"Imported {result['rows']} rows: {result['created']} created, "
+                    f"{result['updated']} updated, {result['error_count']} skipped."
+                )
+            except ImportFormatError as e:
+                messages.error(request, str(e))
+    
+    context = {
+        'result': result,
+        'columns': COLUMNS,
+    }
+    return render(request, 'warehouse/stock_import.html', context)
+
+
 @staff_required
 def reorder_list(request):
     """Show items that need reordering"""
-    stocks = Stock.objects.filter(
-        is_active=True, 
-        needs_reorder=True
-    ).select_related('supplier', 'category').order_by('supplier__name', 'name')
-    
-    # Group by supplier for easier ordering and calculate totals
-    suppliers_with_reorders = {}
-    grand_total = 0
+    # Suggested quantities, costs and per-supplier totals are computed in SQL (see reorders.py)
+    suppliers = list(supplier_reorder_totals())
+    stocks = list(
+        reorder_stocks().select_related('category').order_by('supplier__name', 'name')
+    )
     
+    # Group by supplier for easier ordering
+    suppliers_with_reorders = {
+        supplier: {'stocks': [], 'total_cost': supplier.total_cost or 0, 'total_items': supplier.reorder_items}
+        for supplier in suppliers
+    }
+    by_id = {supplier.id: data for supplier, data in suppliers_with_reorders.items()}
     for stock in stocks:
-        supplier = stock.supplier
-        if supplier not in suppliers_with_reorders:
-            suppliers_with_reorders[supplier] = {
-                'stocks': [],
-                'total_cost': 0,
-                'total_items': 0
-            }
-        
-        # Calculate suggested order quantity (2x minimum)
-        suggested_quantity = stock.minimum_quantity * 2
-        estimated_cost = suggested_quantity * stock.unit_price
-        
-        # Add calculated fields to stock object
-        stock.suggested_quantity = suggested_quantity
-        stock.estimated_cost = estimated_cost
-        
-        suppliers_with_reorders[supplier]['stocks'].append(stock)
-        suppliers_with_reorders[supplier]['total_cost'] += estimated_cost
-        suppliers_with_reorders[supplier]['total_items'] += 1
-        grand_total += estimated_cost
+        by_id[stock.supplier_id]['stocks'].append(stock)
     
     context = {
         'stocks': stocks,
         'suppliers_with_reorders': suppliers_with_reorders,
-        'grand_total': grand_total,
+        'grand_total': sum(data['total_cost'] for data in by_id.values()),
     }
     return render(request, 'warehouse/reorder_list.html', context)
+
+
+@staff_required
+@require_POST
+def purchase_orders_start(request):
+    """Start rendering purchase orders (all suppliers, or ?supplier=<id>) into a zip in the background"""
+    supplier_ids = [int(value) for value in request.POST.getlist('supplier') if value.isdigit()]
+    job_id = start_purchase_order_job(supplier_ids or None)
+    return JsonResponse({
+        'success': True,
+        'job': job_id,
+        'status_url': reverse('warehouse:purchase_orders_status', args=[job_id]),
+    })
+
+
+@staff_required
+def purchase_orders_status(request, job_id):
+    """State of a purchase order job, with the download URL once it's done"""
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Job not found or expired'}, status=404)
+    
+    data = {'success': job['status'] != 'failed', 'status': job['status']}
+    if job['status'] == 'done':
+        data['suppliers'] = job['suppliers']
+        data['download_url'] = reverse('warehouse:purchase_orders_download', args=[job_id])
+    elif job['status'] == 'failed':
+        data['error'] = job['error']
+    return JsonResponse(data)
+
+
+@staff_required
+def purchase_orders_download(request, job_id):
+    """Stream the finished purchase order zip"""
+    job = get_job(job_id)
+    if job is None or job['status'] != 'done' or not os.path.exists(job['path']):
+        raise Http404('Purchase orders not available')
+    filename = f"purchase-orders-{timezone.localdate():%Y-%m-%d}.zip"
+    return FileResponse(open(job['path'], 'rb'), as_attachment=True, filename=filename)